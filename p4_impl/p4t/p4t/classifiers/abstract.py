@@ -2,6 +2,10 @@
 import collections
 import abc
 
+import numpy as np
+
+from p4t.vmrs.packed import PackedVMR
+
 
 class AbstractBasicClassifier(collections.Sequence):
     """ Classifier that supports various structural transformations.
@@ -42,6 +46,17 @@ class AbstractBasicClassifier(collections.Sequence):
         """
         pass
 
+    def subset_view(self, indices):
+        """ Constructs a lazy view on a given subset of rules.
+
+        Unlike `subset`, no entries are copied until the view is materialized
+        (see SubsetView). The view must not be used after the classifier changes.
+
+        Args:
+            indices: Entry indices that define the required subset of rules.
+        """
+        return SubsetView(self, indices)
+
     @abc.abstractmethod
     def reorder(self, bits, match_type='ternary'):
         """ Creates a new classifier with classification bits reordered.
@@ -59,6 +74,97 @@ class AbstractBasicClassifier(collections.Sequence):
     @staticmethod
     def _vmr_copy_subset(source, destination, indices):
         """ Copies subset of VMR entries into another VMR (as well as default action)."""
-        for i in indices:
-            destination.append(source[i])
+        if isinstance(source, PackedVMR) and isinstance(destination, PackedVMR):
+            destination.extend_from(source, indices)
+        else:
+            for i in indices:
+                destination.append(source[i])
         destination.default_action = source.default_action
+
+
+class SubsetView(AbstractBasicClassifier):
+    """ Read only view on a subset of other classifier's rules.
+
+    The view keeps only the parent classifier and an index array. Views of
+    views are composed, so the parent is never a view itself. Everything that
+    requires an actual VMR (vmr, reorder and parent-specific attributes)
+    triggers materialization via parent's `subset`, which happens only once.
+
+    Attributes:
+        parent: Parent classifier.
+        indices: Array of parent's entry indices.
+    """
+
+    def __init__(self, parent, indices):
+        """ Initializes SubsetView.
+
+        Args:
+            parent: Parent classifier (possibly a view).
+            indices: Parent's entry indices that define the view.
+        """
+        super(SubsetView, self).__init__(None)
+
+        indices = np.fromiter(indices, dtype=np.intp)
+        if len(indices) > 0 and (indices.max() >= len(parent) or indices.min() < -len(parent)):
+            raise IndexError("classifier index out of range")
+        indices[indices < 0] += len(parent)
+
+        if isinstance(parent, SubsetView) and parent._materialized is None:
+            parent, indices = parent.parent, parent.indices[indices]
+
+        self._parent = parent
+        self._indices = indices
+        self._materialized = None
+
+    @property
+    def parent(self):
+        """ Parent classifier."""
+        return self._parent
+
+    @property
+    def indices(self):
+        """ Array of parent's entry indices."""
+        return self._indices
+
+    def materialize(self):
+        """ Returns parent's subset with the view's rules (it is constructed only once)."""
+        if self._materialized is None:
+            self._materialized = self._parent.subset(self._indices)
+        return self._materialized
+
+    def __len__(self):
+        if self._materialized is not None:
+            return len(self._materialized)
+        return len(self._indices)
+
+    def __getitem__(self, i):
+        if self._materialized is not None:
+            return self._materialized[i]
+        if isinstance(i, slice):
+            return [self._parent[j] for j in self._indices[i]]
+        return self._parent[self._indices[i]]
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.materialize(), name)
+
+    @property
+    def vmr(self):
+        return self.materialize().vmr
+
+    @property
+    def default_action(self):
+        return self._parent.default_action
+
+    @property
+    def bit_width(self):
+        return self._parent.bit_width
+
+    def subset(self, indices):
+        if self._materialized is not None:
+            return self._materialized.subset(indices)
+        return self._parent.subset(self._indices[np.fromiter(indices, dtype=np.intp)])
+
+    def reorder(self, bits, match_type='ternary'):
+        return self.materialize().reorder(bits, match_type)
@@ -3,6 +3,7 @@ from itertools import groupby
 from p4t.vmrs.simple import SimpleVMREntry
 from p4t.vmrs.p4 import P4VMRAction
 from p4t.classifiers.abstract import AbstractBasicClassifier
+from p4t.classifiers.simple import permute_bits
 from p4t.p4_support.utils import chain_tables
 
 import p4t.p4_support.objects as p4
@@ -103,9 +104,8 @@ class P4ReorderingClassifier(P4BasicClassifier):
         table.add_actions_from_table(classifier.table)
 
         vmr = classifier.vmr.create_instance(table=table)
-        for entry in classifier:
-            mask = [entry.mask[j] for j in bits]
-            key = [entry.value[j] for j in bits]
+        values, masks = permute_bits(classifier.vmr, bits)
+        for entry, key, mask in zip(classifier, values.tolist(), masks.tolist()):
             vmr.append(SimpleVMREntry(key, mask, entry.action, entry.priority))
         vmr.default_action = classifier.default_action
         return P4ReorderingClassifier(classifier.p4_infra, table, bits, vmr, setup_action)
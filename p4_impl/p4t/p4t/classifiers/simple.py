@@ -1,9 +1,13 @@
 """ In this module the simple (no metadata attached) classifier's implementations is defined."""
 
 from collections import namedtuple
+from weakref import WeakKeyDictionary
+
+import numpy as np
 
 from p4t.classifiers.abstract import AbstractBasicClassifier
 from p4t.vmrs.simple import SimpleVMREntry
+from p4t.vmrs.packed import PackedVMR, pack_bits, unpack_bits
 
 
 class BasicClassifier(AbstractBasicClassifier):
@@ -62,6 +66,13 @@ class FPCAction(namedtuple('FPCAction', ['vmr_entry'])):
 class ReorderingClassifier(BasicClassifier):
     """ A classifiers that represents the bit-reordering of some other classifier.
 
+    Reordering is lazy: the classifier records the source VMR together with
+    the permutation, and the entries are permuted (in one pass) only when the
+    VMR is actually required. Chained reorderings are composed into a single
+    permutation of the source VMR. Reordered VMRs are memoized per
+    (source VMR, permutation) until the source VMR changes (VMRs without
+    a version are not memoized), every classifier gets its own copy.
+
     Attributes:
         bits: The sequence of classification bit indices that defines the ordering.
     """
@@ -75,6 +86,8 @@ class ReorderingClassifier(BasicClassifier):
         super(ReorderingClassifier, self).__init__(vmr)
 
         self._bits = list(bits)
+        self._source = None
+        self._source_bits = None
 
     @classmethod
     def from_original_vmr(cls, original_vmr, bits):
@@ -87,15 +100,45 @@ class ReorderingClassifier(BasicClassifier):
         Returns:
             An instance of ReorderingClassifier.
         """
-        vmr = cls._reorder_vmr(original_vmr, bits) if original_vmr is not None else []
-        return cls(bits, vmr)
+        if original_vmr is None:
+            return cls(bits, [])
+        return cls._lazy(bits, original_vmr, bits)
+
+    @classmethod
+    def _lazy(cls, bits, source, source_bits):
+        """ Constructs classifier that reorders `source` VMR by `source_bits` on demand."""
+        source_bits = list(source_bits)
+        for bit in source_bits:
+            if not -source.bit_width <= bit < source.bit_width:
+                raise IndexError("bit index {:d} is out of range".format(bit))
+        result = cls(bits)
+        result._source = source
+        result._source_bits = source_bits
+        return result
 
     @staticmethod
     def _reorder_vmr(vmr, bits):
+        version = getattr(vmr, 'version', None)
+        if version is None:
+            return ReorderingClassifier._reorder_uncached_vmr(vmr, bits)
+
+        bits = tuple(bits)
+        reordered = _REORDERED_VMRS.setdefault(vmr, {})
+        if bits not in reordered or reordered[bits][0] != version:
+            reordered[bits] = (version, ReorderingClassifier._reorder_uncached_vmr(vmr, bits))
+        return _copy_vmr(reordered[bits][1])
+
+    @staticmethod
+    def _reorder_uncached_vmr(vmr, bits):
+        if isinstance(vmr, PackedVMR):
+            return ReorderingClassifier._reorder_packed_vmr(vmr, bits)
+        return ReorderingClassifier._reorder_simple_vmr(vmr, bits)
+
+    @staticmethod
+    def _reorder_simple_vmr(vmr, bits):
         reordered_vmr = vmr.create_instance(bit_width=len(bits))
-        for entry in vmr:
-            mask = [entry.mask[j] for j in bits]
-            key = [entry.value[j] for j in bits]
+        values, masks = permute_bits(vmr, bits)
+        for entry, key, mask in zip(vmr, values.tolist(), masks.tolist()):
             if isinstance(entry.action, FPCAction) or len(bits) == len(entry.mask):
                 action = entry.action
             else:
@@ -105,17 +148,110 @@ class ReorderingClassifier(BasicClassifier):
         reordered_vmr.default_action = vmr.default_action
         return reordered_vmr
 
+    @staticmethod
+    def _reorder_packed_vmr(vmr, bits):
+        """ Reorders all entries at once without creating per bit objects."""
+        bits = list(bits)
+        reordered_vmr = vmr.create_instance(bit_width=len(bits))
+        actions = [
+            action if isinstance(action, FPCAction) or len(bits) == vmr.bit_width
+            else FPCAction(vmr[i])
+            for i, action in enumerate(vmr.actions)
+        ]
+        values, masks = permute_bits(vmr, bits)
+        reordered_vmr.extend_packed(pack_bits(values), pack_bits(masks), actions, vmr.priorities)
+        reordered_vmr.default_action = vmr.default_action
+        return reordered_vmr
+
+    @property
+    def is_lazy(self):
+        """ Whether the entries are not permuted yet."""
+        return self._vmr is None and self._source is not None
+
+    @property
+    def vmr(self):
+        if self.is_lazy:
+            self._vmr = self._reorder_vmr(self._source, self._source_bits)
+        return self._vmr
+
+    def __len__(self):
+        return len(self._source) if self.is_lazy else len(self._vmr)
+
+    def __getitem__(self, i):
+        return self.vmr[i]
+
+    @property
+    def default_action(self):
+        return self._source.default_action if self.is_lazy else self._vmr.default_action
+
+    @property
+    def bit_width(self):
+        return len(self._source_bits) if self.is_lazy else self._vmr.bit_width
+
     def subset(self, indices):
+        if self.is_lazy:
+            source = self._source.create_instance(bit_width=self._source.bit_width)
+            self._vmr_copy_subset(self._source, source, indices)
+            return ReorderingClassifier._lazy(self.bits, source, self._source_bits)
         new_vmr = self.vmr.create_instance(self.bit_width)
         self._vmr_copy_subset(self.vmr, new_vmr, indices)
         return ReorderingClassifier(self.bits, new_vmr)
 
     def reorder(self, bits, match_type='ternary'):
-        return ReorderingClassifier(
-            [self.bits[i] for i in bits],
-            self._reorder_vmr(self._vmr, bits))
+        bits = list(bits)
+        new_bits = [self.bits[i] for i in bits]
+        if self.is_lazy and self._composable(bits):
+            return ReorderingClassifier._lazy(
+                new_bits, self._source, [self._source_bits[i] for i in bits])
+        return ReorderingClassifier._lazy(new_bits, self.vmr, bits)
+
+    def _composable(self, bits):
+        """ Whether reordering by `bits` can be applied directly to the source VMR.
+
+        Composition must not change FPC actions, that wrap the entry of the
+        last reordering that drops bits. Thus, either both reorderings must
+        drop bits or none of them.
+        """
+        source_width = self._source.bit_width
+        return (len(self._source_bits) == source_width) == (len(bits) == source_width)
 
     @property
     def bits(self):
         """ A sequence of classification bit indices."""
         return self._bits
+
+
+def _copy_vmr(vmr):
+    """ Copies VMR, entries are shared as they are immutable."""
+    copy = vmr.create_instance(bit_width=vmr.bit_width)
+    if isinstance(vmr, PackedVMR):
+        copy.extend_from(vmr, range(len(vmr)))
+    else:
+        copy.extend_from_chunks([vmr[:]])
+    copy.default_action = vmr.default_action
+    return copy
+
+
+def permute_bits(vmr, bits):
+    """ Permutes classification bits of all VMR entries in one pass.
+
+    Args:
+        vmr: VMR, whose entries' bits are permuted.
+        bits: The sequence of classification bit indices.
+
+    Returns:
+        Pair of (len(vmr), len(bits)) 0/1 matrices of values and masks.
+    """
+    bits = list(bits)
+    if isinstance(vmr, PackedVMR):
+        return (unpack_bits(vmr.values, vmr.bit_width)[:, bits],
+                unpack_bits(vmr.masks, vmr.bit_width)[:, bits])
+    values = np.zeros((len(vmr), vmr.bit_width), dtype=bool)
+    masks = np.zeros((len(vmr), vmr.bit_width), dtype=bool)
+    for i, entry in enumerate(vmr):
+        values[i] = list(entry.value)
+        masks[i] = list(entry.mask)
+    return values[:, bits], masks[:, bits]
+
+
+_REORDERED_VMRS = WeakKeyDictionary()
@@ -1,9 +1,53 @@
+from collections import namedtuple
 from itertools import chain, product
+from concurrent.futures import Future, CancelledError
+import concurrent.futures
+import threading
+import time
+
+import numpy as np
 
 # TODO avoid this import?
 from p4t.vmrs.simple import SimpleVMREntry
 import p4t_native
 
+# Raised on setting the outcome of a cancelled future (only since Python 3.8)
+_InvalidStateError = getattr(concurrent.futures, 'InvalidStateError', RuntimeError)
+
+# Monotonic clock for deadlines (only since Python 3.3)
+_clock = getattr(time, 'monotonic', time.time)
+
+
+class OIDecomposition(namedtuple('OIDecomposition', ['subclassifiers', 'leftover', 'complete', 'gap'])):
+    """ Full result of `decompose_oi` (see its full_result argument).
+
+    Attributes:
+        subclassifiers: The list of OI subclassifiers.
+        leftover: Classifier with leftover rules.
+        complete: False if the decomposition has been truncated by the time budget.
+        gap: The gap between the number of subclassifiers and the lower bound
+            (None if it has not been requested or some rules are left over).
+    """
+
+    __slots__ = ()
+
+
+class OILPMDecomposition(namedtuple('OILPMDecomposition', [
+        'subclassifiers', 'leftover', 'non_expanded', 'complete', 'gap'])):
+    """ Full result of `minimize_oi_lpm` (see its full_result argument).
+
+    Attributes:
+        subclassifiers: The list of OI and LPM subclassifiers.
+        leftover: Classifier with leftover rules.
+        non_expanded: The list of non-expanded subclassifiers (None if they
+            have not been requested).
+        complete: False if the optimization has been truncated by the time budget.
+        gap: The gap between the number of subclassifiers and the lower bound
+            (None if it has not been requested or some rules are left over).
+    """
+
+    __slots__ = ()
+
 
 def expand(vmr_entry, bits):
     """ Performs an expansion of set of bits in the given entry.
@@ -40,26 +84,160 @@ def _chain2bits(bitchain, bitwidth):
     return tuple(chain(*_chain2diffs(bitchain + [list(range(bitwidth))])))
 
 
+def _complement(size, indices):
+    """ Returns sorted indices from range(size) that are not in indices."""
+    keep = np.ones(size, dtype=bool)
+    keep[np.fromiter(indices, dtype=np.intp)] = False
+    return np.flatnonzero(keep)
+
+
+def _check_cancelled(cancelled):
+    """ Raises CancelledError if the computation has been cancelled."""
+    if cancelled is not None and cancelled():
+        raise CancelledError()
+
+
+def _run_async(function, args, kwargs, executor):
+    """ Runs function in the background and returns Future of its result.
+
+    The returned future stays pending until function finishes, so that it can
+    be cancelled at any time. The function receives the future's `cancelled`
+    method as the `cancelled` argument and must poll it.
+
+    Args:
+        function: Function to run.
+        args: Positional arguments.
+        kwargs: Keyword arguments.
+        executor: Executor to run function in (a new thread if None).
+
+    Returns:
+        concurrent.futures.Future instance.
+    """
+    future = Future()
+
+    def run():
+        try:
+            result = function(*args, cancelled=future.cancelled, **kwargs)
+        except CancelledError:
+            return
+        except BaseException as exception:  # pylint: disable=broad-except
+            _set_outcome(future.set_exception, exception)
+        else:
+            _set_outcome(future.set_result, result)
+
+    if executor is None:
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+    else:
+        executor.submit(run)
+    return future
+
+
+def _set_outcome(setter, outcome):
+    """ Sets future's outcome, unless the future has been cancelled meanwhile."""
+    try:
+        setter(outcome)
+    except _InvalidStateError:
+        pass
+
+
+def _deadline(time_budget):
+    """ Returns the deadline for a given time budget in seconds (None if unlimited)."""
+    return None if time_budget is None else _clock() + time_budget
+
+
+def _expired(deadline):
+    return deadline is not None and _clock() >= deadline
+
+
+def _time_left(deadline):
+    """ Returns the time budget left until the deadline (None if unlimited)."""
+    return None if deadline is None else max(deadline - _clock(), 0.0)
+
+
+def _best_subgroup(handle, max_width, only_exact, algo, deadline, num_starts, seed):
+    """ Runs `p4t_native.best_subgroup` with the time left until the deadline.
+
+    Returns:
+        Triple of OI bits, OI indices and whether the search has completed
+        before the deadline (otherwise the group is completed greedily).
+    """
+    return p4t_native.best_subgroup(
+        handle, max_width, only_exact, algo, time_budget=_time_left(deadline),
+        num_starts=num_starts, seed=seed, report_complete=True)
+
+
 def set_number_of_threads(num_threads):
     """ Sets the number of threads to be used by an optimization engine."""
     p4t_native.set_num_threads(num_threads)
 
 
-def minimize_num_groups(classifier):
+def lower_bound_num_groups(classifier):
+    """ Calculates the lower bound on the number of LPM groups covering the classifier.
+
+    Rules whose supports form an antichain (none contains another) must go to
+    different LPM groups. The maximum antichain is found, so the bound is
+    exact: `minimize_num_groups` always reaches it. It does not bound groups
+    that are both LPM and OI in general, because their LPM property concerns
+    supports restricted to the selected bits, which can make an antichain
+    nested (only if all bits are kept and no rules are expanded, it does).
+
+    Args:
+        classifier: Original classifier.
+
+    Returns:
+        The size of the maximum antichain of rule supports.
+    """
+    return len(p4t_native.max_antichain(classifier))
+
+
+def lower_bound_num_oi_groups(classifier):
+    """ Calculates the lower bound on the number of OI groups covering the classifier.
+
+    Rules that match a common packet intersect under any choice of bits, so
+    they must go to different OI groups. Candidate packets are taken from
+    rules' values, so the bound is not necessarily tight.
+
+    Args:
+        classifier: Original classifier.
+
+    Returns:
+        The number of rules matching a common packet.
+    """
+    return len(p4t_native.max_overlap(classifier))
+
+
+def _gap(subclassifiers, leftover, lower_bound):
+    """ Returns the gap between the number of groups and the lower bound.
+
+    The gap is None if some rules are left over, because the bound concerns
+    groups that cover the whole classifier.
+    """
+    if len(leftover) > 0:
+        return None
+    return len(subclassifiers) - lower_bound
+
+
+def minimize_num_groups(classifier, report_gap=False):
     """ Splits the classifier into the minimal possible number of LPM classifiers.
 
     Args:
         classifier: Original classifier.
+        report_gap: Whether the gap to `lower_bound_num_groups` should be returned.
 
     Returns:
-        The list of LPM classifiers equivalent to the original.
+        The list of LPM classifiers equivalent to the original. If report_gap
+        is True, the pair of the list and the gap (always zero).
     """
     partition, partition_indices = p4t_native.min_pmgr(classifier)
 
     subclassifiers = []
     for bitchain, indices in zip(partition, partition_indices):
-        subclassifiers.append(classifier.subset(indices).reorder(_chain2bits(bitchain, classifier.bit_width), match_type='lpm'))
+        subclassifiers.append(classifier.subset_view(indices).reorder(_chain2bits(bitchain, classifier.bit_width), match_type='lpm'))
 
+    if report_gap:
+        return subclassifiers, len(subclassifiers) - lower_bound_num_groups(classifier)
     return subclassifiers
 
 
@@ -78,51 +256,108 @@ def maximize_coverage_bounded(classifiers, max_num_groups):
     subclassifiers = []
     traditionals = []
     for classifier, (partition, partition_indices) in zip(classifiers, zip(n_partitions, n_partition_indices)):
-        remaining_indices = set(range(len(classifier)))
+        covered_indices = []
 
         for bitchain, indices in zip(partition, partition_indices):
-            subclassifiers.append(classifier.subset(indices).reorder(_chain2bits(bitchain, classifier.bit_width)))
-            remaining_indices -= set(indices)
+            subclassifiers.append(classifier.subset_view(indices).reorder(_chain2bits(bitchain, classifier.bit_width)))
+            covered_indices.extend(indices)
 
-        traditionals.append(classifier.subset(remaining_indices))
+        traditionals.append(classifier.subset_view(_complement(len(classifier), covered_indices)))
 
     return subclassifiers, traditionals
 
 
+def coverage_curve(classifiers, max_num_groups):
+    """ Calculates the number of rules covered by the limited number of LPM groups.
+
+    Unlike calling `maximize_coverage_bounded` for every number of groups,
+    the whole curve is obtained in a single solve.
+
+    Args:
+        classifiers: The set of original classifiers.
+        max_num_groups: The maximal number of groups.
+
+    Returns:
+        The list, whose (k - 1)-th element is the maximal number of rules
+        covered by k groups, for k = 1, ..., max_num_groups.
+    """
+    return list(p4t_native.min_bmgr_coverage(classifiers, max_num_groups))
+
+
 def minimize_oi_lpm(classifier, max_width, algo, max_num_groups,
-                    max_expanded_bits=None, provide_non_expanded=False):
+                    max_expanded_bits=None, provide_non_expanded=False, cancelled=None,
+                    time_budget=None, num_starts=8, seed=0, report_gap=False, full_result=False):
     """ Minimizes the number of subclassifiers, which are both LPM and OI.
 
     Args:
         classifier: Initial classifier.
         max_width: Maximal allowed classification width in the resulting subclassifiers.
-        algo: Algorithm to use (Possible values 'icnp_oi', 'incp_blockers', 'min_similarity')
+        algo: Algorithm to use (Possible values 'icnp_oi', 'incp_blockers',
+            'icnp_multistart', 'min_similarity'). 'coloring' is not supported,
+            as it would color all remaining rules for every single group.
         max_num_groups: Maximal allowed number of subclassifiers.
         max_expanded_bits: Maximal allowed number of expanded bits.
         provide_non_expanded: Whether non-expanded versions should be returned.
+        cancelled: Optional callable that is polled between groups, if it
+            returns True, CancelledError is raised.
+        time_budget: Optional time limit in seconds. When it runs out, the
+            groups found so far are returned (the group under construction
+            is completed greedily).
+        num_starts: Number of trajectories tried by 'icnp_multistart' (the
+            first one is the 'icnp_blockers' trajectory, the others are
+            randomly perturbed). Trajectories run on `set_number_of_threads` threads.
+        seed: Random seed of 'icnp_multistart'.
+        report_gap: Whether the gap between the number of subclassifiers and
+            the lower bound should be returned (the bound is
+            `lower_bound_num_oi_groups`, or `lower_bound_num_groups` if it is
+            larger, rules are not expanded and `max_width` keeps all bits).
+            Requires full_result.
+        full_result: Whether an instance of OILPMDecomposition should be
+            returned, which also tells whether the optimization has completed.
 
     Returns:
         Pair of subclassifiers list and classifier with leftover rules. If
-        provide_non_expanded is True, then the third element in a tuple  is
-        a list of non-expanded classifiers.
+        provide_non_expanded is True, then the third element in a tuple is
+        a list of non-expanded classifiers. If full_result is True, an
+        instance of OILPMDecomposition.
     """
     assert max_expanded_bits is not None or not provide_non_expanded
+    assert full_result or not report_gap
+    if algo == 'coloring':
+        raise ValueError("coloring is not supported by minimize_oi_lpm, use decompose_oi")
+
+    if report_gap:
+        lower_bound = lower_bound_num_oi_groups(classifier)
+        if max_expanded_bits is None and max_width >= classifier.bit_width:
+            lower_bound = max(lower_bound, lower_bound_num_groups(classifier))
+
+    deadline = _deadline(time_budget)
+    complete = True
 
     subclassifiers = []
     non_expanded_subclassifiers = []
+    handle = p4t_native.ClassifierHandle(classifier)
     while len(classifier) > 0 and len(subclassifiers) < max_num_groups:
+        _check_cancelled(cancelled)
+        if _expired(deadline):
+            complete = False
+            break
         p4t_native.log(
             "OI-LPM has started for group #{:d}".format(len(subclassifiers) + 1))
 
-        oi_bits, oi_indices = p4t_native.best_subgroup(classifier, max_width, False, algo)
-        oi_classifier = classifier.subset(oi_indices).reorder(oi_bits)
+        oi_bits, oi_indices, complete = _best_subgroup(
+            handle, max_width, False, algo, deadline, num_starts, seed)
+        if len(oi_indices) == 0:
+            break
+        oi_classifier = classifier.subset_view(oi_indices).reorder(oi_bits)
+        oi_handle = handle.subset(oi_indices).reorder(oi_bits)
 
         if max_expanded_bits is None:
-            [[bitchain]], [[lpm_indices]] = p4t_native.min_bmgr([oi_classifier], 1)
-            subclassifiers.append(oi_classifier.subset(lpm_indices).reorder(_chain2bits(bitchain, oi_classifier.bit_width)))
+            [[bitchain]], [[lpm_indices]] = p4t_native.min_bmgr([oi_handle], 1)
+            subclassifiers.append(oi_classifier.subset_view(lpm_indices).reorder(_chain2bits(bitchain, oi_classifier.bit_width)))
         else:
             bitchain, lpm_indices, expansions = p4t_native.min_bmgr1_w_expansions(
-                oi_classifier, max_expanded_bits)
+                oi_handle, max_expanded_bits)
 
             expanded = oi_classifier.subset([])
             for i, exp in zip(lpm_indices, expansions):
@@ -131,44 +366,170 @@ def minimize_oi_lpm(classifier, max_width, algo, max_num_groups,
 
             if provide_non_expanded:
                 non_expanded_subclassifiers.append(
-                    oi_classifier.subset(lpm_indices).reorder(
+                    oi_classifier.subset_view(lpm_indices).reorder(
                         _chain2bits(bitchain, oi_classifier.bit_width)))
 
             subclassifiers.append(expanded.reorder(
                 _chain2bits(bitchain, oi_classifier.bit_width)))
 
-        classifier = classifier.subset(set(range(len(classifier))) - set(oi_indices[i] for i in lpm_indices))
+        remaining = _complement(len(classifier), oi_indices[lpm_indices])
+        classifier = classifier.subset_view(remaining)
+        handle = handle.subset(remaining)
     
         p4t_native.log("OI decomposition has finished")
 
+        if not complete:
+            break
+
+    if full_result:
+        return OILPMDecomposition(
+            subclassifiers, classifier, non_expanded_subclassifiers if provide_non_expanded else None,
+            complete, _gap(subclassifiers, classifier, lower_bound) if report_gap else None)
     if provide_non_expanded:
         return subclassifiers, classifier, non_expanded_subclassifiers
-    else:
-        return subclassifiers, classifier
+    return subclassifiers, classifier
+
+
+def minimize_oi_lpm_async(classifier, max_width, algo, max_num_groups,
+                          max_expanded_bits=None, provide_non_expanded=False, time_budget=None,
+                          num_starts=8, seed=0, report_gap=False, full_result=False, executor=None):
+    """ Runs `minimize_oi_lpm` in the background.
+
+    Native computations release the GIL, so several optimizations can run in
+    parallel. Cancelling the returned future stops the optimization before
+    the next group.
+
+    Args:
+        executor: Executor to run optimization in (a new thread if None).
+        Others are the same as in `minimize_oi_lpm`.
+
+    Returns:
+        concurrent.futures.Future of `minimize_oi_lpm` result.
+    """
+    return _run_async(
+        minimize_oi_lpm, (classifier, max_width, algo, max_num_groups),
+        dict(max_expanded_bits=max_expanded_bits, provide_non_expanded=provide_non_expanded,
+             time_budget=time_budget, num_starts=num_starts, seed=seed, report_gap=report_gap,
+             full_result=full_result),
+        executor)
 
 
-def decompose_oi(classifier, max_width, algo, only_exact=False, max_num_groups=None):
+def decompose_oi(classifier, max_width, algo, only_exact=False, max_num_groups=None, cancelled=None,
+                 time_budget=None, num_starts=8, seed=0, report_gap=False, full_result=False):
     """ Decomposes given classifier into a set of order-independent subclassifiers.
 
     Args:
         classifier: Initial classifier.
         max_width: Maximal allowed classification width in the resulting subclassifiers.
-        algo: Algorithm to use (Possible values 'icnp_oi', 'incp_blockers', 'min_similarity')
+        algo: Algorithm to use (Possible values 'icnp_oi', 'incp_blockers',
+            'icnp_multistart', 'min_similarity', 'coloring'). 'coloring'
+            produces all groups at once by coloring the intersection graph
+            of rules under the least similar bits (when the time budget runs
+            out, only the rules colored so far are grouped).
         only_exact: Whether only exact bits should be allowed (False by default).
         max_num_groups: Maximal allowed number of subclassifiers.
+        cancelled: Optional callable that is polled between groups, if it
+            returns True, CancelledError is raised.
+        time_budget: Optional time limit in seconds. When it runs out, the
+            groups found so far are returned (the group under construction
+            is completed greedily).
+        num_starts: Number of trajectories tried by 'icnp_multistart'.
+        seed: Random seed of 'icnp_multistart'.
+        report_gap: Whether the gap between the number of subclassifiers and
+            `lower_bound_num_oi_groups` should be returned. Requires full_result.
+        full_result: Whether an instance of OIDecomposition should be
+            returned, which also tells whether the decomposition has completed.
 
     Returns:
-        Pair of subclassifiers list and classifier with leftover rules.
+        Pair of subclassifiers list and classifier with leftover rules. If
+        full_result is True, an instance of OIDecomposition.
     """
+    assert full_result or not report_gap
 
     p4t_native.log("OI decomposition has started: exact={:s}".format(str(only_exact)))
 
+    lower_bound = lower_bound_num_oi_groups(classifier) if report_gap else None
+
+    deadline = _deadline(time_budget)
+    complete = True
+
+    if algo == 'coloring':
+        _check_cancelled(cancelled)
+        subclassifiers, classifier, complete = _decompose_oi_coloring(
+            classifier, max_width, only_exact, max_num_groups, deadline)
+        p4t_native.log("OI decomposition has {:s}".format("completed" if complete else "been truncated"))
+        return _oi_decomposition(subclassifiers, classifier, complete, lower_bound, full_result)
+
     subclassifiers = []
+    handle = p4t_native.ClassifierHandle(classifier)
     while (max_num_groups is None or len(subclassifiers) < max_num_groups) and len(classifier) > 0:
-        bits, indices = p4t_native.best_subgroup(classifier, max_width, only_exact, algo)
-        subclassifiers.append(classifier.subset(indices).reorder(bits))
-        classifier = classifier.subset(set(range(len(classifier))) - set(indices))
+        _check_cancelled(cancelled)
+        if _expired(deadline):
+            complete = False
+            break
+        bits, indices, complete = _best_subgroup(
+            handle, max_width, only_exact, algo, deadline, num_starts, seed)
+        if len(indices) == 0:
+            break
+        subclassifiers.append(classifier.subset_view(indices).reorder(bits))
+        remaining = _complement(len(classifier), indices)
+        classifier = classifier.subset_view(remaining)
+        handle = handle.subset(remaining)
+        if not complete:
+            break
 
-    p4t_native.log("OI decomposition has completed")
+    p4t_native.log("OI decomposition has {:s}".format("completed" if complete else "been truncated"))
 
-    return subclassifiers, classifier
+    return _oi_decomposition(subclassifiers, classifier, complete, lower_bound, full_result)
+
+
+def _oi_decomposition(subclassifiers, leftover, complete, lower_bound, full_result):
+    """ Returns `decompose_oi` result in the requested shape."""
+    if not full_result:
+        return subclassifiers, leftover
+    return OIDecomposition(
+        subclassifiers, leftover, complete,
+        _gap(subclassifiers, leftover, lower_bound) if lower_bound is not None else None)
+
+
+def _decompose_oi_coloring(classifier, max_width, only_exact, max_num_groups, deadline):
+    """ Decomposes classifier into OI subclassifiers with a single native call.
+
+    The intersection graph of rules under the chosen bits is colored, so
+    that every color is an OI group.
+
+    Returns:
+        Triple of subclassifiers list, classifier with leftover rules and
+        whether the coloring has completed before the deadline.
+    """
+    if len(classifier) == 0:
+        return [], classifier, True
+
+    bits, groups, complete = p4t_native.oi_coloring(
+        classifier, max_width, only_exact, time_budget=_time_left(deadline))
+    groups = groups[:max_num_groups]
+
+    subclassifiers = [classifier.subset_view(indices).reorder(bits) for indices in groups]
+    covered = np.concatenate(groups) if groups else []
+    return subclassifiers, classifier.subset_view(_complement(len(classifier), covered)), complete
+
+
+def decompose_oi_async(classifier, max_width, algo, only_exact=False, max_num_groups=None,
+                       time_budget=None, num_starts=8, seed=0, report_gap=False, full_result=False,
+                       executor=None):
+    """ Runs `decompose_oi` in the background.
+
+    Cancelling the returned future stops the decomposition before the next group.
+
+    Args:
+        executor: Executor to run decomposition in (a new thread if None).
+        Others are the same as in `decompose_oi`.
+
+    Returns:
+        concurrent.futures.Future of `decompose_oi` result.
+    """
+    return _run_async(
+        decompose_oi, (classifier, max_width, algo),
+        dict(only_exact=only_exact, max_num_groups=max_num_groups, time_budget=time_budget,
+             num_starts=num_starts, seed=seed, report_gap=report_gap, full_result=full_result),
+        executor)
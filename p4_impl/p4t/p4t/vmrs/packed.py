@@ -0,0 +1,286 @@
+""" Contains array-backed VMR implementation."""
+
+import numpy as np
+from bitstring import Bits
+
+from p4t.vmrs.abstract import AbstractVMR
+from p4t.vmrs.simple import SimpleVMREntry
+
+
+def num_words(bit_width):
+    """ Number of uint64 words required to store bit_width bits."""
+    return (bit_width + 63) // 64
+
+
+def pack_bits(bits):
+    """ Packs (n, width) matrix of bool into (n, ceil(width / 64)) uint64 words.
+
+    Bit i is stored in word i // 64 at position i % 64 (the same layout as
+    in the native extension).
+    """
+    bits = np.asarray(bits, dtype=np.uint8)
+    num_rows, width = bits.shape
+    padded = np.zeros((num_rows, num_words(width) * 64), dtype=np.uint8)
+    padded[:, :width] = bits
+    # Reversing bits inside a word makes packbits produce big-endian words
+    packed = np.packbits(padded.reshape(num_rows, num_words(width), 64)[:, :, ::-1], axis=2)
+    return packed.view('>u8').reshape(num_rows, num_words(width)).astype(np.uint64)
+
+
+def unpack_bits(words, width):
+    """ Inverse of `pack_bits`, returns (n, width) matrix of 0/1."""
+    words = np.asarray(words)
+    num_rows, num_row_words = words.shape
+    bits = np.unpackbits(
+        words.astype('>u8').view(np.uint8).reshape(num_rows, num_row_words, 8), axis=2)
+    return bits[:, :, ::-1].reshape(num_rows, num_row_words * 64)[:, :width]
+
+
+class PackedVMR(AbstractVMR):
+    """ Target independent VMR that stores values and masks as packed uint64 matrices.
+
+    Actions and priorities are kept in parallel lists. Entries returned by
+    indexing are `SimpleVMREntry` instances with `bitstring.Bits` values and masks.
+
+    Attributes:
+        default_action: The action that must be executed on NO_MATCH.
+        version: Counter that is incremented on every modification.
+    """
+
+    def __init__(self, bit_width, entries=None, default_action=None):
+        """ Initializes PackedVMR instance.
+
+        Args:
+            bit_width: Number of classification bits.
+            entries: Initial entries (must be compatible with SVMREntry).
+            default_action: Action to execute on NO_MATCH.
+        """
+        self._bit_width = bit_width
+        self._size = 0
+        self._values = np.zeros((0, num_words(bit_width)), dtype=np.uint64)
+        self._masks = np.zeros((0, num_words(bit_width)), dtype=np.uint64)
+        self._actions = []
+        self._priorities = []
+        self._default_action = default_action
+        self._version = 0
+        if entries is not None:
+            for entry in entries:
+                self.append(entry)
+
+    def _reserve(self, size):
+        """ Grows underlying arrays geometrically to hold at least size entries."""
+        if size <= len(self._values):
+            return
+        capacity = max(size, 2 * len(self._values), 16)
+        for name in ('_values', '_masks'):
+            old = getattr(self, name)
+            new = np.zeros((capacity, old.shape[1]), dtype=np.uint64)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def _pack_entry(self, entry):
+        self._check_bit_width(len(entry.value))
+        self._check_bit_width(len(entry.mask))
+        return pack_bits([[bool(x) for x in entry.value], [bool(x) for x in entry.mask]])
+
+    def _normalize_index(self, i):
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError("VMR index out of range")
+        return i
+
+    def _entry(self, i):
+        value, mask = np.packbits(unpack_bits(
+            [self._values[i], self._masks[i]], self._bit_width), axis=1)
+        return SimpleVMREntry(
+            Bits(bytes=value.tobytes(), length=self._bit_width),
+            Bits(bytes=mask.tobytes(), length=self._bit_width),
+            self._actions[i], self._priorities[i])
+
+    def insert(self, i, entry):
+        words = self._pack_entry(entry)
+        i = min(max(i + self._size if i < 0 else i, 0), self._size)
+        self._reserve(self._size + 1)
+        self._values[i + 1:self._size + 1] = self._values[i:self._size].copy()
+        self._masks[i + 1:self._size + 1] = self._masks[i:self._size].copy()
+        self._values[i], self._masks[i] = words
+        self._actions.insert(i, entry.action)
+        self._priorities.insert(i, entry.priority)
+        self._size += 1
+        self._version += 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._entry(j) for j in range(*i.indices(self._size))]
+        return self._entry(self._normalize_index(i))
+
+    def __setitem__(self, i, entry):
+        if isinstance(i, slice):
+            self._set_slice(i, entry)
+            return
+        words = self._pack_entry(entry)
+        i = self._normalize_index(i)
+        self._values[i], self._masks[i] = words
+        self._actions[i] = entry.action
+        self._priorities[i] = entry.priority
+        self._version += 1
+
+    def __delitem__(self, i):
+        if isinstance(i, slice):
+            keep = np.ones(self._size, dtype=bool)
+            keep[i] = False
+            self._replace(
+                self.values[keep], self.masks[keep],
+                [x for x, k in zip(self._actions, keep) if k],
+                [x for x, k in zip(self._priorities, keep) if k])
+            return
+        i = self._normalize_index(i)
+        self._values[i:self._size - 1] = self._values[i + 1:self._size].copy()
+        self._masks[i:self._size - 1] = self._masks[i + 1:self._size].copy()
+        del self._actions[i]
+        del self._priorities[i]
+        self._size -= 1
+        self._version += 1
+
+    def __len__(self):
+        return self._size
+
+    def _set_slice(self, s, entries):
+        """ Assigns entries to a slice with the semantics of list."""
+        entries = list(entries)
+        indices = range(*s.indices(self._size))
+        if s.step is not None and s.step != 1:
+            if len(entries) != len(indices):
+                raise ValueError("attempt to assign sequence of size {:d} to extended slice of size {:d}".format(
+                    len(entries), len(indices)))
+            for i, entry in zip(indices, entries):
+                self[i] = entry
+            return
+
+        start, stop = indices.start, max(indices.start, indices.stop)
+        words = np.zeros((2, len(entries), self._values.shape[1]), dtype=np.uint64)
+        for k, entry in enumerate(entries):
+            words[:, k] = self._pack_entry(entry)
+        self._replace(
+            np.concatenate([self.values[:start], words[0], self.values[stop:]]),
+            np.concatenate([self.masks[:start], words[1], self.masks[stop:]]),
+            self._actions[:start] + [x.action for x in entries] + self._actions[stop:],
+            self._priorities[:start] + [x.priority for x in entries] + self._priorities[stop:])
+
+    def _replace(self, values, masks, actions, priorities):
+        """ Replaces all entries with the given ones."""
+        self._values, self._masks = values, masks
+        self._actions, self._priorities = actions, priorities
+        self._size = len(values)
+        self._version += 1
+
+    def extend_packed(self, values, masks, actions=None, priorities=None):
+        """ Appends entries given as packed arrays.
+
+        Args:
+            values: (n, ceil(bit_width / 64)) uint64 array of values.
+            masks: (n, ceil(bit_width / 64)) uint64 array of masks.
+            actions: Sequence of n actions (None for all, if not supplied).
+            priorities: Sequence of n priorities (None for all, if not supplied).
+        """
+        values = np.asarray(values, dtype=np.uint64)
+        masks = np.asarray(masks, dtype=np.uint64)
+        if values.shape != masks.shape or values.shape[1:] != self._values.shape[1:]:
+            raise ValueError("Expected packed arrays of shape (n, {:d}), got {} and {}".format(
+                self._values.shape[1], values.shape, masks.shape))
+        num_new = len(values)
+        self._reserve(self._size + num_new)
+        self._values[self._size:self._size + num_new] = values
+        self._masks[self._size:self._size + num_new] = masks
+        self._actions.extend(actions if actions is not None else [None] * num_new)
+        if isinstance(priorities, np.ndarray):
+            priorities = priorities.tolist()
+        self._priorities.extend(priorities if priorities is not None else [None] * num_new)
+        self._size += num_new
+        self._version += 1
+
+    def extend_from_chunks(self, chunks):
+        """ Appends entries that are supplied in chunks.
+
+        Args:
+            chunks: Iterable of chunks, each chunk is either a sequence of
+                entries or an object with `values`, `masks` and `priorities`
+                packed arrays (e.g., PackedRules of the testing suite).
+        """
+        for chunk in chunks:
+            if hasattr(chunk, 'values') and hasattr(chunk, 'masks'):
+                self.extend_packed(chunk.values, chunk.masks, priorities=chunk.priorities)
+            else:
+                for entry in chunk:
+                    self.append(entry)
+
+    def extend_from(self, source, indices):
+        """ Appends entries of another PackedVMR without unpacking them.
+
+        Args:
+            source: Source PackedVMR (must have the same bit width).
+            indices: Indices of source entries to append.
+        """
+        indices = np.fromiter(indices, dtype=np.intp)
+        if len(indices) > 0 and (indices.max() >= len(source) or indices.min() < -len(source)):
+            raise IndexError("VMR index out of range")
+        self.extend_packed(
+            source.values[indices], source.masks[indices],
+            [source.actions[i] for i in indices], [source.priorities[i] for i in indices])
+
+    @property
+    def values(self):
+        """ (n, ceil(bit_width / 64)) uint64 array of packed values."""
+        return self._values[:self._size]
+
+    @property
+    def masks(self):
+        """ (n, ceil(bit_width / 64)) uint64 array of packed masks."""
+        return self._masks[:self._size]
+
+    @property
+    def actions(self):
+        """ List of entries' actions."""
+        return self._actions
+
+    @property
+    def priorities(self):
+        """ List of entries' priorities."""
+        return self._priorities
+
+    @property
+    def bit_width(self):
+        return self._bit_width
+
+    @property
+    def version(self):
+        return self._version
+
+    @property
+    def default_action(self):
+        return self._default_action
+
+    # noinspection PyMethodOverriding
+    @default_action.setter
+    def default_action(self, action):
+        self._default_action = action
+        self._version += 1
+
+    @classmethod
+    def create_instance(cls, bit_width=None, table=None):
+        if hasattr(bit_width, 'name'):
+            raise ValueError("Table was passed in place of a bit width")
+        if bit_width is None and table is None:
+            raise ValueError("Either bit width or table must be provided!")
+        if bit_width is None:
+            bit_width = sum(field.width for field, _, _ in table.match_fields)
+        return PackedVMR(bit_width)
+
+    def _check_bit_width(self, bit_width):
+        """ Verifies entry bit width. """
+        if bit_width != self._bit_width:
+            raise ValueError("Expected bit width {:d}, got {:d}".format(self._bit_width, bit_width))
+
+    def __repr__(self):
+        return "\n".join(repr(x) for x in self)
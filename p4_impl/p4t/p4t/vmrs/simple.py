@@ -93,6 +93,7 @@ class SimpleVMR(AbstractVMR):
 
     Attributes:
         default_action: The action that must be executed on NO_MATCH.
+        version: Counter that is incremented on every modification.
     """
 
     def __init__(self, bit_width, entries=None, default_action=None):
@@ -106,6 +107,7 @@ class SimpleVMR(AbstractVMR):
         self._bit_width = bit_width
         self._entries = []
         self._default_action = default_action
+        self._version = 0
         if entries is not None:
             for entry in entries:
                 self.append(entry)
@@ -113,6 +115,7 @@ class SimpleVMR(AbstractVMR):
     def insert(self, i, entry):
         self._check_bit_width(len(entry.value))
         self._entries.insert(i, entry)
+        self._version += 1
 
     def __getitem__(self, i):
         return self._entries[i]
@@ -120,17 +123,38 @@ class SimpleVMR(AbstractVMR):
     def __setitem__(self, i, entry):
         self._check_bit_width(len(entry.value))
         self._entries[i] = entry
+        self._version += 1
 
     def __delitem__(self, i):
         del self._entries[i]
+        self._version += 1
 
     def __len__(self):
         return len(self._entries)
 
+    def extend_from_chunks(self, chunks):
+        """ Appends entries that are supplied in chunks.
+
+        Chunks are consumed one by one, so a generator producing them lazily
+        never has more than one chunk alive.
+
+        Args:
+            chunks: Iterable of sequences of entries (must be compatible with SVMREntry).
+        """
+        for chunk in chunks:
+            for entry in chunk:
+                self._check_bit_width(len(entry.value))
+            self._entries.extend(chunk)
+            self._version += 1
+
     @property
     def bit_width(self):
         return self._bit_width
 
+    @property
+    def version(self):
+        return self._version
+
     @property
     def default_action(self):
         return self._default_action
@@ -139,6 +163,7 @@ class SimpleVMR(AbstractVMR):
     @default_action.setter
     def default_action(self, action):
         self._default_action = action
+        self._version += 1
 
     @classmethod
     def create_instance(cls, bit_width=None, table=None):
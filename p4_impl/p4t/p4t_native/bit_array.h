@@ -32,6 +32,10 @@ public:
         return bits_[i];
     }
 
+    void set_chunk(size_t i, BitChunk x) {
+        bits_[i] = x;
+    }
+
 private:
     std::array<BitChunk, NUM_CHUNKS> bits_; 
 };
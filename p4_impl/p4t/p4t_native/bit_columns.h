@@ -0,0 +1,140 @@
+#ifndef BIT_COLUMNS_H
+#define BIT_COLUMNS_H
+
+#include "common.h"
+#include "filter.h"
+
+namespace p4t {
+
+/// Column-oriented index of a filter set. For every bit it keeps packed sets
+/// of the filters that have the bit exact and that have it equal to one, so
+/// that the numbers of zeros, ones and ANY are popcounts of the columns
+/// restricted to the filters that have not been dropped.
+template<size_t W>
+class BitColumns {
+public:
+    using BitArray = typename Filter<W>::BitArray;
+
+public:
+    explicit BitColumns(vector<Filter<W>> const& filters)
+        : width_{filters.empty() ? 0 : filters[0].size()}, num_words_{num_words(filters.size())},
+          rows_(filters.size()), alive_(num_words_), exact_(width_ * num_words_), ones_(width_ * num_words_),
+          zeros_count_(width_), ones_count_(width_), dontcare_count_(width_) {
+        for (auto i = 0u; i < filters.size(); i++) {
+            rows_[i] = i;
+            alive_[i / BITS_PER_WORD] |= uint64_t(1) << (i % BITS_PER_WORD);
+
+            auto const& filter = filters[i];
+            for (auto chunk = 0u; chunk < BitArray::NUM_CHUNKS; chunk++) {
+                for (auto bits = filter.mask().chunk(chunk); bits != 0; bits &= bits - 1) {
+                    auto const bit = chunk * BitArray::BITS_PER_CHUNK + __builtin_ctzll(bits);
+                    exact_[bit * num_words_ + i / BITS_PER_WORD] |= uint64_t(1) << (i % BITS_PER_WORD);
+                    if (filter.value().get(bit)) {
+                        ones_[bit * num_words_ + i / BITS_PER_WORD] |= uint64_t(1) << (i % BITS_PER_WORD);
+                    }
+                }
+            }
+        }
+        count();
+    }
+
+    /// Number of filters that have not been dropped
+    auto size() const {
+        return rows_.size();
+    }
+
+    auto width() const {
+        return width_;
+    }
+
+    auto zeros(size_t bit) const {
+        return zeros_count_[bit];
+    }
+
+    auto ones(size_t bit) const {
+        return ones_count_[bit];
+    }
+
+    auto dontcare(size_t bit) const {
+        return dontcare_count_[bit];
+    }
+
+    /// Returns the bits that are exact in all filters
+    auto exact_bits(vector<int> const& bits) const {
+        vector<int> result{};
+        for (auto bit : bits) {
+            if (dontcare_count_[bit] == 0) {
+                result.emplace_back(bit);
+            }
+        }
+        return result;
+    }
+
+    /// Returns indices of the filters that have no ANY among the bits of the mask
+    auto exact_rows(BitArray const& mask) const {
+        auto rows = alive_;
+        for (auto bit = 0u; bit < width_; bit++) {
+            if (mask.get(bit)) {
+                for (auto word = 0u; word < num_words_; word++) {
+                    rows[word] &= exact_[bit * num_words_ + word];
+                }
+            }
+        }
+
+        vector<int> result{};
+        for (auto i = 0; i < int(rows_.size()); i++) {
+            if ((rows[rows_[i] / BITS_PER_WORD] >> (rows_[i] % BITS_PER_WORD)) & 1) {
+                result.emplace_back(i);
+            }
+        }
+        return result;
+    }
+
+    /// Keeps only the filters with the given (increasing) indices
+    void keep(vector<int> const& indices) {
+        vector<int> rows{};
+        rows.reserve(indices.size());
+        std::fill(begin(alive_), end(alive_), 0);
+        for (auto i : indices) {
+            rows.emplace_back(rows_[i]);
+            alive_[rows_[i] / BITS_PER_WORD] |= uint64_t(1) << (rows_[i] % BITS_PER_WORD);
+        }
+        rows_ = std::move(rows);
+        count();
+    }
+
+private:
+    void count() {
+        for (auto bit = 0u; bit < width_; bit++) {
+            auto num_exact = 0;
+            auto num_ones = 0;
+            for (auto word = 0u; word < num_words_; word++) {
+                num_exact += __builtin_popcountll(exact_[bit * num_words_ + word] & alive_[word]);
+                num_ones += __builtin_popcountll(ones_[bit * num_words_ + word] & alive_[word]);
+            }
+            zeros_count_[bit] = num_exact - num_ones;
+            ones_count_[bit] = num_ones;
+            dontcare_count_[bit] = int(rows_.size()) - num_exact;
+        }
+    }
+
+private:
+    size_t width_;
+    size_t num_words_;
+
+    /// Original indices of the filters that have not been dropped
+    vector<int> rows_;
+    vector<uint64_t> alive_;
+
+    /// Columns: words [bit * num_words_, (bit + 1) * num_words_) hold the set of filters
+    vector<uint64_t> exact_;
+    vector<uint64_t> ones_;
+
+    vector<int> zeros_count_;
+    vector<int> ones_count_;
+    vector<int> dontcare_count_;
+};
+
+}
+
+#endif // BIT_COLUMNS_H
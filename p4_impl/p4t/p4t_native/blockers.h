@@ -0,0 +1,323 @@
+#ifndef BLOCKERS_H
+#define BLOCKERS_H
+
+#include <numeric>
+#include <unordered_map>
+#include <parallel/algorithm>
+#include <boost/functional/hash.hpp>
+
+#include "common.h"
+#include "filter.h"
+
+namespace p4t {
+
+/// Packed (number of filters) x (filter width) bit matrix of blockers
+template<size_t W>
+class BlockerMatrix {
+public:
+    using Row = typename Filter<W>::BitArray;
+
+    BlockerMatrix(size_t num_rows, size_t width)
+        : rows_(num_rows, Row{}), width_{width} {
+    }
+
+    auto size() const {
+        return rows_.size();
+    }
+
+    auto width() const {
+        return width_;
+    }
+
+    auto get(size_t i, size_t bit) const -> bool {
+        return rows_[i].get(bit);
+    }
+
+    void set(size_t i, size_t bit) {
+        rows_[i].set(bit, true);
+    }
+
+    /// Marks all bits as blockers of the i-th filter
+    void set_all(size_t i) {
+        for (auto chunk = 0u; chunk < Row::NUM_CHUNKS; chunk++) {
+            auto const first_bit = chunk * Row::BITS_PER_CHUNK;
+            if (first_bit + Row::BITS_PER_CHUNK <= width_) {
+                rows_[i].set_chunk(chunk, ~uint64_t(0));
+            } else if (first_bit < width_) {
+                rows_[i].set_chunk(chunk, (uint64_t(1) << (width_ - first_bit)) - 1);
+            }
+        }
+    }
+
+    /// Returns the number of filters blocked by each bit
+    auto count_by_bit() const -> vector<int> {
+        vector<int> result(width_);
+        for (auto const& row : rows_) {
+            for (auto chunk = 0u; chunk < Row::NUM_CHUNKS; chunk++) {
+                for (auto bits = row.chunk(chunk); bits != 0; bits &= bits - 1) {
+                    result[chunk * Row::BITS_PER_CHUNK + __builtin_ctzll(bits)]++;
+                }
+            }
+        }
+        return result;
+    }
+
+private:
+    vector<Row> rows_;
+    size_t width_;
+};
+
+/// Maintains blockers of filters while bits are removed from the mask and
+/// filters are dropped: bit b blocks filter i if removing b from the mask
+/// makes filter i intersect some preceding filter (if filter i already
+/// intersects a preceding filter, all bits block it).
+///
+/// Filters are bucketed by the values of bits that are exact in all filters.
+/// Two filters can only produce blockers if their buckets differ in at most
+/// one bit, so only the own bucket and the buckets at distance one are scanned.
+/// For every filter the engine keeps the preceding filters that differ from it
+/// in a single bit, so that removing an exact bit only requires to look for
+/// pairs that differed in the removed bit and in one other bit.
+///
+/// Building and updating stop as soon as the deadline expires, blockers are
+/// incomplete then and the engine must not be used anymore.
+template<size_t W>
+class BlockerEngine {
+public:
+    using BitArray = typename Filter<W>::BitArray;
+
+    BlockerEngine(vector<Filter<W>> const& filters, BitArray const& mask, 
+                  Deadline const& deadline = Deadline{})
+        : mask_{mask} {
+        rebuild(filters, deadline);
+    }
+
+    auto size() const {
+        return singles_.size();
+    }
+
+    auto blockers() const -> BlockerMatrix<W> {
+        BlockerMatrix<W> result(singles_.size(), width_);
+        for (auto i = 0u; i < singles_.size(); i++) {
+            if (blocked_all_[i]) {
+                result.set_all(i);
+                continue;
+            }
+            for (auto const& single : singles_[i]) {
+                result.set(i, single.second);
+            }
+        }
+        return result;
+    }
+
+    /// Removes bits from the mask and keeps only the given filters.
+    ///
+    /// Args:
+    ///     filters: Filters that are kept (in the original order).
+    ///     rm_bits: Bits to remove from the mask.
+    ///     kept: Increasing indices of the kept filters.
+    ///     deadline: Deadline, after which the update is abandoned.
+    void update(vector<Filter<W>> const& filters, vector<int> const& rm_bits, vector<int> const& kept,
+                Deadline const& deadline = Deadline{}) {
+        assert(filters.size() == kept.size());
+
+        if (rm_bits.size() != 1 || !exact_.get(rm_bits.front())) {
+            for (auto bit : rm_bits) {
+                mask_.set(bit, false);
+            }
+            rebuild(filters, deadline);
+            return;
+        }
+
+        auto const rm_bit = rm_bits.front();
+
+        vector<int> new_index(singles_.size(), -1);
+        for (auto k = 0u; k < kept.size(); k++) {
+            new_index[kept[k]] = k;
+        }
+
+        vector<vector<pair<int, int>>> singles(kept.size());
+        vector<char> blocked_all(kept.size(), false);
+
+        vector<int> indices(kept.size());
+        std::iota(begin(indices), end(indices), 0);
+
+        __gnu_parallel::for_each(begin(indices), end(indices),
+            [&] (auto k) {
+                if (deadline.expired()) {
+                    return;
+                }
+
+                auto const i = kept[k];
+                auto const& filter = filters[k];
+
+                for (auto const& single : singles_[i]) {
+                    if (new_index[single.first] != -1) {
+                        singles[k].emplace_back(new_index[single.first], single.second);
+                    }
+                }
+
+                // Pairs that differed in the removed bit and in at most one other bit
+                auto const neighbour = flip(key_of(filter), rm_bit);
+                for (auto j : bucket(neighbour, i)) {
+                    if (j >= i) {
+                        break;
+                    }
+                    if (new_index[j] == -1) {
+                        continue;
+                    }
+                    auto const res = Filter<W>::fast_blocker(filter, filters[new_index[j]], non_exact_);
+                    if (res.second == -1) {
+                        blocked_all[k] = true;
+                    } else if (res.first) {
+                        singles[k].emplace_back(new_index[j], res.second);
+                    }
+                }
+                for (auto bit : exact_bits_) {
+                    if (bit == rm_bit) {
+                        continue;
+                    }
+                    for (auto j : bucket(flip(neighbour, bit), i)) {
+                        if (j >= i) {
+                            break;
+                        }
+                        if (new_index[j] != -1
+                                && Filter<W>::intersect(filter, filters[new_index[j]], non_exact_)) {
+                            singles[k].emplace_back(new_index[j], bit);
+                        }
+                    }
+                }
+            }
+        );
+
+        mask_.set(rm_bit, false);
+        exact_.set(rm_bit, false);
+        exact_bits_.erase(std::find(begin(exact_bits_), end(exact_bits_), rm_bit));
+
+        singles_ = std::move(singles);
+        blocked_all_ = std::move(blocked_all);
+        fill_buckets(filters);
+    }
+
+private:
+    using Key = std::array<uint64_t, BitArray::NUM_CHUNKS>;
+
+    struct KeyHash {
+        auto operator()(Key const& key) const {
+            return boost::hash_range(begin(key), end(key));
+        }
+    };
+
+    auto key_of(Filter<W> const& filter) const {
+        Key key{};
+        for (auto chunk = 0u; chunk < BitArray::NUM_CHUNKS; chunk++) {
+            key[chunk] = filter.value().chunk(chunk) & exact_.chunk(chunk);
+        }
+        return key;
+    }
+
+    static auto flip(Key key, int bit) {
+        key[bit / BitArray::BITS_PER_CHUNK] ^= uint64_t(1) << (bit % BitArray::BITS_PER_CHUNK);
+        return key;
+    }
+
+    /// Returns indices of the filters that precede the i-th one in the bucket
+    auto bucket(Key const& key, int i) const -> vector<int> const& {
+        static vector<int> const EMPTY{};
+        auto const it = buckets_.find(key);
+        if (it == end(buckets_) || it->second.front() >= i) {
+            return EMPTY;
+        }
+        return it->second;
+    }
+
+    void fill_buckets(vector<Filter<W>> const& filters) {
+        buckets_.clear();
+        for (auto i = 0; i < int(filters.size()); i++) {
+            buckets_[key_of(filters[i])].emplace_back(i);
+        }
+    }
+
+    void rebuild(vector<Filter<W>> const& filters, Deadline const& deadline) {
+        assert(!filters.empty());
+        width_ = filters[0].size();
+
+        exact_ = mask_;
+        for (auto const& filter : filters) {
+            for (auto chunk = 0u; chunk < BitArray::NUM_CHUNKS; chunk++) {
+                exact_.set_chunk(chunk, exact_.chunk(chunk) & filter.mask().chunk(chunk));
+            }
+        }
+
+        non_exact_ = BitArray{};
+        exact_bits_.clear();
+        for (auto bit = 0u; bit < width_; bit++) {
+            if (exact_.get(bit)) {
+                exact_bits_.emplace_back(bit);
+            } else {
+                non_exact_.set(bit, mask_.get(bit));
+            }
+        }
+
+        fill_buckets(filters);
+        log()->info("...{:d} exact bits, {:d} buckets", exact_bits_.size(), buckets_.size());
+
+        singles_.assign(filters.size(), {});
+        blocked_all_.assign(filters.size(), false);
+
+        vector<int> indices(filters.size());
+        std::iota(begin(indices), end(indices), 0);
+
+        __gnu_parallel::for_each(begin(indices), end(indices),
+            [&] (auto i) {
+                if (deadline.expired()) {
+                    return;
+                }
+
+                auto const key = key_of(filters[i]);
+
+                for (auto j : bucket(key, i)) {
+                    if (j >= i) {
+                        break;
+                    }
+                    auto const res = Filter<W>::fast_blocker(filters[i], filters[j], non_exact_);
+                    if (res.second == -1) {
+                        blocked_all_[i] = true;
+                        return;
+                    } else if (res.first) {
+                        singles_[i].emplace_back(j, res.second);
+                    }
+                }
+
+                for (auto bit : exact_bits_) {
+                    for (auto j : bucket(flip(key, bit), i)) {
+                        if (j >= i) {
+                            break;
+                        }
+                        if (Filter<W>::intersect(filters[i], filters[j], non_exact_)) {
+                            singles_[i].emplace_back(j, bit);
+                        }
+                    }
+                }
+            }
+        );
+    }
+
+private:
+    BitArray mask_;
+    BitArray exact_;
+    BitArray non_exact_;
+    vector<int> exact_bits_;
+    size_t width_;
+
+    std::unordered_map<Key, vector<int>, KeyHash> buckets_;
+
+    /// Pairs (j, bit) such that the j-th filter precedes the i-th one and
+    /// differs from it only in bit
+    vector<vector<pair<int, int>>> singles_;
+    vector<char> blocked_all_;
+};
+
+}
+
+#endif // BLOCKERS_H
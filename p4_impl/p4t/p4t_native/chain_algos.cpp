@@ -1,13 +1,11 @@
-#include <boost/graph/adjacency_list.hpp>
-#include <boost/graph/max_cardinality_matching.hpp>
-#include <boost/graph/breadth_first_search.hpp>
-#include <boost/graph/successive_shortest_path_nonnegative_weights.hpp>
+#include <numeric>
 
 #include "chain_algos.h"
+#include "max_flow.h"
+#include "min_cost_flow.h"
 
 namespace {
 
-using namespace boost;
 using namespace p4t;
 
 using p4t::tuple;
@@ -15,109 +13,299 @@ using p4t::pair;
 using std::begin;
 using std::end;
 
-using MaxMatchingGraph = adjacency_list<vecS, vecS, undirectedS>;
-
-using AntichainGraph = adjacency_list<vecS, vecS, directedS>;
-
-using MinCostMaxFlowTraits = adjacency_list_traits<vecS, vecS, directedS>;
-using MinCostMaxFlowGraph = adjacency_list<vecS, vecS, directedS, no_property,
-        property<edge_capacity_t, int,
-            property<edge_residual_capacity_t, int,
-                property<edge_reverse_t, MinCostMaxFlowTraits::edge_descriptor,
-                    property<edge_weight_t, int>
-                >
-            >
-        >
-    >;
-
-template<class VD>
-auto calculate_chains(vector<Support> const& ss, vector<VD> const& mate, VD absent) {
-    // Note that vertices mapped to itself are not considered start  vertices and, thus, they won't be added to any chain 
-    vector<bool> is_chain_start(ss.size(), true);
-    for (VD i = 0; i < ss.size(); i++) {
-        if (mate[i] != absent) {
-            is_chain_start[mate[i] - ss.size()] = false;
+/// Transitive reduction (Hasse diagram) of the proper subset order: edges go
+/// from every support to the supports that cover it, i.e., its minimal proper supersets
+auto find_hasse_diagram(vector<Support> const& ss) -> vector<vector<int>> {
+    auto const masks = to_masks(ss);
+
+    vector<int> order(ss.size());
+    std::iota(begin(order), end(order), 0);
+    std::stable_sort(begin(order), end(order), [&ss] (auto i, auto j) {
+        return ss[i].size() < ss[j].size();
+    });
+
+    vector<vector<int>> covers(ss.size());
+    #pragma omp parallel for schedule(dynamic)
+    for (auto k = 0u; k < order.size(); k++) {
+        auto const i = order[k];
+        auto const first = std::upper_bound(begin(order) + k, end(order), i, [&ss] (auto x, auto y) {
+            return ss[x].size() < ss[y].size();
+        });
+        // Supersets are visited in order of increasing size, so a superset is
+        // a cover unless it contains one of the covers found before it
+        for (auto it = first; it != end(order); ++it) {
+            auto const j = *it;
+            if (!is_subset(masks[i], masks[j])) {
+                continue;
+            }
+            auto const is_cover = std::none_of(begin(covers[i]), end(covers[i]), [&masks, j] (auto c) {
+                return is_subset(masks[c], masks[j]);
+            });
+            if (is_cover) {
+                covers[i].emplace_back(j);
+            }
         }
     }
 
-    vector<vector<Support>> result{}; 
-    for (VD i = 0; i < ss.size(); ++i) {
-        if (is_chain_start[i]) {
-            vector<Support> chain{};
-            for (VD j = i; j != absent; j = mate[j] - ss.size()) {
-                chain.emplace_back(ss[j]);
-                if (mate[j] == absent) {
+    return covers;
+}
+
+/// Minimum chain cover of supports as a minimum flow with lower bounds on the
+/// Hasse diagram. Every support is split into the in (v) and out (n + v)
+/// vertices joined by an edge that must carry at least a unit of flow. Flow
+/// paths are chains that may pass through supports assigned to other chains.
+/// Starting with a path per support, paths are merged by the maximum flow from
+/// the target to the source in the residual network.
+class ChainCoverFlow {
+public:
+    explicit ChainCoverFlow(vector<vector<int>> const& hasse)
+        : n_{int(hasse.size())}, network_{2 * n_ + 2},
+          start_edges_{}, end_edges_{}, hasse_edges_(n_), num_merged_{0} {
+
+        for (auto v = 0; v < n_; v++) {
+            start_edges_.emplace_back(network_.add_edge(v, source(), 1));
+            end_edges_.emplace_back(network_.add_edge(target(), n_ + v, 1));
+            network_.add_edge(v, n_ + v, n_);
+            for (auto w : hasse[v]) {
+                hasse_edges_[v].emplace_back(w, network_.add_edge(n_ + v, w, n_));
+            }
+        }
+
+        num_merged_ = network_.run(target(), source());
+    }
+
+    auto num_chains() const -> int {
+        return n_ - num_merged_;
+    }
+
+    /// Decomposes the flow into paths, every support is assigned to the first path passing through it
+    auto chains() const -> vector<vector<int>> {
+        vector<int> num_ends(n_);
+        vector<vector<pair<int, int>>> num_passes(n_);
+        for (auto v = 0; v < n_; v++) {
+            num_ends[v] = 1 - network_.flow(end_edges_[v]);
+            for (auto const& we : hasse_edges_[v]) {
+                if (network_.flow(we.second) > 0) {
+                    num_passes[v].emplace_back(we.first, network_.flow(we.second));
+                }
+            }
+        }
+
+        vector<bool> is_assigned(n_, false);
+        vector<vector<int>> result{};
+        for (auto v = 0; v < n_; v++) {
+            if (network_.flow(start_edges_[v]) > 0) {
+                continue;
+            }
+            vector<int> chain{};
+            for (auto u = v; ; ) {
+                if (!is_assigned[u]) {
+                    is_assigned[u] = true;
+                    chain.emplace_back(u);
+                }
+                while (!num_passes[u].empty() && num_passes[u].back().second == 0) {
+                    num_passes[u].pop_back();
+                }
+                if (num_passes[u].empty()) {
+                    assert(num_ends[u] > 0);
+                    num_ends[u]--;
                     break;
                 }
+                num_passes[u].back().second--;
+                u = num_passes[u].back().first;
+            }
+            if (!chain.empty()) {
+                result.emplace_back(chain);
             }
-            result.emplace_back(chain);
         }
+        return result;
     }
-    return result;
-}
 
-template<class Graph>
-auto add_dilworths_edges(vector<Support> const& ss, Graph& g) {
-    using VD = graph_traits<MaxMatchingGraph>::vertex_descriptor;
+    /// Supports whose out vertex is reachable from the target in the residual
+    /// network while the in vertex is not, they form a maximum antichain
+    auto antichain() const -> vector<int> {
+        auto const reached = network_.reachable(target());
 
-    for (VD i = 0; i < ss.size(); i++) {
-        for (VD j = 0; j < ss.size(); j++) {
-            if (is_subset(ss[i], ss[j]) && ss[i] != ss[j]) {
-                add_edge(i, ss.size() + j, g);
+        vector<int> result{};
+        for (auto v = 0; v < n_; v++) {
+            if (reached[n_ + v] && !reached[v]) {
+                result.emplace_back(v);
             }
         }
+        return result;
     }
-}
 
-auto construct_dilworths_mates(vector<Support> const& ss) {
-    using VD = graph_traits<MaxMatchingGraph>::vertex_descriptor;
+private:
+    auto source() const -> int {
+        return 2 * n_;
+    }
 
-    MaxMatchingGraph g{2 * ss.size()};
+    auto target() const -> int {
+        return 2 * n_ + 1;
+    }
 
-    add_dilworths_edges(ss, g);
+    int n_;
+    MaxFlowNetwork network_;
+    vector<int> start_edges_;
+    vector<int> end_edges_;
+    vector<vector<pair<int, int>>> hasse_edges_;
+    long long num_merged_;
+};
+
+/// Chains that cover supports of several classifiers, so that the total
+/// weight of covered supports is maximal for the given number of chains. This
+/// is a minimum cost flow on Hasse diagrams of supports, where every chain is
+/// a unit of flow from the source to the target. Every support is split into
+/// the in (v) and out (n + v) vertices joined by two edges: the covering edge
+/// of unit capacity, which costs minus the support's weight, and the bypass
+/// edge, which lets chains pass through supports covered by other chains.
+/// Successive shortest paths increase the flow by a unit at a time, so every
+/// augmentation adds a chain and the covered weight is optimal for every
+/// number of chains on the way.
+class BoundedChainCoverFlow {
+public:
+    BoundedChainCoverFlow(vector<vector<Support>> const& sss, vector<vector<int>> const& weights)
+        : sss_(sss), offsets_{}, total_size_{0}, network_{2 * count_supports(sss) + 2},
+          start_edges_{}, cover_edges_{}, end_edges_{}, next_edges_(count_supports(sss)), covered_weight_{0} {
+
+        auto constexpr INF = MinCostFlowNetwork::INF_CAPACITY;
+
+        for (auto const& ss : sss_) {
+            offsets_.emplace_back(total_size_);
+            total_size_ += ss.size();
+        }
 
-    vector<VD> mate(2 * ss.size());
-    auto const success = checked_edmonds_maximum_cardinality_matching(g, &mate[0]);
-    assert(success);
+        vector<int> order{};
+        for (auto ss_idx = 0u; ss_idx < sss_.size(); ss_idx++) {
+            auto const& ss = sss_[ss_idx];
+            auto const offset = offsets_[ss_idx];
+            auto const hasse = find_hasse_diagram(ss);
+
+            for (auto i = 0u; i < ss.size(); i++) {
+                auto const v = offset + i;
+                start_edges_.emplace_back(network_.add_edge(source(), v, INF, 0));
+                cover_edges_.emplace_back(network_.add_edge(v, total_size_ + v, 1, -weights[ss_idx][i]));
+                network_.add_edge(v, total_size_ + v, INF, 0);
+                end_edges_.emplace_back(network_.add_edge(total_size_ + v, target(), INF, 0));
+                for (auto j : hasse[i]) {
+                    next_edges_[v].emplace_back(offset + j, network_.add_edge(total_size_ + v, offset + j, INF, 0));
+                }
+                order.emplace_back(v);
+            }
+        }
 
-    return mate;
-}
+        // Supersets are larger, so supports sorted by size give a topological order
+        std::stable_sort(begin(order), end(order), [this] (auto i, auto j) {
+            return this->support(i).size() < this->support(j).size();
+        });
+        vector<int> topological_order{source()};
+        for (auto i : order) {
+            topological_order.emplace_back(i);
+            topological_order.emplace_back(total_size_ + i);
+        }
+        topological_order.emplace_back(target());
+        network_.init_potentials(source(), topological_order);
+    }
 
-auto find_max_antichain(vector<Support> const& ss) -> vector<size_t> {
-    using VD = graph_traits<AntichainGraph>::vertex_descriptor;
-    auto const mate = construct_dilworths_mates(ss);
+    /// Adds a chain with the maximal increase of the covered weight
+    ///
+    /// Returns:
+    ///     Whether the covered weight has increased (it has not if all supports are covered).
+    auto add_chain() -> bool {
+        // Chains that cover nothing new are not added
+        auto const pushed_n_cost = network_.augment(source(), target(), 1, 0);
+        if (pushed_n_cost.first == 0) {
+            return false;
+        }
+        covered_weight_ -= pushed_n_cost.second;
+        return true;
+    }
 
-    AntichainGraph g{2 * ss.size() + 1};
-    auto const source = 2 * ss.size();
+    auto covered_weight() const -> long long {
+        return covered_weight_;
+    }
 
-    add_dilworths_edges(ss, g);
+    /// Chains of every classifier (supports that are not covered are omitted).
+    /// Flow is decomposed into paths, every path covers the supports whose
+    /// covering edges it takes.
+    auto chains() const -> vector<vector<vector<Support>>> {
+        vector<int> num_starts(total_size_);
+        vector<int> num_covers(total_size_);
+        vector<int> num_ends(total_size_);
+        vector<vector<pair<int, int>>> num_passes(total_size_);
+        for (auto v = 0; v < total_size_; v++) {
+            num_starts[v] = network_.flow(start_edges_[v]);
+            num_covers[v] = network_.flow(cover_edges_[v]);
+            num_ends[v] = network_.flow(end_edges_[v]);
+            for (auto const& next : next_edges_[v]) {
+                if (network_.flow(next.second) > 0) {
+                    num_passes[v].emplace_back(next.first, network_.flow(next.second));
+                }
+            }
+        }
 
-    for (VD i = 0; i < ss.size(); i++) {
-        // TODO: I don't like that we must know what the type of "no_mate" is.
-        if (mate[i] != graph_traits<MaxMatchingGraph>::null_vertex()) {
-            remove_edge(i, mate[i], g);
-            add_edge(mate[i], i, g);
-        } else {
-            add_edge(source, i, g);
+        vector<vector<vector<Support>>> result(sss_.size());
+        for (auto ss_idx = 0u; ss_idx < sss_.size(); ss_idx++) {
+            for (auto v = offsets_[ss_idx]; v < offsets_[ss_idx] + int(sss_[ss_idx].size()); v++) {
+                for (; num_starts[v] > 0; num_starts[v]--) {
+                    vector<Support> chain{};
+                    for (auto u = v; ; ) {
+                        if (num_covers[u] > 0) {
+                            num_covers[u]--;
+                            chain.emplace_back(support(u));
+                        }
+                        while (!num_passes[u].empty() && num_passes[u].back().second == 0) {
+                            num_passes[u].pop_back();
+                        }
+                        if (num_passes[u].empty()) {
+                            assert(num_ends[u] > 0);
+                            num_ends[u]--;
+                            break;
+                        }
+                        num_passes[u].back().second--;
+                        u = num_passes[u].back().first;
+                    }
+                    if (!chain.empty()) {
+                        result[ss_idx].emplace_back(chain);
+                    }
+                }
+            }
         }
+        return result;
     }
-    
-    vector<graph_traits<AntichainGraph>::vertices_size_type> distance(num_vertices(g), 0);
-    breadth_first_search(g, source, visitor(make_bfs_visitor(record_distances(&distance[0], on_tree_edge()))));
 
-    vector<size_t> result{};
-    for (VD i = 0; i < ss.size(); i++) {
-        if (distance[i] != 0 && distance[i + ss.size()] == 0) {
-            result.emplace_back(i);
+private:
+    static auto count_supports(vector<vector<Support>> const& sss) -> int {
+        auto result = 0;
+        for (auto const& ss : sss) {
+            result += ss.size();
         }
+        return result;
     }
 
-    auto const num_edges = count_if(begin(mate), begin(mate) + ss.size(), [] (auto const x) { return x != graph_traits<MaxMatchingGraph>::null_vertex(); });
+    auto source() const -> int {
+        return 2 * total_size_;
+    }
 
-    log()->info("for a set of size {:d} with a chain cover of size {:d} antichain of size {:d} is found", ss.size(), ss.size() - num_edges, result.size());
+    auto target() const -> int {
+        return 2 * total_size_ + 1;
+    }
 
-    return result;
-}
+    auto support(int v) const -> Support const& {
+        auto const ss_idx = std::upper_bound(begin(offsets_), end(offsets_), v) - begin(offsets_) - 1;
+        return sss_[ss_idx][v - offsets_[ss_idx]];
+    }
+
+    vector<vector<Support>> const& sss_;
+    vector<int> offsets_;
+    int total_size_;
+    MinCostFlowNetwork network_;
+    vector<int> start_edges_;
+    vector<int> cover_edges_;
+    vector<int> end_edges_;
+    vector<vector<pair<int, int>>> next_edges_;
+    long long covered_weight_;
+};
 
 auto calc_memory_increase(size_t s1_idx, size_t s2_idx, vector<Support> const& ss, vector<int> const& weights) {
     auto const res = get_union(ss[s1_idx], ss[s2_idx]);
@@ -128,97 +316,53 @@ auto calc_memory_increase(size_t s1_idx, size_t s2_idx, vector<Support> const& s
 }
 
 auto p4t::find_min_chain_partition(vector<Support> const& ss) -> vector<vector<Support>> {
-    auto const mate = construct_dilworths_mates(ss);
-    return calculate_chains(ss, mate, graph_traits<MaxMatchingGraph>::null_vertex());
-}
-
-
-auto p4t::find_min_bounded_chain_partition(
-        vector<vector<Support>> const& sss, 
-        vector<vector<int>> const& weights, 
-        int max_num_chains) -> vector<vector<vector<Support>>> {
-    using namespace boost;
-    
-    using std::begin; // confilcts with boost
-    using std::end; // conflicts with boost
-    using VD = graph_traits<MinCostMaxFlowGraph>::vertex_descriptor;
-
-    vector<int> ss_offset{};
-    auto total_size = 0;
-    for (auto const& ss : sss) {
-        ss_offset.emplace_back(total_size);
-        total_size += ss.size();
-    }
-
-    MinCostMaxFlowGraph g(2 * total_size + 3); // source, aux_source, target
-    auto const source = 2 * total_size;
-    auto const aux_source = 2 * total_size + 1;
-    auto const target = 2 * total_size + 2;
-
-    auto capacity = get(edge_capacity, g);
-    auto rev = get(edge_reverse, g);
-    auto weight = get(edge_weight, g);
-
-    auto add_edge = [&capacity, &rev, &weight, &g]
-        (VD u, VD v, int c, int w) {
-            auto e = boost::add_edge(u, v, g).first;
-            auto er = boost::add_edge(v, u, g).first;
-            rev[e] = er;
-            rev[er] = e;
-
-            capacity[e] = c;
-            capacity[er] = 0;
-            weight[e] = w;
-            weight[er] = -w;
-        };
-
-
-    for (auto ss_idx = 0; ss_idx < int(sss.size()); ss_idx++) {
-        auto const& ss = sss[ss_idx];
-        auto const offset = ss_offset[ss_idx];
-
-        for (VD i = 0; i < ss.size(); i++) {
-            for (VD j = 0; j < ss.size(); j++) {
-                if (is_subset(ss[i], ss[j]) && ss[i] != ss[j]) {
-                    add_edge(offset + i, total_size + offset + j, 1, 0);
-                }
-            }
+    ChainCoverFlow const flow{find_hasse_diagram(ss)};
 
-            add_edge(offset + i, total_size + offset + i, 1, weights[ss_idx][i]);
+    vector<vector<Support>> result{};
+    for (auto const& chain : flow.chains()) {
+        result.emplace_back();
+        for (auto i : chain) {
+            result.back().emplace_back(ss[i]);
         }
-
-    }
-
-    for (VD i = 0; int(i) < total_size; i++) {
-        add_edge(aux_source, i, 1, 0);
-        add_edge(total_size + i, target, 1, 0);
     }
+    return result;
+}
 
-    add_edge(source, aux_source, std::max(0, total_size - max_num_chains), 0);
 
-    successive_shortest_path_nonnegative_weights(g, source, target);
+auto p4t::find_max_antichain(vector<Support> const& ss) -> vector<size_t> {
+    ChainCoverFlow const flow{find_hasse_diagram(ss)};
+    auto const antichain = flow.antichain();
 
-    auto res_capacity = get(edge_residual_capacity, g);
+    log()->info("for a set of size {:d} with a chain cover of size {:d} antichain of size {:d} is found", ss.size(), flow.num_chains(), antichain.size());
 
-    vector<vector<vector<Support>>> result{};
-    for (auto ss_idx = 0; ss_idx < int(sss.size()); ss_idx++) {
-        auto const& ss = sss[ss_idx];
-        auto const offset = ss_offset[ss_idx];
+    return vector<size_t>(begin(antichain), end(antichain));
+}
 
-        vector<VD> mate(ss.size() * 2, graph_traits<MinCostMaxFlowGraph>::null_vertex());
+auto p4t::find_min_bounded_chain_partition(
+        vector<vector<Support>> const& sss, 
+        vector<vector<int>> const& weights, 
+        int max_num_chains) -> vector<vector<vector<Support>>> {
+    BoundedChainCoverFlow flow{sss, weights};
+    for (auto i = 0; i < max_num_chains && flow.add_chain(); i++) {
+    }
+    return flow.chains();
+}
 
-        for (VD i = 0; i < ss.size(); i++) {
-            for (VD j = 0; j < ss.size(); j++) {
-                auto edge_ok = edge(offset + i, total_size + offset + j, g);
-                if (edge_ok.second && res_capacity[edge_ok.first] == 0) {
-                    mate[i] = j + ss.size();
-                    mate[j + ss.size()] = i;
-                }
-            }
+auto p4t::find_bounded_chain_coverage(
+        vector<vector<Support>> const& sss, 
+        vector<vector<int>> const& weights, 
+        int max_num_chains) -> vector<long long> {
+    BoundedChainCoverFlow flow{sss, weights};
+
+    // Once all supports are covered (i.e., the number of chains has reached
+    // the size of the maximum antichain) the coverage no longer changes
+    vector<long long> result{};
+    for (auto i = 0; i < max_num_chains; i++) {
+        if (!flow.add_chain()) {
+            result.resize(max_num_chains, flow.covered_weight());
+            break;
         }
-
-        result.emplace_back(calculate_chains(ss, mate, graph_traits<MinCostMaxFlowGraph>::null_vertex()));
+        result.emplace_back(flow.covered_weight());
     }
-
     return result;
 }
@@ -6,10 +6,20 @@
 namespace p4t {
 
 auto find_min_chain_partition(vector<Support> const& ss) -> vector<vector<Support>>;
+
+/// Indices of supports that form a maximum antichain, its size equals the
+/// size of the minimum chain partition (Dilworth's theorem)
+auto find_max_antichain(vector<Support> const& ss) -> vector<size_t>;
 auto find_min_bounded_chain_partition(
         vector<vector<Support>> const& sss, 
         vector<vector<int>> const& weights, 
         int max_num_chains) -> vector<vector<vector<Support>>>;
+
+/// Maximal total weight of supports covered by k chains for every k = 1, ..., max_num_chains
+auto find_bounded_chain_coverage(
+        vector<vector<Support>> const& sss, 
+        vector<vector<int>> const& weights, 
+        int max_num_chains) -> vector<long long>;
 }
 
 #endif
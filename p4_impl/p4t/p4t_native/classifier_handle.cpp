@@ -0,0 +1,22 @@
+#include "classifier_handle.h"
+#include "utils.h"
+
+p4t::ClassifierHandle::ClassifierHandle(py::object classifier)
+    : filters_{py::extract<size_t>(classifier.attr("bit_width"))} {
+    if (len(classifier) > 0) {
+        filters_ = svmr2filters(classifier);
+    }
+}
+
+auto p4t::ClassifierHandle::from_packed(
+        py::object values, py::object masks, size_t bit_width) -> ClassifierHandle {
+    return ClassifierHandle(packed2filters(values, masks, bit_width));
+}
+
+auto p4t::ClassifierHandle::subset(py::object indices) const -> ClassifierHandle {
+    return ClassifierHandle(filters_.subset(py2indices(indices, filters_.size())));
+}
+
+auto p4t::ClassifierHandle::reorder(py::object bits) const -> ClassifierHandle {
+    return ClassifierHandle(filters_.reorder(py2indices(bits, filters_.width())));
+}
@@ -0,0 +1,47 @@
+#ifndef CLASSIFIER_HANDLE_H
+#define CLASSIFIER_HANDLE_H
+
+#include "common.h"
+#include "filter.h"
+
+namespace p4t {
+
+/// Classifier converted to native filters once, so that it can be passed to
+/// native algorithms repeatedly without Python <-> C++ marshalling.
+class ClassifierHandle {
+public:
+    explicit ClassifierHandle(py::object classifier);
+
+    explicit ClassifierHandle(FilterSet filters)
+        : filters_(std::move(filters)) {
+    }
+
+    /// Handle to filters given as (n, ceil(bit_width / 64)) uint64 buffers of
+    /// packed values and masks (see p4t.vmrs.packed).
+    static auto from_packed(py::object values, py::object masks, size_t bit_width) -> ClassifierHandle;
+
+    auto filters() const -> FilterSet const& {
+        return filters_;
+    }
+
+    auto size() const {
+        return filters_.size();
+    }
+
+    auto bit_width() const {
+        return filters_.width();
+    }
+
+    /// Handle to the subset of filters given by (Python style) indices.
+    auto subset(py::object indices) const -> ClassifierHandle;
+
+    /// Handle to the filters with classification bits reordered.
+    auto reorder(py::object bits) const -> ClassifierHandle;
+
+private:
+    FilterSet filters_;
+};
+
+}
+
+#endif // CLASSIFIER_HANDLE_H
@@ -3,41 +3,31 @@
 
 namespace {
 
-auto sink() -> std::shared_ptr<spdlog::sinks::sink> const& {
-    static auto initialized = false;    
-    static std::shared_ptr<spdlog::sinks::sink> sink{};
+using namespace p4t;
 
-    if (!initialized) {
-        sink = std::make_shared<spdlog::sinks::simple_file_sink_mt>("logs/p4t_opt.log");
-        initialized = true;
-    }
+// Function statics are initialized once even if native algorithms are
+// called concurrently (with the GIL released)
 
+auto sink() -> std::shared_ptr<spdlog::sinks::sink> const& {
+    static auto const sink = std::shared_ptr<spdlog::sinks::sink>(
+        std::make_shared<spdlog::sinks::simple_file_sink_mt>("logs/p4t_opt.log"));
     return sink;
 }
 
+auto make_logger(string const& name) -> std::shared_ptr<spdlog::logger> {
+    auto logger = std::make_shared<spdlog::logger>(name, sink());
+    logger->flush_on(spdlog::level::info);
+    return logger;
+}
 
 };
 
 auto p4t::log() -> std::shared_ptr<spdlog::logger> const& {
-    static auto initialized = false;
-    static std::shared_ptr<spdlog::logger> logger{};
-
-    if (!initialized) {
-        logger = std::make_shared<spdlog::logger>("logger", sink());
-        logger->flush_on(spdlog::level::info);
-        initialized = true;
-    }
+    static auto const logger = make_logger("logger");
     return logger;
 }
 
 auto p4t::python_log() -> std::shared_ptr<spdlog::logger> const& {
-    static auto initialized = false;
-    static std::shared_ptr<spdlog::logger> logger{};
-
-    if (!initialized) {
-        logger = std::make_shared<spdlog::logger>("python", sink());
-        logger->flush_on(spdlog::level::info);
-        initialized = true;
-    }
+    static auto const logger = make_logger("python");
     return logger;
 }
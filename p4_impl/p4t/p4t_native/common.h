@@ -8,6 +8,7 @@
 #include <iostream>
 #include <array>
 #include <memory>
+#include <chrono>
 
 #include <boost/python.hpp>
 
@@ -16,7 +17,8 @@
 
 namespace p4t {
 
-auto constexpr MAX_WIDTH = 32 + 32 + 16 + 16 + 8;
+// Enough for IPv6 5-tuple: 128 + 128 + 16 + 16 + 8
+auto constexpr MAX_WIDTH = 320;
 
 namespace py = boost::python;
 
@@ -29,6 +31,26 @@ using std::tuple;
 using std::make_pair;
 using std::make_tuple;
 
+/// Point in time after which algorithms return the best solution found so far
+class Deadline {
+public:
+    using Clock = std::chrono::steady_clock;
+
+    /// Deadline that never expires
+    Deadline() : time_{Clock::time_point::max()} {}
+
+    explicit Deadline(double seconds)
+        : time_{Clock::now() + std::chrono::duration_cast<Clock::duration>(std::chrono::duration<double>(seconds))} {
+    }
+
+    auto expired() const -> bool {
+        return time_ != Clock::time_point::max() && Clock::now() >= time_;
+    }
+
+private:
+    Clock::time_point time_;
+};
+
 auto log() -> std::shared_ptr<spdlog::logger> const&;
 auto python_log() -> std::shared_ptr<spdlog::logger> const&;
 
@@ -1,32 +1,125 @@
 #include "expansion_algos.h"
 #include "numeric"
 
-namespace p4t {
+namespace {
+
+using namespace p4t;
+
+/// Union-find over supports, where all supports of a class are expanded to
+/// the same support. The root of a class keeps this support and the number
+/// of bits expanded in the class. Supports are moved between classes by
+/// giving them fresh nodes, old nodes stay in their classes.
+class ExpansionClasses {
+public:
+    explicit ExpansionClasses(vector<Support> const& ss)
+        : parent_(ss.size()), size_(ss.size(), 1), value_(ss), bits_expanded_(ss.size(), 0),
+          node_of_(ss.size()), root_of_value_{} {
+        std::iota(begin(parent_), end(parent_), 0);
+        std::iota(begin(node_of_), end(node_of_), 0);
+        for (auto i = 0; i < int(ss.size()); i++) {
+            root_of_value_[ss[i]] = i;
+        }
+    }
 
-auto initialize_expansions(vector<Support> const& ss) -> support_map<Support> {
-    support_map<Support> expansions{};
-    for (auto const& s : ss) {
-        expansions[s] = s;
+    /// Number of bits expanded in the class with the given support (zero if there is none)
+    auto bits_expanded(Support const& value) const -> int {
+        auto const it = root_of_value_.find(value);
+        return it != end(root_of_value_) ? bits_expanded_[it->second] : 0;
     }
-    return expansions;
-}
 
-auto get_preimage(support_map<Support> const& map, Support const& elem) -> vector<Support> {
-    vector<Support> result{};
-    for (auto const& ss : map) {
-        if (ss.second == elem) {
-            result.emplace_back(ss.first);
+    /// Expands all supports expanded to `from` to `to`, merging with the
+    /// class that is already expanded to `to` (if any).
+    ///
+    /// Returns:
+    ///     The root of the resulting class.
+    auto relabel(Support const& from, Support const& to) -> int {
+        auto root = pop_root(from);
+        auto const other = pop_root(to);
+        if (root == -1) {
+            root = other != -1 ? other : new_root();
+        } else if (other != -1) {
+            root = unite(root, other);
         }
+        value_[root] = to;
+        root_of_value_[to] = root;
+        return root;
     }
-    return result;
-}
+
+    /// Moves the i-th support to the class with the given root
+    void move(int i, int root) {
+        auto const node = node_of_[i];
+        if (find(node) == root) {
+            return;
+        }
+        if (parent_[node] == node && size_[node] == 1) {
+            root_of_value_.erase(value_[node]);
+        }
+        node_of_[i] = new_root();
+        parent_[node_of_[i]] = root;
+        size_[root]++;
+    }
+
+    void set_bits_expanded(int root, int bits) {
+        bits_expanded_[root] = bits;
+    }
+
+    /// Support the i-th support is expanded to
+    auto expansion(int i) -> Support const& {
+        return value_[find(node_of_[i])];
+    }
+
+private:
+    auto find(int node) -> int {
+        while (parent_[node] != node) {
+            parent_[node] = parent_[parent_[node]];
+            node = parent_[node];
+        }
+        return node;
+    }
+
+    auto unite(int x, int y) -> int {
+        if (size_[x] < size_[y]) {
+            std::swap(x, y);
+        }
+        parent_[y] = x;
+        size_[x] += size_[y];
+        return x;
+    }
+
+    auto pop_root(Support const& value) -> int {
+        auto const it = root_of_value_.find(value);
+        if (it == end(root_of_value_)) {
+            return -1;
+        }
+        auto const root = it->second;
+        root_of_value_.erase(it);
+        return root;
+    }
+
+    auto new_root() -> int {
+        auto const root = int(parent_.size());
+        parent_.emplace_back(root);
+        size_.emplace_back(1);
+        value_.emplace_back();
+        bits_expanded_.emplace_back(0);
+        return root;
+    }
+
+    vector<int> parent_;
+    vector<int> size_;
+    vector<Support> value_;
+    vector<int> bits_expanded_;
+    vector<int> node_of_;
+    support_map<int> root_of_value_;
+};
+
 }
 
 auto p4t::try_expand_chain(
-        vector<Support> chain, 
-        vector<Support> const& unique_supports, 
+        vector<Support> chain,
+        vector<Support> const& unique_supports,
         vector<int> const& weights,
-        int max_bits) -> pair<vector<Support>, support_map<Support>> {
+        int max_bits, bool log_candidates) -> pair<vector<Support>, support_map<Support>> {
 
     log()->info("trying to expand some bits...");
 
@@ -38,17 +131,17 @@ auto p4t::try_expand_chain(
         }
     }
 
-    sort(begin(non_chain_indices), end(non_chain_indices), 
+    sort(begin(non_chain_indices), end(non_chain_indices),
         [&weights](auto i, auto j) {
             return weights[i] > weights[j];
         });
 
-    auto expansions = initialize_expansions(unique_supports);
-    support_map<int> bits_expanded{};
+    ExpansionClasses classes(unique_supports);
+    auto num_expanded = 0;
 
     for (auto idx : non_chain_indices) {
-        auto const candidate = unique_supports[idx];
-        auto insertion_point = int(chain.size()) - 1; 
+        auto const& candidate = unique_supports[idx];
+        auto insertion_point = int(chain.size()) - 1;
         while (insertion_point >= 0 && is_subset(candidate, chain[insertion_point])) {
             insertion_point--;
         }
@@ -59,31 +152,40 @@ auto p4t::try_expand_chain(
         }
 
         auto const sunion = get_union(candidate, chain[insertion_point]);
-        auto const bits_to_expand = 
-            std::max(int(sunion.size()) - int(candidate.size()), 
-                     int(sunion.size()) - int(chain[insertion_point].size()) + bits_expanded[chain[insertion_point]]);
+        auto const bits_to_expand =
+            std::max(int(sunion.size()) - int(candidate.size()),
+                     int(sunion.size()) - int(chain[insertion_point].size()) + classes.bits_expanded(chain[insertion_point]));
 
-        log()->info("... group# {:d} bits to expand: {:d}", idx, bits_to_expand);
+        if (log_candidates) {
+            log()->info("... group# {:d} bits to expand: {:d}", idx, bits_to_expand);
+        }
 
         if (bits_to_expand > max_bits) {
             continue;
         }
 
-        expansions[candidate] = sunion;
-        for (auto const& s : get_preimage(expansions, chain[insertion_point])) {
-            expansions[s] = sunion;
-        }
+        num_expanded++;
+
+        auto const merges_next = insertion_point < int(chain.size()) - 1 && sunion == chain[insertion_point + 1];
+        auto const max_bits_to_expand = merges_next ? std::max(classes.bits_expanded(sunion), bits_to_expand) : bits_to_expand;
+
+        auto const root = classes.relabel(chain[insertion_point], sunion);
+        classes.move(idx, root);
+        classes.set_bits_expanded(root, max_bits_to_expand);
 
-        if (insertion_point < int(chain.size()) - 1 && sunion == chain[insertion_point + 1]) {
-            auto const max_bits_to_expand = std::max(bits_expanded[sunion], bits_to_expand);
-            bits_expanded[sunion] = max_bits_to_expand;
+        if (merges_next) {
             chain.erase(begin(chain) + insertion_point);
         } else {
-            bits_expanded[sunion] = bits_to_expand;
             chain[insertion_point] = sunion;
         }
     }
 
+    support_map<Support> expansions{};
+    for (auto i = 0; i < int(unique_supports.size()); i++) {
+        expansions[unique_supports[i]] = classes.expansion(i);
+    }
+
+    log()->info("... {:d} of {:d} supports have been expanded", num_expanded, non_chain_indices.size());
+
     return make_pair(chain, expansions);
 }
-
@@ -10,7 +10,7 @@ auto try_expand_chain(
     vector<Support> chain, 
     vector<Support> const& unique_supports, 
     vector<int> const& weights,
-    int max_bits) -> pair<vector<Support>, support_map<Support>>;
+    int max_bits, bool log_candidates = false) -> pair<vector<Support>, support_map<Support>>;
     
 }
 
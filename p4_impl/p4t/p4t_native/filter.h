@@ -3,6 +3,7 @@
 
 #include <iterator>
 #include <algorithm>
+#include <stdexcept>
 
 #include "common.h"
 #include "bit_array.h"
@@ -11,23 +12,34 @@ namespace p4t {
 
 
 enum class Bit {
-    ONE, ZERO, ANY 
+    ONE, ZERO, ANY
 };
 
+auto constexpr BITS_PER_WORD = size_t(64);
+
+inline auto num_words(size_t width) {
+    return (width + BITS_PER_WORD - 1) / BITS_PER_WORD;
+}
+
+/// Filter that can hold up to WidthT bits. Algorithms are compiled for widths
+/// of 64, 128, 192 and 320 bits, so that narrow classifiers run single chunk kernels.
+template<size_t WidthT>
 class Filter {
 public:
-    using BitArray = PackedBitArray<uint64_t, MAX_WIDTH>;
-    
+    using BitArray = PackedBitArray<uint64_t, WidthT>;
+
+    static auto constexpr WIDTH = WidthT;
+
 public:
     Filter() = default;
 
-    Filter(py::object svmr)
-        : value_{}, mask_{}, width_{size_t(len(svmr.attr("value")))} {
-        assert(width_ <= MAX_WIDTH);
+    Filter(uint64_t const* value, uint64_t const* mask, size_t width)
+        : value_{}, mask_{}, width_{width} {
+        assert(width_ <= WIDTH);
 
-        for (auto i = 0u; i < width_; i++) {
-            value_.set(i, py::extract<bool>(svmr.attr("value")[i]));
-            mask_.set(i, py::extract<bool>(svmr.attr("mask")[i]));
+        for (auto i = 0u; i < num_words(width_); i++) {
+            value_.set_chunk(i, value[i]);
+            mask_.set_chunk(i, mask[i]);
         }
     }
 
@@ -39,8 +51,16 @@ public:
         return mask_.get(i) ? (value_.get(i) ? Bit::ONE : Bit::ZERO) : Bit::ANY;
     }
 
+    auto value() const -> BitArray const& {
+        return value_;
+    }
+
+    auto mask() const -> BitArray const& {
+        return mask_;
+    }
+
     auto has_any(BitArray const& mask) const -> bool {
-        BitArray::BitChunk res = 0;
+        typename BitArray::BitChunk res = 0;
         for (auto i = 0u; i < BitArray::NUM_CHUNKS; i++) {
             res |= mask.chunk(i) & ~mask_.chunk(i);
         }
@@ -53,7 +73,7 @@ public:
         -> pair<bool, int>;
 
     static auto intersect(
-            Filter const& lhs, Filter const& rhs, BitArray const& mask) 
+            Filter const& lhs, Filter const& rhs, BitArray const& mask)
         -> bool;
 
 private:
@@ -62,24 +82,147 @@ private:
     size_t width_;
 };
 
+/// Filters of any width up to MAX_WIDTH stored as packed words: bit i of a
+/// filter is stored in word i / 64 at position i % 64.
+class FilterSet {
+public:
+    explicit FilterSet(size_t width)
+        : width_{width}, num_words_{num_words(width)}, size_{0}, values_{}, masks_{} {
+        if (width_ > MAX_WIDTH) {
+            throw std::invalid_argument("classifier is too wide");
+        }
+    }
+
+    auto width() const {
+        return width_;
+    }
+
+    auto size() const {
+        return size_;
+    }
+
+    auto empty() const {
+        return size_ == 0;
+    }
+
+    void reserve(size_t n) {
+        values_.reserve(n * num_words_);
+        masks_.reserve(n * num_words_);
+    }
+
+    void push_back(uint64_t const* value, uint64_t const* mask) {
+        values_.insert(end(values_), value, value + num_words_);
+        masks_.insert(end(masks_), mask, mask + num_words_);
+        if (width_ % BITS_PER_WORD != 0) {
+            // Padding bits must not leak into chunk-wise kernels
+            auto const padding = ~((uint64_t(1) << (width_ % BITS_PER_WORD)) - 1);
+            values_.back() &= ~padding;
+            masks_.back() &= ~padding;
+        }
+        size_++;
+    }
+
+    auto value(size_t i) const {
+        return values_.data() + i * num_words_;
+    }
+
+    auto mask(size_t i) const {
+        return masks_.data() + i * num_words_;
+    }
+
+    auto get(size_t i, size_t bit) const -> Bit {
+        auto const word = bit / BITS_PER_WORD;
+        auto const offset = bit % BITS_PER_WORD;
+        if (!((mask(i)[word] >> offset) & 1)) {
+            return Bit::ANY;
+        }
+        return (value(i)[word] >> offset) & 1 ? Bit::ONE : Bit::ZERO;
+    }
+
+    auto subset(vector<int> const& indices) const -> FilterSet {
+        FilterSet result{width_};
+        result.reserve(indices.size());
+        for (auto i : indices) {
+            result.push_back(value(i), mask(i));
+        }
+        return result;
+    }
+
+    auto reorder(vector<int> const& bits) const -> FilterSet {
+        FilterSet result{bits.size()};
+        result.reserve(size_);
+
+        vector<uint64_t> value(result.num_words_);
+        vector<uint64_t> mask(result.num_words_);
+        for (auto i = 0u; i < size_; i++) {
+            std::fill(begin(value), end(value), 0);
+            std::fill(begin(mask), end(mask), 0);
+            for (auto j = 0u; j < bits.size(); j++) {
+                auto const word = bits[j] / BITS_PER_WORD;
+                auto const offset = bits[j] % BITS_PER_WORD;
+                value[j / BITS_PER_WORD] |= ((this->value(i)[word] >> offset) & 1) << (j % BITS_PER_WORD);
+                mask[j / BITS_PER_WORD] |= ((this->mask(i)[word] >> offset) & 1) << (j % BITS_PER_WORD);
+            }
+            result.push_back(value.data(), mask.data());
+        }
+        return result;
+    }
+
+    template<size_t Width>
+    auto to_filters() const -> vector<Filter<Width>> {
+        assert(width_ <= Width);
+
+        vector<Filter<Width>> filters{};
+        filters.reserve(size_);
+        for (auto i = 0u; i < size_; i++) {
+            filters.emplace_back(value(i), mask(i), width_);
+        }
+        return filters;
+    }
+
+private:
+    size_t width_;
+    size_t num_words_;
+    size_t size_;
+    vector<uint64_t> values_;
+    vector<uint64_t> masks_;
+};
+
+/// Calls f with filters converted to the narrowest of compiled widths
+template<class Function>
+auto dispatch_width(FilterSet const& filters, Function f) {
+    static_assert(MAX_WIDTH == 320, "compiled widths must be kept in sync with MAX_WIDTH");
+
+    if (filters.width() <= 64) {
+        return f(filters.to_filters<64>());
+    } else if (filters.width() <= 128) {
+        return f(filters.to_filters<128>());
+    } else if (filters.width() <= 192) {
+        return f(filters.to_filters<192>());
+    } else {
+        return f(filters.to_filters<320>());
+    }
+}
+
 }
 
 
-auto inline p4t::Filter::fast_blocker(
+template<size_t WidthT>
+auto inline p4t::Filter<WidthT>::fast_blocker(
         Filter const& f1, Filter const& f2, BitArray const& mask) -> pair<bool, int> {
 
     auto first_difference = -1;
     for (auto i = 0u; i < BitArray::NUM_CHUNKS; i++) {
-        auto const diff = 
-            (f1.value_.chunk(i) ^ f2.value_.chunk(i)) 
+        auto const diff =
+            (f1.value_.chunk(i) ^ f2.value_.chunk(i))
             & (mask.chunk(i) & f1.mask_.chunk(i) & f2.mask_.chunk(i));
         if (diff) {
             if (first_difference != -1) {
                 return {false, first_difference};
             }
-            auto const idx = __builtin_ctz(diff);
+            auto const idx = __builtin_ctzll(diff);
             first_difference = i * BitArray::BITS_PER_CHUNK + idx;
-            if (diff & ~(1 << idx)) {
+            if (diff & (diff - 1)) {
                 return {false, first_difference};
             }
         }
@@ -87,13 +230,14 @@ auto inline p4t::Filter::fast_blocker(
     return {true, first_difference};
 }
 
-auto inline p4t::Filter::intersect(
+template<size_t WidthT>
+auto inline p4t::Filter<WidthT>::intersect(
         Filter const& lhs, Filter const& rhs, BitArray const& mask) -> bool {
 
     assert(lhs.size() == rhs.size());
 
     for (auto i = 0u; i < BitArray::NUM_CHUNKS; i++) {
-        if ((lhs.value_.chunk(i) ^ rhs.value_.chunk(i)) 
+        if ((lhs.value_.chunk(i) ^ rhs.value_.chunk(i))
                 & (mask.chunk(i) & lhs.mask_.chunk(i) & rhs.mask_.chunk(i))) {
             return false;
         }
@@ -0,0 +1,131 @@
+#ifndef MAX_FLOW_H
+#define MAX_FLOW_H
+
+#include <limits>
+
+#include "common.h"
+
+namespace p4t {
+
+/// Flow network for Dinic's maximum flow algorithm. Every edge is stored
+/// together with its reverse edge: edge e and edge e ^ 1 form a pair.
+class MaxFlowNetwork {
+public:
+    explicit MaxFlowNetwork(int num_vertices)
+        : adjacency_(num_vertices), head_{}, capacity_{}, level_{}, current_{} {
+    }
+
+    /// Adds edge from u to v and returns its index
+    auto add_edge(int u, int v, int capacity) -> int {
+        auto const e = int(head_.size());
+        head_.emplace_back(v);
+        capacity_.emplace_back(capacity);
+        adjacency_[u].emplace_back(e);
+        head_.emplace_back(u);
+        capacity_.emplace_back(0);
+        adjacency_[v].emplace_back(e + 1);
+        return e;
+    }
+
+    /// Flow along the edge returned by add_edge
+    auto flow(int e) const -> int {
+        return capacity_[e ^ 1];
+    }
+
+    /// Pushes a maximum flow from source to target, returns its value
+    auto run(int source, int target) -> long long {
+        auto total = 0ll;
+        while (build_levels(source, target)) {
+            current_.assign(adjacency_.size(), 0);
+            for (auto pushed = augment(source, target); pushed > 0; pushed = augment(source, target)) {
+                total += pushed;
+            }
+        }
+        return total;
+    }
+
+    /// Vertices reachable from the source in the residual network
+    auto reachable(int source) const -> vector<bool> {
+        vector<bool> result(adjacency_.size(), false);
+        vector<int> queue{source};
+        result[source] = true;
+        for (auto i = 0u; i < queue.size(); i++) {
+            for (auto e : adjacency_[queue[i]]) {
+                if (capacity_[e] > 0 && !result[head_[e]]) {
+                    result[head_[e]] = true;
+                    queue.emplace_back(head_[e]);
+                }
+            }
+        }
+        return result;
+    }
+
+private:
+    auto build_levels(int source, int target) -> bool {
+        level_.assign(adjacency_.size(), -1);
+        level_[source] = 0;
+        vector<int> queue{source};
+        for (auto i = 0u; i < queue.size() && level_[target] == -1; i++) {
+            auto const u = queue[i];
+            for (auto e : adjacency_[u]) {
+                if (capacity_[e] > 0 && level_[head_[e]] == -1) {
+                    level_[head_[e]] = level_[u] + 1;
+                    queue.emplace_back(head_[e]);
+                }
+            }
+        }
+        return level_[target] != -1;
+    }
+
+    /// Finds a single augmenting path in the level graph with an iterative DFS
+    auto augment(int source, int target) -> int {
+        vector<int> path{};
+        auto u = source;
+        while (true) {
+            if (u == target) {
+                auto pushed = std::numeric_limits<int>::max();
+                for (auto e : path) {
+                    pushed = std::min(pushed, capacity_[e]);
+                }
+                for (auto e : path) {
+                    capacity_[e] -= pushed;
+                    capacity_[e ^ 1] += pushed;
+                }
+                return pushed;
+            }
+
+            auto& it = current_[u];
+            while (it < adjacency_[u].size()) {
+                auto const e = adjacency_[u][it];
+                if (capacity_[e] > 0 && level_[head_[e]] == level_[u] + 1) {
+                    break;
+                }
+                it++;
+            }
+
+            if (it < adjacency_[u].size()) {
+                path.emplace_back(adjacency_[u][it]);
+                u = head_[path.back()];
+            } else {
+                // Dead end, it is excluded from the level graph until the next phase
+                level_[u] = -1;
+                if (path.empty()) {
+                    return 0;
+                }
+                u = head_[path.back() ^ 1];
+                path.pop_back();
+                current_[u]++;
+            }
+        }
+    }
+
+    vector<vector<int>> adjacency_;
+    vector<int> head_;
+    vector<int> capacity_;
+    vector<int> level_;
+    vector<size_t> current_;
+};
+
+}
+
+#endif
@@ -0,0 +1,176 @@
+#ifndef MIN_COST_FLOW_H
+#define MIN_COST_FLOW_H
+
+#include <limits>
+#include <queue>
+#include <functional>
+#include <numeric>
+
+#include "common.h"
+
+namespace p4t {
+
+/// Flow network for the successive shortest paths algorithm. Edges are stored
+/// as in MaxFlowNetwork: edge e and edge e ^ 1 form a pair. Outgoing edges are
+/// kept in the compressed sparse row form, which is built once all edges are
+/// added. Negative costs are allowed as long as the network is acyclic, see
+/// init_potentials.
+class MinCostFlowNetwork {
+public:
+    using Cost = long long;
+
+    static auto constexpr INF_CAPACITY = std::numeric_limits<int>::max();
+
+    explicit MinCostFlowNetwork(int num_vertices)
+        : num_vertices_{num_vertices}, tail_{}, head_{}, capacity_{}, cost_{},
+          offsets_{}, out_edges_{}, potential_(num_vertices, 0) {
+    }
+
+    /// Adds edge from u to v and returns its index
+    auto add_edge(int u, int v, int capacity, Cost cost) -> int {
+        assert(offsets_.empty());
+
+        auto const e = int(head_.size());
+        tail_.emplace_back(u);
+        head_.emplace_back(v);
+        capacity_.emplace_back(capacity);
+        cost_.emplace_back(cost);
+        tail_.emplace_back(v);
+        head_.emplace_back(u);
+        capacity_.emplace_back(0);
+        cost_.emplace_back(-cost);
+        return e;
+    }
+
+    /// Flow along the edge returned by add_edge
+    auto flow(int e) const -> int {
+        return capacity_[e ^ 1];
+    }
+
+    /// Sets potentials to the shortest distances from the source, which makes
+    /// reduced costs nonnegative. Must be called before the first augmentation
+    /// with vertices in a topological order of the network.
+    void init_potentials(int source, vector<int> const& order) {
+        auto constexpr INF = std::numeric_limits<Cost>::max();
+
+        build();
+
+        vector<Cost> distance(num_vertices_, INF);
+        distance[source] = 0;
+        for (auto u : order) {
+            if (distance[u] == INF) {
+                continue;
+            }
+            for (auto k = offsets_[u]; k < offsets_[u + 1]; k++) {
+                auto const e = out_edges_[k];
+                if (capacity_[e] > 0 && distance[u] + cost_[e] < distance[head_[e]]) {
+                    distance[head_[e]] = distance[u] + cost_[e];
+                }
+            }
+        }
+
+        for (auto v = 0; v < num_vertices_; v++) {
+            potential_[v] = distance[v] == INF ? 0 : distance[v];
+        }
+    }
+
+    /// Pushes at most max_flow units along a shortest path from the source to
+    /// the target, unless a unit of flow along it costs at least max_cost
+    ///
+    /// Returns:
+    ///     The pair of the pushed flow (zero if the target is unreachable or
+    ///     the path is too expensive) and the cost of a unit of flow along the path.
+    auto augment(int source, int target, int max_flow,
+                 Cost max_cost = std::numeric_limits<Cost>::max()) -> pair<int, Cost> {
+        auto constexpr INF = std::numeric_limits<Cost>::max();
+
+        build();
+
+        // Dijkstra on reduced costs, it stops as soon as the target is reached
+        vector<Cost> distance(num_vertices_, INF);
+        vector<int> parent_edge(num_vertices_, -1);
+        vector<bool> is_settled(num_vertices_, false);
+        std::priority_queue<pair<Cost, int>, vector<pair<Cost, int>>, std::greater<pair<Cost, int>>> queue{};
+        distance[source] = 0;
+        queue.emplace(0, source);
+        while (!queue.empty()) {
+            auto const u = queue.top().second;
+            queue.pop();
+            if (is_settled[u]) {
+                continue;
+            }
+            is_settled[u] = true;
+            if (u == target) {
+                break;
+            }
+            for (auto k = offsets_[u]; k < offsets_[u + 1]; k++) {
+                auto const e = out_edges_[k];
+                auto const v = head_[e];
+                auto const reduced = cost_[e] + potential_[u] - potential_[v];
+                if (capacity_[e] > 0 && !is_settled[v] && distance[u] + reduced < distance[v]) {
+                    distance[v] = distance[u] + reduced;
+                    parent_edge[v] = e;
+                    queue.emplace(distance[v], v);
+                }
+            }
+        }
+
+        if (!is_settled[target]) {
+            return {0, 0};
+        }
+
+        // Vertices that are not settled are at least as far as the target,
+        // so reduced costs stay nonnegative
+        for (auto v = 0; v < num_vertices_; v++) {
+            potential_[v] += is_settled[v] ? distance[v] : distance[target];
+        }
+
+        auto pushed = max_flow;
+        auto cost = Cost{0};
+        for (auto v = target; v != source; v = tail_[parent_edge[v]]) {
+            pushed = std::min(pushed, capacity_[parent_edge[v]]);
+            cost += cost_[parent_edge[v]];
+        }
+        if (cost >= max_cost) {
+            return {0, cost};
+        }
+
+        for (auto v = target; v != source; v = tail_[parent_edge[v]]) {
+            capacity_[parent_edge[v]] -= pushed;
+            capacity_[parent_edge[v] ^ 1] += pushed;
+        }
+
+        return {pushed, cost};
+    }
+
+private:
+    /// Groups edges by their tails (counting sort)
+    void build() {
+        if (!offsets_.empty()) {
+            return;
+        }
+        offsets_.assign(num_vertices_ + 1, 0);
+        for (auto u : tail_) {
+            offsets_[u + 1]++;
+        }
+        std::partial_sum(begin(offsets_), end(offsets_), begin(offsets_));
+        out_edges_.resize(tail_.size());
+        auto position = offsets_;
+        for (auto e = 0; e < int(tail_.size()); e++) {
+            out_edges_[position[tail_[e]]++] = e;
+        }
+    }
+
+    int num_vertices_;
+    vector<int> tail_;
+    vector<int> head_;
+    vector<int> capacity_;
+    vector<Cost> cost_;
+    vector<int> offsets_;
+    vector<int> out_edges_;
+    vector<Cost> potential_;
+};
+
+}
+
+#endif
@@ -1,32 +1,30 @@
+#include <atomic>
+#include <random>
 #include <numeric>
 #include <functional>
 #include <parallel/algorithm>
 
 #include "oi_algos.h"
+#include "bit_columns.h"
+#include "blockers.h"
+#include "oi_index.h"
 
 namespace {
 
 using namespace p4t;
 
+/// Number of best bits, among which perturbed trajectories choose
+auto constexpr MULTISTART_TOP_K = 3;
+
+/// Number of filters scanned between deadline checks
+auto constexpr DEADLINE_CHECK_PERIOD = 1024;
+
 auto const calc_set_difference(vector<int> const& lhs, vector<int> const& rhs) {
     vector<int> tmp;
     std::set_difference(begin(lhs), end(lhs), begin(rhs), end(rhs), back_inserter(tmp));
     return tmp;
 }
 
-auto find_exact(vector<Filter> const& filters, vector<int> const& bits_in_use) {
-    auto exact = bits_in_use;
-    for (auto const& filter : filters) {
-        for (auto const bit : bits_in_use) {
-            assert(bit < int(filter.size()));
-            if (filter[bit] == Bit::ANY) {
-                exact.erase(remove(begin(exact), end(exact), bit), end(exact));
-            }
-        }
-    }
-    return exact;
-}
-
 struct BitStats {
     BitStats(size_t n) : dontcare(n), zeros(n), ones(n), exact_bits{} {}
 
@@ -36,40 +34,32 @@ struct BitStats {
     vector<int> exact_bits;
 };
 
-auto calc_bit_stats(vector<Filter> const& filters, vector<int> const& bits_in_use) {
-    BitStats stats{filters[0].size()};
+template<size_t W>
+auto calc_bit_stats(BitColumns<W> const& columns, vector<int> const& bits_in_use) {
+    BitStats stats{columns.width()};
 
-    for (auto const& filter : filters) {
-        for (auto i : bits_in_use) {
-            switch(filter[i]) {
-                case Bit::ANY: stats.dontcare[i]++;
-                    break;
-                case Bit::ONE: stats.ones[i]++;
-                    break;
-                case Bit::ZERO: stats.zeros[i]++;
-            }
-        }
-    }
     for (auto i : bits_in_use) {
-        if (stats.dontcare[i] == 0) {
-            stats.exact_bits.emplace_back(i);
-        }
+        stats.dontcare[i] = columns.dontcare(i);
+        stats.ones[i] = columns.ones(i);
+        stats.zeros[i] = columns.zeros(i);
     }
+    stats.exact_bits = columns.exact_bits(bits_in_use);
 
     return stats;
 }
 
-auto is_oi(vector<Filter> const& filters, vector<int> const& bits_in_use) {
+template<size_t W>
+auto is_oi(vector<Filter<W>> const& filters, vector<int> const& bits_in_use) {
     vector<int> indices(filters.size());    
     iota(begin(indices), end(indices), 0);
     vector<bool> has_intersection(filters.size());
 
-    auto const mask = bits_to_mask(bits_in_use);
+    auto const mask = bits_to_mask<W>(bits_in_use);
 
     std::for_each(begin(indices), end(indices),
         [&filters, &has_intersection, &mask] (auto i) {
             for (auto j = 0; j < i; j++) {
-                if (Filter::intersect(filters[i], filters[j], mask)) {
+                if (Filter<W>::intersect(filters[i], filters[j], mask)) {
                     has_intersection[i] = true;
                     break;
                 }
@@ -80,37 +70,6 @@ auto is_oi(vector<Filter> const& filters, vector<int> const& bits_in_use) {
     return std::find(begin(has_intersection), end(has_intersection), true) == end(has_intersection);
 }
 
-auto find_blockers(vector<Filter> const& filters, vector<int> const& bits_in_use) {
-    log()->info("Calculating blockers...");
-    assert(!filters.empty());
-    vector<vector<bool>> blockers(filters.size(), vector<bool>(filters[0].size(), false));
-
-    vector<int> indices(filters.size());    
-    iota(begin(indices), end(indices), 0);
-
-    auto const bits_mask = bits_to_mask(bits_in_use);
-
-    __gnu_parallel::for_each(begin(indices), end(indices),
-        [&filters, mask=bits_mask, &blockers] (auto i) {
-            auto const& lower = filters[i];
-            for (auto j = 0; j < i; j++) {
-                auto const res = Filter::fast_blocker(lower, filters[j], mask);
-
-                if (res.second == -1) {
-                    blockers[i].assign(blockers[i].size(), true);
-                    break;
-                } else if (res.first) {
-                    blockers[i][res.second] = true;
-                }
-            }
-        }
-    );
-
-    log()->info("...Finished");
-
-    return blockers;
-}
-
 template<class Function, class Cmp>
 auto find_best_bits(
         vector<int> const& all_bits, vector<int> try_last, 
@@ -183,56 +142,40 @@ auto const check_if_use_dontcare_heuristic(
     return false;
 }
 
-template<class Blockers>
-auto const sum_blockers_by_bit(Blockers const& blockers) {
-    vector<int> bit_num_blockers(blockers[0].size());
-
-    for (auto const& blocker : blockers) {
-        for (auto i = 0u; i < blocker.size(); i++) {
-            if (blocker[i]) {
-                bit_num_blockers[i]++;
-            }
-        }
-    }
-
-    return bit_num_blockers;
-}
-
+template<size_t W>
 auto apply_dont_care_heuristic(
-        vector<Filter> const& filters, vector<int> const& bits_in_use, 
-        BitStats const& stats, bool only_exact, size_t l) 
+        vector<Filter<W>> const& filters, BitColumns<W> const& columns, vector<int> const& bits_in_use, 
+        BitStats const& stats, bool only_exact, size_t l, std::mt19937* random, 
+        Deadline const& deadline, double min_exact_share = 0.001) 
     -> tuple<bool, vector<int>, vector<int>> {
 
     log()->info("Using ANY HEURISTIC!");
 
+    // Ties are broken randomly in perturbed trajectories
+    vector<unsigned> tie_breaker(columns.width());
+    if (random != nullptr) {
+        std::generate(begin(tie_breaker), end(tie_breaker), std::ref(*random));
+    }
+
     auto const rm_bits = find_best_bits(bits_in_use, only_exact ? stats.exact_bits : vector<int>{}, 
-        [&stats](auto b) { 
-            return make_pair(stats.dontcare[b], std::min(stats.zeros, stats.ones));
-        }, std::greater<>(), bits_in_use.size() - l);
+        [&stats, &tie_breaker](auto b) { 
+            return make_tuple(stats.dontcare[b], std::min(stats.zeros, stats.ones), tie_breaker[b]);
+        }, std::greater<>(), bits_in_use.size() > l ? bits_in_use.size() - l : 0);
 
-    auto cur_mask = bits_to_mask(bits_in_use);
+    auto cur_mask = bits_to_mask<W>(bits_in_use);
     for (auto bit : rm_bits) {
         cur_mask.set(bit, false);
     }
 
     if (only_exact) {
-        vector<int> const exact_indices = [&]() {
-            vector<int> retval;
-            for (auto i = 0; i < int(filters.size()); i++) {
-                if (filters[i].has_any(cur_mask)) {
-                    continue;
-                }
-                retval.emplace_back(i);
-            }
-            return retval;
-        }();
+        auto const exact_indices = columns.exact_rows(cur_mask);
 
-        if (exact_indices.size() < 0.001 * filters.size()) {
+        if (exact_indices.size() < min_exact_share * filters.size()) {
             log()->info("...any heuristinc FAILED, found only {:d} indices", exact_indices.size());
             return make_tuple(false, vector<int>{}, vector<int>{});
         } 
     
-        auto const oi_indices = find_maximal_oi_subset_indices(filters, exact_indices, cur_mask);
+        auto const oi_indices = find_maximal_oi_subset_indices(filters, exact_indices, cur_mask, deadline);
         log()->info(
             "...found exact OI indices with {:d}/{:d} bits, exact {:d}, OI {:d}",
             bits_in_use.size() - rm_bits.size(), bits_in_use.size(), 
@@ -240,38 +183,50 @@ auto apply_dont_care_heuristic(
         return make_tuple(true, rm_bits, oi_indices);
     }
 
-    auto const oi_indices = find_maximal_oi_subset(filters, cur_mask);
+    auto const oi_indices = find_maximal_oi_subset(filters, cur_mask, deadline);
     log()->info("...checking OI indices with {:d}/{:d} bits, OI {:d}", bits_in_use.size() - rm_bits.size(), bits_in_use.size(), oi_indices.size());
     return make_tuple(true, rm_bits, oi_indices);
 }
 
+template<size_t W>
 auto remove_bits_w_blockers(
-        vector<Filter> const filters, vector<int> const& bits_in_use, 
-        BitStats const& stats, bool only_exact, size_t l) -> pair<vector<int>, vector<int>> {
-    auto const blockers = find_blockers(filters, bits_in_use);
-    auto const bit_num_blockers = sum_blockers_by_bit(blockers);
+        vector<Filter<W>> const& filters, BitColumns<W> const& columns, BlockerEngine<W> const& engine, 
+        vector<int> const& bits_in_use, 
+        BitStats const& stats, bool only_exact, size_t l, std::mt19937* random, 
+        Deadline const& deadline) -> pair<vector<int>, vector<int>> {
+    auto const blockers = engine.blockers();
+    auto const bit_num_blockers = blockers.count_by_bit();
 
 
     if (check_if_use_dontcare_heuristic(bits_in_use, bit_num_blockers, l)) {
         bool success;
         vector<int> bits_to_remove, oi_indices;
 
-        tie(success, bits_to_remove, oi_indices) = apply_dont_care_heuristic(filters, bits_in_use, stats, only_exact, l);
+        tie(success, bits_to_remove, oi_indices) = apply_dont_care_heuristic(
+            filters, columns, bits_in_use, stats, only_exact, l, random, deadline);
         if (success) {
             return make_pair(bits_to_remove, oi_indices);
         }
     }
 
-    auto const best_bit = find_best_bit(
-            bits_in_use, only_exact ? stats.exact_bits : vector<int>{}, 
-            [&bit_num_blockers, &stats] (auto bit) { 
-                return make_pair(bit_num_blockers[bit], -stats.dontcare[bit]); 
-            }, std::less<>());
+    auto const value = [&bit_num_blockers, &stats] (auto bit) { 
+        return make_pair(bit_num_blockers[bit], -stats.dontcare[bit]); 
+    };
+
+    auto best_bit = -1;
+    if (random == nullptr) {
+        best_bit = find_best_bit(bits_in_use, only_exact ? stats.exact_bits : vector<int>{}, value, std::less<>());
+    } else {
+        // Perturbed trajectories sample among several best bits
+        auto const best_bits = find_best_bits(
+            bits_in_use, only_exact ? stats.exact_bits : vector<int>{}, value, std::less<>(), MULTISTART_TOP_K);
+        best_bit = best_bits[std::uniform_int_distribution<size_t>(0, best_bits.size() - 1)(*random)];
+    }
 
     vector<int> result{};
 
     for (auto i = 0u; i < blockers.size(); i++) {
-        if (!blockers[i][best_bit]) {
+        if (!blockers.get(i, best_bit)) {
             result.emplace_back(i);
         }
     }
@@ -282,65 +237,117 @@ auto remove_bits_w_blockers(
     return {{best_bit}, result};
 }
 
+/// Bounds on the size of the subset found by find_maximal_oi_subset, they
+/// are equal unless the search has been abandoned
+struct SubsetSizeBounds {
+    int lower;
+    int upper;
+};
+
+/// Bounds the size of the subset found by find_maximal_oi_subset, the search
+/// is abandoned as soon as the size is known to be less than bound or the
+/// deadline expires. The accepted index must be empty, it is used as scratch.
+template<size_t W>
+auto bound_maximal_oi_subset_size(
+        vector<Filter<W>> const& filters, std::atomic<int> const& bound, 
+        Deadline const& deadline, IntersectionIndex<W>* accepted) -> SubsetSizeBounds {
+    auto size = 0;
+    for (auto i = 0; i < int(filters.size()); i++) {
+        auto const upper = size + int(filters.size()) - i;
+        if (upper < bound.load(std::memory_order_relaxed)) {
+            return {size, upper};
+        }
+        if (i % DEADLINE_CHECK_PERIOD == 0 && deadline.expired()) {
+            return {size, upper};
+        }
+        if (!accepted->intersects(filters[i])) {
+            accepted->insert(i);
+            size++;
+        }
+    }
+    return {size, size};
+}
+
+template<size_t W>
 auto remove_bits_oi(
-        vector<Filter> const& filters, vector<int> const& bits_in_use, 
-        BitStats const& stats, bool only_exact) 
+        vector<Filter<W>> const& filters, vector<int> const& bits_in_use, 
+        BitStats const& stats, bool only_exact, Deadline const& deadline) 
     -> pair<vector<int>, vector<int>> {
 
-    auto mask = bits_to_mask(bits_in_use);
-    auto best = find_best_bits(bits_in_use, only_exact ? stats.exact_bits : vector<int>{},
-            [&mask, &filters] (auto bit) {
-                auto cur_mask = mask;
-                cur_mask.set(bit, false);
-                return int(find_maximal_oi_subset(filters, cur_mask).size());
-            }, std::greater<>());
-
-    mask.set(best.front(), false);
-    return make_pair(best, find_maximal_oi_subset(filters, mask));
-}
+    // Exact bits are tried only when no other bits are left
+    auto candidates = only_exact ? calc_set_difference(bits_in_use, stats.exact_bits) : bits_in_use;
+    if (candidates.empty()) {
+        candidates = bits_in_use;
+    }
 
+    auto mask = bits_to_mask<W>(bits_in_use);
+    auto const candidate_mask = [&mask, &candidates] (auto k) {
+        auto result = mask;
+        result.set(candidates[k], false);
+        return result;
+    };
 
-} // namespace
+    // Candidates are scored in parallel, the ones that cannot reach the best
+    // size found so far are abandoned
+    std::atomic<int> best_size{0};
+    vector<SubsetSizeBounds> sizes(candidates.size());
 
+    #pragma omp parallel
+    {
+        IntersectionIndex<W> accepted(filters, mask);
 
-auto p4t::best_min_similarity_bits(vector<Filter> const& filters, size_t l) -> vector<int> {
-    assert(!filters.empty());
+        #pragma omp for schedule(dynamic)
+        for (auto k = 0; k < int(candidates.size()); k++) {
+            accepted.reset(candidate_mask(k));
+            sizes[k] = bound_maximal_oi_subset_size(filters, best_size, deadline, &accepted);
 
-    vector<int> result{};
-    while (result.size() < l) {
-        auto best_bit = -1;
-        auto best_value = -1;
-        for (auto i = 0u; i < filters[0].size(); i++) {
-            if (find(begin(result), end(result), i) != end(result)) {
-                continue;
-            }
-            auto count_zero = 0;
-            auto count_one = 0;
-            for (auto const& f : filters) {
-                if (f[i] == Bit::ANY || f[i] == Bit::ONE) {
-                    count_one++;
-                } 
-                if (f[i] == Bit::ANY || f[i] == Bit::ZERO) {
-                    count_zero++;
-                }
-            }
-            auto const value = std::max(count_zero, count_one);
-            if (best_bit == -1 || value < best_value) {
-                best_bit = i;
-                best_value = value;
+            auto best = best_size.load();
+            while (sizes[k].lower == sizes[k].upper && sizes[k].lower > best 
+                    && !best_size.compare_exchange_weak(best, sizes[k].lower)) {
             }
         }
-        assert(best_bit >= 0);
-        result.emplace_back(best_bit);
     }
 
-    return result;
-}
+    // The best candidate is selected in the same way as by find_best_bits,
+    // so that ties are broken as before. Bounds usually suffice to compare
+    // candidates, otherwise abandoned ones are scored in full.
+    IntersectionIndex<W> accepted(filters, mask);
+    std::atomic<int> const no_bound{0};
+    auto const exact_size = [&] (auto k) {
+        if (sizes[k].lower != sizes[k].upper) {
+            accepted.reset(candidate_mask(k));
+            sizes[k] = bound_maximal_oi_subset_size(filters, no_bound, deadline, &accepted);
+            // The size is not known if the deadline has expired
+            sizes[k].upper = sizes[k].lower;
+        }
+        return sizes[k].lower;
+    };
+    auto const greater = [&] (auto a, auto b) {
+        if (sizes[a].lower > sizes[b].upper || sizes[a].upper <= sizes[b].lower) {
+            return sizes[a].lower > sizes[b].upper;
+        }
+        return exact_size(a) > exact_size(b);
+    };
 
+    vector<int> order(candidates.size());
+    std::iota(begin(order), end(order), 0);
+    if (order.size() > 1) {
+        std::nth_element(begin(order), begin(order) + 1, end(order), greater);
+    }
 
+    auto const best_bit = candidates[order.front()];
 
+    mask.set(best_bit, false);
+    return make_pair(vector<int>{best_bit}, find_maximal_oi_subset(filters, mask, deadline));
+}
 
-auto p4t::best_to_stay_minme(vector<Filter> filters, size_t l, MinMEMode mode, bool only_exact) -> std::pair<vector<int>, vector<int>> {
+/// Greedily removes bits until l bits are left, keeping the filters that stay
+/// order-independent. If random is not null, bit choices are perturbed.
+template<size_t W>
+auto minme_trajectory(
+        vector<Filter<W>> filters, size_t l, MinMEMode mode, bool only_exact, 
+        Deadline const& deadline, std::mt19937* random) 
+    -> tuple<vector<int>, vector<int>, bool> {
     assert(!filters.empty());
     log()->info("starting minme; mode: {:d}; only exact: {:b}; total filters: {:d}", mode, only_exact, filters.size());
 
@@ -349,31 +356,49 @@ auto p4t::best_to_stay_minme(vector<Filter> filters, size_t l, MinMEMode mode, b
         bits_in_use.emplace_back(i);
     }
 
-    auto exact_bits_in_use = find_exact(filters, bits_in_use);
+    BitColumns<W> columns(filters);
+    auto exact_bits_in_use = columns.exact_bits(bits_in_use);
 
     vector<int> indices(filters.size());
     std::iota(begin(indices), end(indices), 0);
 
+    std::unique_ptr<BlockerEngine<W>> engine{};
+    auto complete = true;
+
     while (bits_in_use.size() > l || (only_exact && bits_in_use != exact_bits_in_use)) {
-        auto const stats = calc_bit_stats(filters, bits_in_use);
+        auto const stats = calc_bit_stats(columns, bits_in_use);
+
+        if (mode == MinMEMode::BLOCKERS && !engine && !deadline.expired()) {
+            log()->info("Calculating blockers...");
+            engine = std::make_unique<BlockerEngine<W>>(filters, bits_to_mask<W>(bits_in_use), deadline);
+            log()->info("...Finished");
+        }
 
         vector<int> rm_bits;
         vector<int> oi_indices;
-        switch(mode) {
+        if (deadline.expired()) {
+            // Complete the group at once with the don't care heuristic (the
+            // engine may be incomplete). The completion scans filters until
+            // the deadline too, any prefix of the greedy OI subset is OI.
+            log()->info("Deadline has expired, completing the group");
+            complete = false;
+            tie(std::ignore, rm_bits, oi_indices) = apply_dont_care_heuristic(
+                filters, columns, bits_in_use, stats, only_exact, l, random, deadline, 0.0);
+        } else switch(mode) {
             case MinMEMode::MAX_OI: 
                 tie(rm_bits, oi_indices) = 
-                    remove_bits_oi(filters, bits_in_use, stats, only_exact);
+                    remove_bits_oi(filters, bits_in_use, stats, only_exact, deadline);
                 break;
             case MinMEMode::BLOCKERS:
-                tie(rm_bits, oi_indices) = 
-                    remove_bits_w_blockers(filters, bits_in_use, stats, only_exact, l);
+                tie(rm_bits, oi_indices) = remove_bits_w_blockers(
+                    filters, columns, *engine, bits_in_use, stats, only_exact, l, random, deadline);
                 break;
         }
 
         bits_in_use = calc_set_difference(bits_in_use, rm_bits);
 
         vector<int> new_indices{};
-        vector<Filter> new_filters{};
+        vector<Filter<W>> new_filters{};
 
         for (auto i : oi_indices) {
             new_indices.emplace_back(indices[i]);
@@ -383,31 +408,249 @@ auto p4t::best_to_stay_minme(vector<Filter> filters, size_t l, MinMEMode mode, b
         std::swap(indices, new_indices);
         std::swap(filters, new_filters);
 
-        exact_bits_in_use = find_exact(filters, bits_in_use);
+        if (!complete) {
+            break;
+        }
+
+        columns.keep(oi_indices);
+        exact_bits_in_use = columns.exact_bits(bits_in_use);
+
+        if (engine) {
+            engine->update(filters, rm_bits, oi_indices, deadline);
+        }
 
         log()->info("bits [{:d}...] have been found; bits left: {:d}; exact bits left: {:d}; entries left: {:d}", rm_bits.front(), bits_in_use.size(), exact_bits_in_use.size(), filters.size());
     }
 
     assert(is_oi(filters, bits_in_use));
 
-    return make_pair(bits_in_use, indices);
+    return make_tuple(bits_in_use, indices, complete);
+}
+
+/// Chooses bits for coloring: the least similar ones, preferring bits
+/// without ANY if only exact bits are allowed
+template<size_t W>
+auto coloring_bits(BitColumns<W> const& columns, size_t l, bool only_exact) {
+    auto const score = [&columns, only_exact](auto bit) {
+        auto const count_zero = columns.dontcare(bit) + columns.zeros(bit);
+        auto const count_one = columns.dontcare(bit) + columns.ones(bit);
+        return make_pair(only_exact ? columns.dontcare(bit) : 0, std::max(count_zero, count_one));
+    };
+
+    vector<int> bits(columns.width());
+    std::iota(begin(bits), end(bits), 0);
+    std::stable_sort(begin(bits), end(bits), [&score](auto a, auto b) { return score(a) < score(b); });
+    bits.resize(std::min(l, bits.size()));
+    std::sort(begin(bits), end(bits));
+
+    return bits;
+}
+
+/// Colors the graph with DSATUR: the next vertex is the one with the most
+/// distinctly colored neighbours (ties: the highest degree, then the lowest
+/// index). Vertices left when the deadline expires stay uncolored (-1).
+auto color_dsatur(vector<vector<int>> const& graph, Deadline const& deadline) {
+    vector<int> colors(graph.size(), -1);
+    vector<set<int>> neighbour_colors(graph.size());
+
+    auto const key = [&graph, &neighbour_colors](int v) {
+        return make_tuple(int(neighbour_colors[v].size()), int(graph[v].size()), -v);
+    };
+
+    set<tuple<int, int, int>> queue{};
+    for (auto v = 0; v < int(graph.size()); v++) {
+        queue.emplace(key(v));
+    }
+
+    for (auto num_colored = 1; !queue.empty(); num_colored++) {
+        if (num_colored % DEADLINE_CHECK_PERIOD == 0 && deadline.expired()) {
+            break;
+        }
+        auto const v = -std::get<2>(*queue.rbegin());
+        queue.erase(std::prev(end(queue)));
+
+        auto color = 0;
+        while (neighbour_colors[v].count(color)) {
+            color++;
+        }
+        colors[v] = color;
+
+        for (auto u : graph[v]) {
+            if (colors[u] == -1 && !neighbour_colors[u].count(color)) {
+                queue.erase(key(u));
+                neighbour_colors[u].insert(color);
+                queue.emplace(key(u));
+            }
+        }
+    }
+
+    return colors;
+}
+
+} // namespace
+
+
+template<size_t W>
+auto p4t::color_oi_groups(vector<Filter<W>> const& filters, size_t l, bool only_exact, Deadline const& deadline) 
+    -> tuple<vector<int>, vector<vector<int>>, bool> {
+    assert(!filters.empty());
+    log()->info("starting OI coloring; only exact: {:b}; total filters: {:d}", only_exact, filters.size());
+
+    BitColumns<W> const columns(filters);
+    auto const bits = coloring_bits(columns, l, only_exact);
+    auto const mask = bits_to_mask<W>(bits);
+
+    vector<int> vertices{};
+    if (only_exact) {
+        vertices = columns.exact_rows(mask);
+    } else {
+        vertices.resize(filters.size());
+        std::iota(begin(vertices), end(vertices), 0);
+    }
+
+    // Intersection graph of the filters under the chosen bits
+    IntersectionIndex<W> index(filters, mask);
+    vector<int> vertex_of(filters.size(), -1);
+    for (auto v = 0; v < int(vertices.size()); v++) {
+        index.insert(vertices[v]);
+        vertex_of[vertices[v]] = v;
+    }
+
+    vector<vector<int>> graph(vertices.size());
+    std::atomic<bool> truncated{false};
+    __gnu_parallel::for_each(begin(vertices), end(vertices),
+        [&] (auto i) {
+            if (deadline.expired()) {
+                truncated = true;
+                return;
+            }
+            auto& neighbours = graph[vertex_of[i]];
+            index.for_each_intersecting(filters[i], [&](auto j) {
+                if (j != i) {
+                    neighbours.emplace_back(vertex_of[j]);
+                }
+            });
+            std::sort(begin(neighbours), end(neighbours));
+        }
+    );
+    log()->info("...intersection graph has {:d} edges", 
+        std::accumulate(begin(graph), end(graph), size_t(0), [](auto sum, auto const& ns) { return sum + ns.size(); }) / 2);
+
+    if (truncated) {
+        log()->info("...Deadline has expired before coloring");
+        return make_tuple(bits, vector<vector<int>>{}, false);
+    }
+
+    auto const colors = color_dsatur(graph, deadline);
+    auto const complete = std::find(begin(colors), end(colors), -1) == end(colors);
+
+    vector<vector<int>> groups(vertices.empty() ? 0 : *std::max_element(begin(colors), end(colors)) + 1);
+    for (auto v = 0; v < int(vertices.size()); v++) {
+        if (colors[v] != -1) {
+            groups[colors[v]].emplace_back(vertices[v]);
+        }
+    }
+    std::stable_sort(begin(groups), end(groups), [](auto const& lhs, auto const& rhs) {
+        return lhs.size() > rhs.size();
+    });
+
+    log()->info("...found {:d} groups; complete: {:b}", groups.size(), complete);
+
+    return make_tuple(bits, groups, complete);
+}
+
+template<size_t W>
+auto p4t::best_min_similarity_bits(vector<Filter<W>> const& filters, size_t l) -> vector<int> {
+    assert(!filters.empty());
+
+    BitColumns<W> const columns(filters);
+
+    vector<int> result{};
+    while (result.size() < l) {
+        auto best_bit = -1;
+        auto best_value = -1;
+        for (auto i = 0u; i < filters[0].size(); i++) {
+            if (find(begin(result), end(result), i) != end(result)) {
+                continue;
+            }
+            auto const count_zero = columns.dontcare(i) + columns.zeros(i);
+            auto const count_one = columns.dontcare(i) + columns.ones(i);
+            auto const value = std::max(count_zero, count_one);
+            if (best_bit == -1 || value < best_value) {
+                best_bit = i;
+                best_value = value;
+            }
+        }
+        assert(best_bit >= 0);
+        result.emplace_back(best_bit);
+    }
+
+    return result;
+}
+
+
+
+
+
+template<size_t W>
+auto p4t::best_to_stay_minme(
+        vector<Filter<W>> filters, size_t l, MinMEMode mode, bool only_exact, Deadline const& deadline) 
+    -> tuple<vector<int>, vector<int>, bool> {
+    return minme_trajectory(std::move(filters), l, mode, only_exact, deadline, nullptr);
 }
 
+template<size_t W>
+auto p4t::best_to_stay_minme_multistart(
+        vector<Filter<W>> const& filters, size_t l, bool only_exact, 
+        int num_starts, unsigned seed, Deadline const& deadline) 
+    -> tuple<vector<int>, vector<int>, bool> {
+    assert(num_starts > 0);
+    log()->info("starting multistart minme; starts: {:d}; seed: {:d}", num_starts, seed);
+
+    vector<tuple<vector<int>, vector<int>, bool>> results(num_starts);
+
+    // The first trajectory is the unperturbed one, perturbed ones are not
+    // started after the deadline
+    #pragma omp parallel for schedule(dynamic)
+    for (auto start = 0; start < num_starts; start++) {
+        if (start > 0 && deadline.expired()) {
+            continue;
+        }
+        if (start == 0) {
+            results[start] = minme_trajectory(filters, l, MinMEMode::BLOCKERS, only_exact, deadline, nullptr);
+        } else {
+            std::mt19937 random(seed + start);
+            results[start] = minme_trajectory(filters, l, MinMEMode::BLOCKERS, only_exact, deadline, &random);
+        }
+    }
 
-auto p4t::find_maximal_oi_subset(vector<Filter> const& filters, Filter::BitArray const& mask) -> vector<int> {
+    auto const best = std::max_element(begin(results), end(results), 
+        [](auto const& lhs, auto const& rhs) {
+            return std::get<1>(lhs).size() < std::get<1>(rhs).size();
+        }
+    );
+
+    log()->info("...best start is #{:d} with {:d} filters", best - begin(results), std::get<1>(*best).size());
+
+    return *best;
+}
+
+
+template<size_t W>
+auto p4t::find_maximal_oi_subset(vector<Filter<W>> const& filters, typename Filter<W>::BitArray const& mask,
+                                 Deadline const& deadline) -> vector<int> {
     log()->info("Looking for a maximal oi subset...");
     vector<int> result{};
+    IntersectionIndex<W> accepted(filters, mask);
 
     for (auto i = 0u; i < filters.size(); i++) {
-        auto intersects = false;
-        for (auto j : result) {
-            if (Filter::intersect(filters[j], filters[i], mask)) {
-                intersects = true;
-                break;
-            }
+        if ((i + 1) % DEADLINE_CHECK_PERIOD == 0 && deadline.expired()) {
+            log()->info("...Deadline has expired after {:d} filters", i);
+            break;
         }
-        if (!intersects) {
+        if (!accepted.intersects(filters[i])) {
             result.emplace_back(i);
+            accepted.insert(i);
         }
     }
 
@@ -415,20 +658,22 @@ auto p4t::find_maximal_oi_subset(vector<Filter> const& filters, Filter::BitArray
     return result;
 }
 
-auto p4t::find_maximal_oi_subset_indices(vector<Filter> const& filters, vector<int> const& indices, Filter::BitArray const& mask) -> vector<int> {
+template<size_t W>
+auto p4t::find_maximal_oi_subset_indices(vector<Filter<W>> const& filters, vector<int> const& indices, typename Filter<W>::BitArray const& mask,
+                                         Deadline const& deadline) -> vector<int> {
     log()->info("Looking for a maximal oi subset...");
     vector<int> result{};
+    IntersectionIndex<W> accepted(filters, mask);
 
-    for (auto i : indices) {
-        auto intersects = false;
-        for (auto j : result) {
-            if (Filter::intersect(filters[j], filters[i], mask)) {
-                intersects = true;
-                break;
-            }
+    for (auto k = 0u; k < indices.size(); k++) {
+        if ((k + 1) % DEADLINE_CHECK_PERIOD == 0 && deadline.expired()) {
+            log()->info("...Deadline has expired after {:d} filters", k);
+            break;
         }
-        if (!intersects) {
+        auto const i = indices[k];
+        if (!accepted.intersects(filters[i])) {
             result.emplace_back(i);
+            accepted.insert(i);
         }
     }
 
@@ -436,10 +681,112 @@ auto p4t::find_maximal_oi_subset_indices(vector<Filter> const& filters, vector<i
     return result;
 }
 
-auto p4t::bits_to_mask(vector<int> const& bits) -> Filter::BitArray {
-    Filter::BitArray res{}; 
+template<size_t W>
+auto p4t::bits_to_mask(vector<int> const& bits) -> typename Filter<W>::BitArray {
+    typename Filter<W>::BitArray res{}; 
     for (auto bit : bits) {
         res.set(bit, true);
     }
     return res;
 }
+
+template<size_t W>
+auto p4t::find_max_overlap(vector<Filter<W>> const& filters) -> vector<int> {
+    using BitArray = typename Filter<W>::BitArray;
+
+    if (filters.empty()) {
+        return {};
+    }
+
+    auto const width = filters.front().size();
+    BitArray all_bits{};
+    for (auto bit = 0u; bit < width; bit++) {
+        all_bits.set(bit, true);
+    }
+
+    IntersectionIndex<W> index(filters, all_bits);
+    for (auto i = 0u; i < filters.size(); i++) {
+        index.insert(i);
+    }
+
+    // Starting from every filter, the common region is greedily narrowed down
+    // by filters that intersect it, least specific first. All filters that
+    // contain the region match any packet in it.
+    auto const num_dontcare = [&filters, &all_bits] (int i) {
+        auto result = 0;
+        for (auto k = 0u; k < BitArray::NUM_CHUNKS; k++) {
+            result += __builtin_popcountll(all_bits.chunk(k) & ~filters[i].mask().chunk(k));
+        }
+        return result;
+    };
+
+    auto const overlap_from = [&] (int i) {
+        vector<int> candidates{};
+        index.for_each_intersecting(filters[i], [&candidates, i] (int j) {
+            if (j != i) {
+                candidates.emplace_back(j);
+            }
+        });
+        std::stable_sort(begin(candidates), end(candidates), [&num_dontcare] (auto x, auto y) {
+            return num_dontcare(x) > num_dontcare(y);
+        });
+
+        std::array<uint64_t, BitArray::NUM_CHUNKS> value{}, mask{};
+        for (auto k = 0u; k < BitArray::NUM_CHUNKS; k++) {
+            mask[k] = filters[i].mask().chunk(k);
+            value[k] = filters[i].value().chunk(k) & mask[k];
+        }
+
+        vector<int> result{i};
+        for (auto j : candidates) {
+            if (!Filter<W>::intersect(Filter<W>(value.data(), mask.data(), width), filters[j], all_bits)) {
+                continue;
+            }
+            result.emplace_back(j);
+            for (auto k = 0u; k < BitArray::NUM_CHUNKS; k++) {
+                value[k] |= filters[j].value().chunk(k) & filters[j].mask().chunk(k);
+                mask[k] |= filters[j].mask().chunk(k);
+            }
+        }
+        return result;
+    };
+
+    vector<int> sizes(filters.size(), 0);
+    #pragma omp parallel for schedule(dynamic)
+    for (auto i = 0; i < int(filters.size()); i++) {
+        sizes[i] = overlap_from(i).size();
+    }
+
+    auto result = overlap_from(std::max_element(begin(sizes), end(sizes)) - begin(sizes));
+    std::sort(begin(result), end(result));
+
+    log()->info("for a set of size {:d} {:d} filters matching a single packet are found", filters.size(), result.size());
+
+    return result;
+}
+
+#define P4T_INSTANTIATE_OI_ALGOS(W) \
+    template auto p4t::best_min_similarity_bits<W>( \
+        vector<Filter<W>> const& filters, size_t l) -> vector<int>; \
+    template auto p4t::best_to_stay_minme<W>( \
+        vector<Filter<W>> filters, size_t l, MinMEMode mode, bool only_exact, \
+        Deadline const& deadline) -> tuple<vector<int>, vector<int>, bool>; \
+    template auto p4t::best_to_stay_minme_multistart<W>( \
+        vector<Filter<W>> const& filters, size_t l, bool only_exact, \
+        int num_starts, unsigned seed, Deadline const& deadline) -> tuple<vector<int>, vector<int>, bool>; \
+    template auto p4t::color_oi_groups<W>( \
+        vector<Filter<W>> const& filters, size_t l, bool only_exact, \
+        Deadline const& deadline) -> tuple<vector<int>, vector<vector<int>>, bool>; \
+    template auto p4t::find_maximal_oi_subset<W>( \
+        vector<Filter<W>> const& filters, typename Filter<W>::BitArray const& mask, \
+        Deadline const& deadline) -> vector<int>; \
+    template auto p4t::find_maximal_oi_subset_indices<W>( \
+        vector<Filter<W>> const& filters, vector<int> const& indices, \
+        typename Filter<W>::BitArray const& mask, Deadline const& deadline) -> vector<int>; \
+    template auto p4t::find_max_overlap<W>(vector<Filter<W>> const& filters) -> vector<int>; \
+    template auto p4t::bits_to_mask<W>(vector<int> const& bits) -> typename Filter<W>::BitArray;
+
+P4T_INSTANTIATE_OI_ALGOS(64)
+P4T_INSTANTIATE_OI_ALGOS(128)
+P4T_INSTANTIATE_OI_ALGOS(192)
+P4T_INSTANTIATE_OI_ALGOS(320)
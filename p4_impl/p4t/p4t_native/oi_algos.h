@@ -10,11 +10,36 @@ enum MinMEMode {
     MAX_OI, BLOCKERS
 };
 
-auto best_min_similarity_bits(vector<Filter> const& filters, size_t l) -> vector<int>;
-auto best_to_stay_minme(vector<Filter> filters, size_t l, MinMEMode mode, bool only_exact) -> pair<vector<int>, vector<int>>;
-auto find_maximal_oi_subset(vector<Filter> const& filters, Filter::BitArray const& mask) -> vector<int>;
-auto find_maximal_oi_subset_indices(vector<Filter> const& filters, vector<int> const& indices, Filter::BitArray const& mask) -> vector<int>;
-auto bits_to_mask(vector<int> const& bits) -> Filter::BitArray;
+// Instantiated for filter widths of 64, 128, 192 and 320 (see dispatch_width)
+
+template<size_t W>
+auto best_min_similarity_bits(vector<Filter<W>> const& filters, size_t l) -> vector<int>;
+template<size_t W>
+auto best_to_stay_minme(vector<Filter<W>> filters, size_t l, MinMEMode mode, bool only_exact, 
+                        Deadline const& deadline = Deadline{}) -> tuple<vector<int>, vector<int>, bool>;
+template<size_t W>
+auto best_to_stay_minme_multistart(vector<Filter<W>> const& filters, size_t l, bool only_exact, 
+                                   int num_starts, unsigned seed, 
+                                   Deadline const& deadline = Deadline{}) -> tuple<vector<int>, vector<int>, bool>;
+/// Colors the intersection graph of filters under the least similar bits.
+/// If the deadline expires, only the filters colored so far are grouped.
+template<size_t W>
+auto color_oi_groups(vector<Filter<W>> const& filters, size_t l, bool only_exact, 
+                     Deadline const& deadline = Deadline{}) -> tuple<vector<int>, vector<vector<int>>, bool>;
+/// Filters accepted greedily (in order) while they stay OI. If the deadline
+/// expires, the filters accepted so far are returned.
+template<size_t W>
+auto find_maximal_oi_subset(vector<Filter<W>> const& filters, typename Filter<W>::BitArray const& mask,
+                            Deadline const& deadline = Deadline{}) -> vector<int>;
+template<size_t W>
+auto find_maximal_oi_subset_indices(vector<Filter<W>> const& filters, vector<int> const& indices, typename Filter<W>::BitArray const& mask,
+                                    Deadline const& deadline = Deadline{}) -> vector<int>;
+/// Filters matching a common packet (found greedily, the set is maximal but not
+/// necessarily maximum). No two of these filters can share an OI group.
+template<size_t W>
+auto find_max_overlap(vector<Filter<W>> const& filters) -> vector<int>;
+template<size_t W>
+auto bits_to_mask(vector<int> const& bits) -> typename Filter<W>::BitArray;
 
 }
 
@@ -0,0 +1,163 @@
+#ifndef OI_INDEX_H
+#define OI_INDEX_H
+
+#include "common.h"
+#include "filter.h"
+
+namespace p4t {
+
+/// Ternary trie of filters that answers whether any filter in the set
+/// intersects a given filter under a fixed mask.
+///
+/// Inner nodes branch on a bit into 0, 1 and * (ANY) children, leaves hold
+/// up to LEAF_SIZE filters that are checked with Filter::intersect. A query
+/// only descends into the * child and the child of the filter's value (or
+/// all children, if the filter has ANY in the bit).
+template<size_t W>
+class IntersectionIndex {
+public:
+    using BitArray = typename Filter<W>::BitArray;
+
+    static auto constexpr LEAF_SIZE = 32u;
+
+public:
+    /// Args:
+    ///     filters: Filters referred to by indices (must outlive the index).
+    ///     mask: Bits that are taken into account.
+    IntersectionIndex(vector<Filter<W>> const& filters, BitArray const& mask)
+        : filters_(filters), mask_{}, bits_{}, nodes_{} {
+        reset(mask);
+    }
+
+    /// Removes all filters and changes the mask, keeping allocated memory
+    void reset(BitArray const& mask) {
+        mask_ = mask;
+        bits_.clear();
+        for (auto bit = 0u; bit < W; bit++) {
+            if (mask_.get(bit)) {
+                bits_.emplace_back(bit);
+            }
+        }
+        nodes_.resize(1);
+        nodes_.front() = Node{};
+    }
+
+    /// Checks whether any filter in the index intersects the given one
+    auto intersects(Filter<W> const& filter) const -> bool {
+        return visit(filter, [](int) { return true; });
+    }
+
+    /// Calls f(i) for every filter i in the index that intersects the given one
+    template<class Function>
+    void for_each_intersecting(Filter<W> const& filter, Function f) const {
+        visit(filter, [&f](int i) { f(i); return false; });
+    }
+
+    /// Adds the i-th filter to the index
+    void insert(int i) {
+        auto node = 0;
+        while (nodes_[node].bit != -1) {
+            auto const branch = branch_of(filters_[i], nodes_[node].bit);
+            if (nodes_[node].children[branch] == -1) {
+                nodes_[node].children[branch] = nodes_.size();
+                nodes_.emplace_back();
+            }
+            node = nodes_[node].children[branch];
+        }
+
+        nodes_[node].items.emplace_back(i);
+        if (nodes_[node].items.size() >= nodes_[node].split_at) {
+            split(node);
+        }
+    }
+
+private:
+    static auto constexpr ANY = 2;
+
+    struct Node {
+        int bit = -1;
+        std::array<int, 3> children{{-1, -1, -1}};
+        vector<int> items{};
+        size_t split_at = LEAF_SIZE;
+    };
+
+    static auto branch_of(Filter<W> const& filter, int bit) {
+        switch (filter[bit]) {
+            case Bit::ZERO: return 0;
+            case Bit::ONE: return 1;
+            default: return ANY;
+        }
+    }
+
+    /// Calls f(i) for intersecting filters until it returns true
+    template<class Function>
+    auto visit(Filter<W> const& filter, Function f) const -> bool {
+        vector<int> stack{0};
+        while (!stack.empty()) {
+            auto const& node = nodes_[stack.back()];
+            stack.pop_back();
+
+            if (node.bit == -1) {
+                for (auto i : node.items) {
+                    if (Filter<W>::intersect(filters_[i], filter, mask_) && f(i)) {
+                        return true;
+                    }
+                }
+                continue;
+            }
+
+            auto const branch = branch_of(filter, node.bit);
+            for (auto b = 0; b < 3; b++) {
+                if ((b == branch || b == ANY || branch == ANY) && node.children[b] != -1) {
+                    stack.emplace_back(node.children[b]);
+                }
+            }
+        }
+        return false;
+    }
+
+    /// Splits a leaf by the bit that best separates its filters into 0 and 1
+    void split(int node) {
+        auto best_bit = -1;
+        auto best_score = 0;
+        for (auto bit : bits_) {
+            std::array<int, 3> count{{0, 0, 0}};
+            for (auto i : nodes_[node].items) {
+                count[branch_of(filters_[i], bit)]++;
+            }
+            auto const score = std::min(count[0], count[1]);
+            if (score > best_score) {
+                best_bit = bit;
+                best_score = score;
+            }
+        }
+
+        if (best_bit == -1) {
+            // Filters cannot be separated, try again when the leaf doubles
+            nodes_[node].split_at *= 2;
+            return;
+        }
+
+        auto const items = std::move(nodes_[node].items);
+        nodes_[node].items = {};
+        nodes_[node].bit = best_bit;
+        for (auto i : items) {
+            auto const branch = branch_of(filters_[i], best_bit);
+            if (nodes_[node].children[branch] == -1) {
+                nodes_[node].children[branch] = nodes_.size();
+                nodes_.emplace_back();
+            }
+            nodes_[nodes_[node].children[branch]].items.emplace_back(i);
+        }
+    }
+
+private:
+    vector<Filter<W>> const& filters_;
+    BitArray mask_;
+    vector<int> bits_;
+    vector<Node> nodes_;
+};
+
+}
+
+#endif // OI_INDEX_H
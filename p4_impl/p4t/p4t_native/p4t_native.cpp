@@ -2,6 +2,7 @@
 #include <limits>
 #include <numeric>
 #include <map>
+#include <atomic>
 #include <omp.h>
 
 #include "filter.h"
@@ -11,6 +12,7 @@
 #include "chain_algos.h"
 #include "oi_algos.h"
 #include "expansion_algos.h"
+#include "range_algos.h"
 
 #include "p4t_native.h"
 
@@ -62,6 +64,16 @@ auto select_unique_n_weight(vector<Support> const& supports)
     return make_pair(unique, weights);
 }
 
+std::atomic<int> num_threads{0};
+
+// OpenMP settings are per thread, so they are reapplied in the calling thread
+void apply_num_threads() {
+    if (num_threads > 0) {
+        omp_set_dynamic(false);
+        omp_set_num_threads(num_threads);
+    }
+}
+
 auto svmrs2supports(py::object svmrs) {
     vector<vector<Support>> sss(len(svmrs));
     for (auto i = 0; i < len(svmrs); ++i) {
@@ -79,11 +91,18 @@ auto p4t::min_pmgr(py::object svmr) -> py::object {
 
     auto const filters = svmr2filters(svmr);
 
-    auto const supports = to_supports(filters);
-    auto const supports_unique = select_unique(supports);
+    vector<vector<Support>> partition{};
+    vector<vector<int>> partition_indices{};
+    {
+        GILRelease const nogil{};
+        apply_num_threads();
 
-    auto const partition = find_min_chain_partition(supports_unique);
-    auto const partition_indices = map_partition_indices(partition, supports);
+        auto const supports = to_supports(filters);
+        auto const supports_unique = select_unique(supports);
+
+        partition = find_min_chain_partition(supports_unique);
+        partition_indices = map_partition_indices(partition, supports);
+    }
 
     return py::make_tuple(to_python(partition), to_python(partition_indices));
 }
@@ -91,73 +110,198 @@ auto p4t::min_pmgr(py::object svmr) -> py::object {
 auto p4t::min_bmgr(py::object svmrs, int max_num_groups) -> py::object {
     auto const n_supports = svmrs2supports(svmrs);
 
-    vector<vector<Support>> n_unique_supports(n_supports.size());
-    vector<vector<int>> n_weights(n_supports.size());
-    for (auto i = 0u; i < n_supports.size(); ++i) {
-        tie(n_unique_supports[i], n_weights[i]) = select_unique_n_weight(n_supports[i]);
-    }
-    
-    auto const partitions = find_min_bounded_chain_partition(
-        n_unique_supports, n_weights, max_num_groups
-    );
+    vector<vector<vector<Support>>> partitions{};
+    vector<vector<vector<int>>> n_partition_indices(n_supports.size());
+    {
+        GILRelease const nogil{};
+        apply_num_threads();
 
-    vector<vector<vector<int>>> n_partition_indices(len(svmrs));
-    for (auto i = 0; i < len(svmrs); i++) {
-        n_partition_indices[i] = map_partition_indices(partitions[i], n_supports[i]);
+        vector<vector<Support>> n_unique_supports(n_supports.size());
+        vector<vector<int>> n_weights(n_supports.size());
+        for (auto i = 0u; i < n_supports.size(); ++i) {
+            tie(n_unique_supports[i], n_weights[i]) = select_unique_n_weight(n_supports[i]);
+        }
+        
+        partitions = find_min_bounded_chain_partition(
+            n_unique_supports, n_weights, max_num_groups
+        );
+
+        for (auto i = 0u; i < n_supports.size(); i++) {
+            n_partition_indices[i] = map_partition_indices(partitions[i], n_supports[i]);
+        }
     }
 
     return py::make_tuple(to_python(partitions), to_python(n_partition_indices));
 }
 
-auto p4t::best_subgroup(py::object svmr, int l, bool only_exact, string algo) -> py::object {
+auto p4t::min_bmgr_coverage(py::object svmrs, int max_num_groups) -> py::object {
+    auto const n_supports = svmrs2supports(svmrs);
+
+    vector<long long> coverage{};
+    {
+        GILRelease const nogil{};
+        apply_num_threads();
+
+        vector<vector<Support>> n_unique_supports(n_supports.size());
+        vector<vector<int>> n_weights(n_supports.size());
+        for (auto i = 0u; i < n_supports.size(); ++i) {
+            tie(n_unique_supports[i], n_weights[i]) = select_unique_n_weight(n_supports[i]);
+        }
+
+        coverage = find_bounded_chain_coverage(n_unique_supports, n_weights, max_num_groups);
+    }
+
+    return to_python(coverage);
+}
+
+auto p4t::best_subgroup(
+        py::object svmr, int l, bool only_exact, string algo, 
+        py::object time_budget, int num_starts, unsigned seed, bool report_complete) -> py::object {
     auto const filters = svmr2filters(svmr);
+    auto const deadline = time_budget.is_none() ? Deadline{} : Deadline{py::extract<double>(time_budget)};
 
-    if (algo == "min_similarity") {
-        auto const bits = best_min_similarity_bits(filters, l);
-        auto const result = find_maximal_oi_subset(filters, bits_to_mask(bits));
+    vector<int> bits{};
+    vector<int> indices{};
+    auto complete = true;
 
-        return py::make_tuple(to_python(bits), to_python(result));
+    if (algo == "min_similarity") {
+        GILRelease const nogil{};
+        apply_num_threads();
+
+        tie(bits, indices) = dispatch_width(filters, [l](auto const& typed_filters) {
+            using TypedFilter = typename std::decay_t<decltype(typed_filters)>::value_type;
+            auto const bits = best_min_similarity_bits(typed_filters, l);
+            return make_pair(bits, find_maximal_oi_subset(typed_filters, bits_to_mask<TypedFilter::WIDTH>(bits)));
+        });
     } else  if (algo == "icnp_oi" || algo == "icnp_blockers") {
         auto const minme_mode = algo == "icnp_oi" ? MinMEMode::MAX_OI : MinMEMode::BLOCKERS;
-        auto const bits_n_result = best_to_stay_minme(filters, l, minme_mode, only_exact);
-
-        return py::make_tuple(to_python(bits_n_result.first), to_python(bits_n_result.second));
+        GILRelease const nogil{};
+        apply_num_threads();
+
+        tie(bits, indices, complete) = dispatch_width(filters, [=, &deadline](auto const& typed_filters) {
+            return best_to_stay_minme(typed_filters, l, minme_mode, only_exact, deadline);
+        });
+    } else if (algo == "icnp_multistart") {
+        GILRelease const nogil{};
+        apply_num_threads();
+
+        tie(bits, indices, complete) = dispatch_width(filters, [=, &deadline](auto const& typed_filters) {
+            return best_to_stay_minme_multistart(typed_filters, l, only_exact, num_starts, seed, deadline);
+        });
     } else {
         return py::object();
     }
+
+    if (!report_complete) {
+        return py::make_tuple(to_python(bits), to_python(indices));
+    }
+    return py::make_tuple(to_python(bits), to_python(indices), complete);
 }
 
-void p4t::set_num_threads(int num_threads) {
-    omp_set_dynamic(false);
-    omp_set_num_threads(num_threads);
+auto p4t::oi_coloring(py::object classifier, int max_width, bool only_exact, py::object time_budget) -> py::object {
+    auto const filters = svmr2filters(classifier);
+    auto const deadline = time_budget.is_none() ? Deadline{} : Deadline{py::extract<double>(time_budget)};
+
+    vector<int> bits{};
+    vector<vector<int>> groups{};
+    auto complete = true;
+    {
+        GILRelease const nogil{};
+        apply_num_threads();
+
+        tie(bits, groups, complete) = dispatch_width(filters, [=, &deadline](auto const& typed_filters) {
+            return color_oi_groups(typed_filters, max_width, only_exact, deadline);
+        });
+    }
+
+    return py::make_tuple(to_python(bits), to_python(groups), complete);
+}
+
+auto p4t::max_antichain(py::object classifier) -> py::object {
+    auto const filters = svmr2filters(classifier);
+
+    vector<int> indices{};
+    {
+        GILRelease const nogil{};
+        apply_num_threads();
+
+        auto const supports = to_supports(filters);
+        auto const supports_unique = select_unique(supports);
+
+        support_set antichain{};
+        for (auto i : find_max_antichain(supports_unique)) {
+            antichain.emplace(supports_unique[i]);
+        }
+
+        // A single rule is taken for every support in the antichain
+        for (auto i = 0u; i < supports.size(); i++) {
+            if (antichain.erase(supports[i])) {
+                indices.emplace_back(i);
+            }
+        }
+    }
+
+    return to_python(indices);
+}
+
+auto p4t::max_overlap(py::object classifier) -> py::object {
+    auto const filters = svmr2filters(classifier);
+
+    vector<int> indices{};
+    {
+        GILRelease const nogil{};
+        apply_num_threads();
+
+        indices = dispatch_width(filters, [](auto const& typed_filters) {
+            return find_max_overlap(typed_filters);
+        });
+    }
+
+    return to_python(indices);
+}
+
+auto p4t::range_to_prefixes_py(uint64_t lo, uint64_t hi, int width) -> py::object {
+    return to_python(range_to_prefixes(lo, hi, width));
+}
+
+void p4t::set_num_threads(int n) {
+    num_threads = n;
+    apply_num_threads();
 }
 
 auto p4t::min_bmgr1_w_expansions(py::object classifier, int max_expanded_bits) -> py::object {
     if (len(classifier) == 0) {
         return py::object();
     }
-    auto const supports = to_supports(svmr2filters(classifier));
-    vector<vector<Support>> unique_supports(1); 
-    vector<vector<int>> weights(1);
-    tie(unique_supports[0], weights[0]) = select_unique_n_weight(supports);
-
-    auto const chain = find_min_bounded_chain_partition(
-        unique_supports, weights, 1
-    )[0][0];
+    auto const filters = svmr2filters(classifier);
 
     vector<Support> chain_w_expansions;
-    support_map<Support> expansions;
-    tie(chain_w_expansions, expansions) = try_expand_chain(
-            chain, unique_supports[0], weights[0], max_expanded_bits);
-
-
-    support_set in_chain(begin(chain_w_expansions), end(chain_w_expansions));
     vector<int> indices;
     vector<Support> exps;
-    for (auto i = 0; i < int(supports.size()); i++) {
-        if (in_chain.count(expansions[supports[i]])) {
-            indices.push_back(i);
-            exps.push_back(expansions[supports[i]]);
+    {
+        GILRelease const nogil{};
+        apply_num_threads();
+
+        auto const supports = to_supports(filters);
+        vector<vector<Support>> unique_supports(1); 
+        vector<vector<int>> weights(1);
+        tie(unique_supports[0], weights[0]) = select_unique_n_weight(supports);
+
+        auto const chain = find_min_bounded_chain_partition(
+            unique_supports, weights, 1
+        )[0][0];
+
+        support_map<Support> expansions;
+        tie(chain_w_expansions, expansions) = try_expand_chain(
+                chain, unique_supports[0], weights[0], max_expanded_bits);
+
+
+        support_set in_chain(begin(chain_w_expansions), end(chain_w_expansions));
+        for (auto i = 0; i < int(supports.size()); i++) {
+            if (in_chain.count(expansions[supports[i]])) {
+                indices.push_back(i);
+                exps.push_back(expansions[supports[i]]);
+            }
         }
     }
 
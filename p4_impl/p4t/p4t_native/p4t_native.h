@@ -8,7 +8,15 @@ namespace p4t {
 auto min_pmgr(py::object classifier) -> py::object;
 auto min_bmgr1_w_expansions(py::object classifier, int max_expanded_bits) -> py::object;
 auto min_bmgr(py::object classifiers, int max_num_groups) -> py::object;
-auto best_subgroup(py::object classifier, int max_width, bool only_exact, string algo) -> py::object;
+auto min_bmgr_coverage(py::object classifiers, int max_num_groups) -> py::object;
+auto best_subgroup(py::object classifier, int max_width, bool only_exact, string algo, 
+                   py::object time_budget = py::object(), int num_starts = 8, unsigned seed = 0,
+                   bool report_complete = false) -> py::object;
+auto oi_coloring(py::object classifier, int max_width, bool only_exact, 
+                 py::object time_budget = py::object()) -> py::object;
+auto max_antichain(py::object classifier) -> py::object;
+auto max_overlap(py::object classifier) -> py::object;
+auto range_to_prefixes_py(uint64_t lo, uint64_t hi, int width) -> py::object;
 void set_num_threads(int num_threads);
 void pylog(string msg);
 
@@ -1,14 +1,31 @@
 #include <boost/python.hpp>
 
 #include "p4t_native.h"
+#include "classifier_handle.h"
 
 BOOST_PYTHON_MODULE(p4t_native) {
     using namespace boost::python;
 
     def("min_pmgr", p4t::min_pmgr);
-    def("best_subgroup", p4t::best_subgroup);
+    def("best_subgroup", p4t::best_subgroup, 
+        (arg("classifier"), arg("max_width"), arg("only_exact"), arg("algo"), 
+         arg("time_budget")=object(), arg("num_starts")=8, arg("seed")=0, arg("report_complete")=false));
+    def("oi_coloring", p4t::oi_coloring,
+        (arg("classifier"), arg("max_width"), arg("only_exact"), arg("time_budget")=object()));
+    def("max_antichain", p4t::max_antichain);
+    def("max_overlap", p4t::max_overlap);
     def("set_num_threads", p4t::set_num_threads);
     def("log", p4t::pylog);
     def("min_bmgr", p4t::min_bmgr);
+    def("min_bmgr_coverage", p4t::min_bmgr_coverage);
     def("min_bmgr1_w_expansions", p4t::min_bmgr1_w_expansions);
+    def("range_to_prefixes", p4t::range_to_prefixes_py);
+
+    class_<p4t::ClassifierHandle>("ClassifierHandle", init<object>())
+        .def("from_packed", &p4t::ClassifierHandle::from_packed)
+        .staticmethod("from_packed")
+        .def("__len__", &p4t::ClassifierHandle::size)
+        .add_property("bit_width", &p4t::ClassifierHandle::bit_width)
+        .def("subset", &p4t::ClassifierHandle::subset)
+        .def("reorder", &p4t::ClassifierHandle::reorder);
 }
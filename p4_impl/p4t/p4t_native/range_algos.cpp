@@ -0,0 +1,40 @@
+#include <stdexcept>
+
+#include "range_algos.h"
+
+namespace {
+
+using namespace p4t;
+
+auto to_ternary(uint64_t value, int num_fixed, int width) -> string {
+    string result(width, '*');
+    for (auto i = 0; i < num_fixed; i++) {
+        result[i] = (value >> (width - 1 - i)) & 1 ? '1' : '0';
+    }
+    return result;
+}
+
+}
+
+auto p4t::range_to_prefixes(uint64_t lo, uint64_t hi, int width) -> vector<string> {
+    if (width <= 0 || width > 63) {
+        throw std::invalid_argument("range width must be in [1, 63]");
+    }
+    if (lo > hi || hi >= (uint64_t(1) << width)) {
+        throw std::invalid_argument("invalid range");
+    }
+
+    vector<string> result{};
+    while (lo <= hi) {
+        // The largest aligned block starting at lo that fits into [lo, hi]
+        auto num_free = 0;
+        while (num_free < width
+                && (lo & ((uint64_t(1) << (num_free + 1)) - 1)) == 0
+                && lo + (uint64_t(1) << (num_free + 1)) - 1 <= hi) {
+            num_free++;
+        }
+        result.emplace_back(to_ternary(lo, width - num_free, width));
+        lo += uint64_t(1) << num_free;
+    }
+    return result;
+}
@@ -0,0 +1,12 @@
+#ifndef RANGE_ALGOS_H
+#define RANGE_ALGOS_H
+
+#include "common.h"
+
+namespace p4t {
+
+auto range_to_prefixes(uint64_t lo, uint64_t hi, int width) -> vector<string>;
+
+}
+
+#endif // RANGE_ALGOS_H
@@ -7,10 +7,14 @@
 
 #include "common.h"
 #include "filter.h"
+#include "bit_array.h"
 
 namespace p4t { 
 using Support = vector<int>;
 
+/// Support interned as a bitmask, so that the subset test is a single AND per word
+using SupportMask = PackedBitArray<uint64_t, MAX_WIDTH>;
+
 template<class T>
 using support_map = std::unordered_map<Support, T, boost::hash<Support>>;
 using support_set = std::unordered_set<Support, boost::hash<Support>>;
@@ -23,19 +27,22 @@ inline auto select_unique(vector<Support> supports) -> vector<Support> {
     return supports;
 }
 
-inline auto to_support(Filter const& filter) -> Support {
+inline auto to_support(FilterSet const& filters, size_t i) -> Support {
     Support result{};
-    for (auto i = 0; i < int(filter.size()); i++) {
-        if (filter[i] != Bit::ANY) {
-            result.emplace_back(i);
+    for (auto word = 0u; word < num_words(filters.width()); word++) {
+        for (auto mask = filters.mask(i)[word]; mask != 0; mask &= mask - 1) {
+            result.emplace_back(word * BITS_PER_WORD + __builtin_ctzll(mask));
         }
     }
     return result;
 }
 
-inline auto to_supports(vector<Filter> const& filters) -> vector<Support> {
+inline auto to_supports(FilterSet const& filters) -> vector<Support> {
     vector<Support> supports{};
-    transform(begin(filters), end(filters), back_inserter(supports), to_support);
+    supports.reserve(filters.size());
+    for (auto i = 0u; i < filters.size(); i++) {
+        supports.emplace_back(to_support(filters, i));
+    }
     return supports;
 }
 
@@ -43,6 +50,32 @@ inline auto is_subset(Support const& lhs, Support const& rhs) {
     return std::includes(begin(rhs), end(rhs), begin(lhs), end(lhs)); 
 }
 
+inline auto to_mask(Support const& s) -> SupportMask {
+    SupportMask result{};
+    for (auto bit : s) {
+        result.set(bit, true);
+    }
+    return result;
+}
+
+inline auto to_masks(vector<Support> const& ss) -> vector<SupportMask> {
+    vector<SupportMask> masks{};
+    masks.reserve(ss.size());
+    for (auto const& s : ss) {
+        masks.emplace_back(to_mask(s));
+    }
+    return masks;
+}
+
+inline auto is_subset(SupportMask const& lhs, SupportMask const& rhs) {
+    for (auto i = 0u; i < SupportMask::NUM_CHUNKS; i++) {
+        if (lhs.chunk(i) & ~rhs.chunk(i)) {
+            return false;
+        }
+    }
+    return true;
+}
+
 inline auto is_in_conflict(Support const& lhs, Support const& rhs) {
     return !is_subset(lhs, rhs) && !is_subset(rhs, lhs);
 }
@@ -1,18 +1,206 @@
 #ifndef UTILS_H
 #define UTILS_H
 
+#include <stdexcept>
+
 #include "filter.h"
+#include "classifier_handle.h"
 
 namespace p4t {
 
+class PyBuffer {
+public:
+    /// The buffer is C-contiguous unless layout is relaxed (e.g., to PyBUF_STRIDES)
+    explicit PyBuffer(py::object const& obj, int flags = 0, int layout = PyBUF_C_CONTIGUOUS) {
+        if (PyObject_GetBuffer(obj.ptr(), &view_, layout | PyBUF_FORMAT | flags) != 0) {
+            py::throw_error_already_set();
+        }
+    }
+
+    PyBuffer(PyBuffer const&) = delete;
+    PyBuffer& operator=(PyBuffer const&) = delete;
+
+    ~PyBuffer() {
+        PyBuffer_Release(&view_);
+    }
+
+    auto ndim() const {
+        return view_.ndim;
+    }
+
+    auto shape(int i) const {
+        return size_t(view_.shape[i]);
+    }
+
+    auto itemsize() const {
+        return size_t(view_.itemsize);
+    }
+
+    auto format() const {
+        return string(view_.format != nullptr ? view_.format : "B");
+    }
+
+    template<class T>
+    auto data() const {
+        return static_cast<T const*>(view_.buf);
+    }
+
+    /// The i-th item of a 1-d buffer (honours strides)
+    template<class T>
+    auto item(size_t i) const {
+        auto const stride = view_.strides != nullptr ? view_.strides[0] : view_.itemsize;
+        return *reinterpret_cast<T const*>(static_cast<char const*>(view_.buf) + Py_ssize_t(i) * stride);
+    }
+
+    template<class T>
+    auto mutable_data() {
+        return static_cast<T*>(view_.buf);
+    }
+
+private:
+    Py_buffer view_;
+};
+
+/// Releases the GIL for the lifetime of the object, so Python API must not be used meanwhile
+class GILRelease {
+public:
+    GILRelease()
+        : state_{PyEval_SaveThread()} {
+    }
+
+    GILRelease(GILRelease const&) = delete;
+    GILRelease& operator=(GILRelease const&) = delete;
+
+    ~GILRelease() {
+        PyEval_RestoreThread(state_);
+    }
+
+private:
+    PyThreadState* state_;
+};
+
+inline auto packed2filters(py::object const& values, py::object const& masks, size_t width) {
+    FilterSet filters{width};
+
+    PyBuffer const value_buf{values};
+    PyBuffer const mask_buf{masks};
+
+    auto const row_words = num_words(width);
+    for (auto const* buf : {&value_buf, &mask_buf}) {
+        if (buf->ndim() != 2 || buf->itemsize() != sizeof(uint64_t) || buf->shape(1) != row_words) {
+            throw std::invalid_argument("packed values and masks must be (n, ceil(width / 64)) uint64 arrays");
+        }
+    }
+    if (value_buf.shape(0) != mask_buf.shape(0)) {
+        throw std::invalid_argument("packed values and masks must have the same shape");
+    }
+
+    filters.reserve(value_buf.shape(0));
+    for (auto i = 0u; i < value_buf.shape(0); i++) {
+        filters.push_back(
+            value_buf.data<uint64_t>() + i * row_words, 
+            mask_buf.data<uint64_t>() + i * row_words);
+    }
+
+    return filters;
+}
+
+/// Reads VMR entry bits one by one (value and mask are Python sequences of bools)
+inline void append_entry(FilterSet& filters, py::object const& entry) {
+    py::object const value = entry.attr("value");
+    py::object const mask = entry.attr("mask");
+    if (size_t(len(value)) != filters.width() || size_t(len(mask)) != filters.width()) {
+        throw std::invalid_argument("all entries must have the same bit width");
+    }
+
+    vector<uint64_t> value_words(num_words(filters.width()));
+    vector<uint64_t> mask_words(num_words(filters.width()));
+    for (auto i = 0u; i < filters.width(); i++) {
+        value_words[i / BITS_PER_WORD] |= uint64_t(bool(py::extract<bool>(value[i]))) << (i % BITS_PER_WORD);
+        mask_words[i / BITS_PER_WORD] |= uint64_t(bool(py::extract<bool>(mask[i]))) << (i % BITS_PER_WORD);
+    }
+    filters.push_back(value_words.data(), mask_words.data());
+}
+
+inline auto has_attr(py::object const& obj, char const* name) {
+    return PyObject_HasAttrString(obj.ptr(), name);
+}
+
+inline auto normalize_index(Py_ssize_t index, size_t size) -> int {
+    if (index < 0) {
+        index += size;
+    }
+    if (index < 0 || size_t(index) >= size) {
+        throw std::out_of_range("index out of range");
+    }
+    return index;
+}
+
+template<class T>
+auto buffer2indices(PyBuffer const& buf, size_t size) -> vector<int> {
+    vector<int> result{};
+    result.reserve(buf.shape(0));
+    for (auto i = 0u; i < buf.shape(0); i++) {
+        result.emplace_back(normalize_index(buf.item<T>(i), size));
+    }
+    return result;
+}
+
+/// Converts a sequence of Python style indices, 1-d integer buffers (e.g.
+/// NumPy arrays, possibly strided) are read directly.
+inline auto py2indices(py::object const& seq, size_t size) -> vector<int> {
+    if (PyObject_CheckBuffer(seq.ptr())) {
+        PyBuffer const buf{seq, 0, PyBUF_STRIDES};
+        auto const format = buf.format();
+        if (buf.ndim() == 1 && format.size() > 0 && string("ilqn").find(format.back()) != string::npos) {
+            if (buf.itemsize() == sizeof(int32_t)) {
+                return buffer2indices<int32_t>(buf, size);
+            } else if (buf.itemsize() == sizeof(int64_t)) {
+                return buffer2indices<int64_t>(buf, size);
+            }
+        }
+    }
+
+    vector<int> result{};
+    result.reserve(len(seq));
+    for (auto i = 0; i < len(seq); i++) {
+        auto const index = PyNumber_AsSsize_t(py::object(seq[i]).ptr(), PyExc_IndexError);
+        if (index == -1 && PyErr_Occurred()) {
+            py::throw_error_already_set();
+        }
+        result.emplace_back(normalize_index(index, size));
+    }
+    return result;
+}
 
 inline auto svmr2filters(py::object const& svmr) {
+    py::extract<ClassifierHandle const&> const handle(svmr);
+    if (handle.check()) {
+        if (handle().size() == 0) {
+            throw std::invalid_argument("svmr should not be empty");
+        }
+        return handle().filters();
+    }
+
+    // Classifiers backed by p4t.vmrs.packed.PackedVMR are read directly from packed arrays
+    if (has_attr(svmr, "vmr")) {
+        py::object const vmr = svmr.attr("vmr");
+        if (has_attr(vmr, "values") && has_attr(vmr, "masks")) {
+            auto filters = packed2filters(vmr.attr("values"), vmr.attr("masks"), py::extract<size_t>(vmr.attr("bit_width")));
+            if (filters.empty()) {
+                throw std::invalid_argument("svmr should not be empty");
+            }
+            return filters;
+        }
+    }
+
     if (len(svmr) == 0) {
         throw std::invalid_argument("svmr should not be empty");
     }
-    vector<Filter> filters{};
+    FilterSet filters{size_t(len(svmr[0].attr("value")))};
+    filters.reserve(len(svmr));
     for (auto i = 0; i < len(svmr); i++) {
-        filters.emplace_back(Filter(svmr[i]));
+        append_entry(filters, svmr[i]);
     }
 
     return filters;
@@ -22,6 +210,14 @@ inline auto svmr2filters(py::object const& svmr) {
 
 namespace std { // Need std for ADL
 
+/// Index vectors and supports are returned as NumPy int32 arrays
+inline auto to_python(vector<int> const& xs) -> boost::python::object {
+    boost::python::object result = boost::python::import("numpy").attr("empty")(xs.size(), "int32");
+    p4t::PyBuffer buf{result, PyBUF_WRITABLE};
+    std::copy(begin(xs), end(xs), buf.mutable_data<int32_t>());
+    return result;
+}
+
 template<class T>
 auto to_python(T const& x) -> T {
     return x;
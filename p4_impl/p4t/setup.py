@@ -8,7 +8,9 @@ p4t_native = Extension(
         'p4t_native_ext.cpp',
         'chain_algos.cpp',
         'oi_algos.cpp',
-        'expansion_algos.cpp'
+        'expansion_algos.cpp',
+        'range_algos.cpp',
+        'classifier_handle.cpp'
     ]],
     libraries=['boost_python', 'gomp'],
     include_dirs=['p4t_native'],
@@ -22,7 +24,7 @@ setup(
     license='Apache-2.0',
     packages=find_packages(exclude=['test*']),
     ext_modules=[p4t_native],
-    install_requires=['p4-hlir', 'p4c-bm', 'bitstring'],
+    install_requires=['p4-hlir', 'p4c-bm', 'bitstring', 'numpy', 'futures; python_version < "3"'],
     setup_requires=['pytest-runner'],
     tests_require=['pytest']
 )
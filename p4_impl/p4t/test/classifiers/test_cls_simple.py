@@ -1,6 +1,7 @@
 import pytest
 
 import p4t.vmrs.simple as vmr
+import p4t.vmrs.packed as pvmr
 import p4t.classifiers.simple as classifiers
 
 from test_cls_generic import TestGenericClassifier
@@ -26,6 +27,52 @@ class TestBasicClassifier(TestGenericClassifier):
     __test__ = True
 
 
+class TestPackedClassifier(TestGenericClassifier):
+    __test__ = True
+
+    @pytest.fixture
+    def classifier(self):
+        return classifiers.BasicClassifier(pvmr.PackedVMR(3, ENTRIES, 4))
+
+    def test_subset_stays_packed(self, classifier):
+        assert isinstance(classifier.subset([0, 2]).vmr, pvmr.PackedVMR)
+
+    def test_reorder_fpc(self, classifier):
+        r_cls = classifier.reorder([1, 2])
+        assert isinstance(r_cls.vmr, pvmr.PackedVMR)
+        assert r_cls[0].action.vmr_entry == ENTRIES[0]
+        assert r_cls.reorder([1, 0])[0].action.vmr_entry == ENTRIES[0]
+
+
+class TestSubsetView(TestGenericClassifier):
+    __test__ = True
+
+    @pytest.fixture
+    def classifier(self):
+        extended = vmr.SimpleVMR(3, ENTRIES[:1] + ENTRIES, 4)
+        return classifiers.BasicClassifier(extended).subset_view([1, 2, 3])
+
+    def test_view_is_lazy(self, classifier):
+        assert classifier[:] == ENTRIES
+        assert classifier._materialized is None
+
+    def test_view_composition(self, classifier):
+        view = classifier.subset_view([2, 0])
+        assert view.parent is classifier.parent
+        assert list(view.indices) == [3, 1]
+        assert view[:] == [ENTRIES[2], ENTRIES[0]]
+
+    def test_materialize(self, classifier):
+        materialized = classifier.materialize()
+        assert isinstance(materialized, classifiers.BasicClassifier)
+        assert materialized[:] == ENTRIES
+        assert classifier.vmr is materialized.vmr
+
+    def test_parent_attributes(self, classifier):
+        view = classifier.reorder([0, 2, 1]).subset_view([1])
+        assert view.bits == [0, 2, 1]
+
+
 @pytest.fixture
 def r_classifier():
     return classifiers.ReorderingClassifier([0, 2, 1], SVMR)
@@ -63,3 +110,39 @@ class TestReorderClassifier(object):
         r_cls_1 = classifier.reorder([1, 2])
         r_cls_2 = r_cls_1.reorder([1, 0])
         assert r_cls_1[0].action.vmr_entry == r_cls_2[0].action.vmr_entry
+
+    def test_reorder_is_lazy(self, classifier):
+        r_cls = classifier.reorder([2, 0, 1])
+        assert r_cls.is_lazy
+        assert len(r_cls) == len(classifier)
+        assert r_cls.bit_width == 3
+        assert r_cls[:] == classifier.reorder([2, 0, 1])[:]
+        assert not r_cls.is_lazy
+
+    @pytest.mark.parametrize('vmr_type', [vmr.SimpleVMR, pvmr.PackedVMR])
+    def test_reorder_source_changed(self, vmr_type):
+        cls = classifiers.BasicClassifier(vmr_type(3, ENTRIES, 4))
+        r_cls_1 = cls.reorder([2, 1, 0])
+        assert r_cls_1[0] == vmr.SimpleVMREntry([False, True, True], [True, True, True], 1, 1)
+        cls.vmr[0] = ENTRIES[1]
+        r_cls_2 = cls.reorder([2, 1, 0])
+        assert r_cls_2.vmr is not r_cls_1.vmr
+        assert r_cls_2[0] == vmr.SimpleVMREntry([False, False, True], [False, True, True], 2, 2)
+        assert r_cls_1[0].value == [False, True, True]
+
+    def test_reorder_vmr_not_shared(self, classifier):
+        r_cls_1 = classifier.reorder([2, 0, 1])
+        r_cls_2 = classifier.reorder([2, 0, 1])
+        r_cls_1.vmr[0] = r_cls_1[1]
+        assert r_cls_2[0] == classifier.reorder([2, 0, 1])[0] != r_cls_1[0]
+
+    def test_reorder_composition(self, classifier):
+        r_cls = classifier.reorder([1, 2]).reorder([1, 0])
+        assert r_cls.is_lazy
+        assert r_cls.bits == [2, 1]
+        assert r_cls[:] == classifier.reorder([2, 1])[:]
+
+    def test_lazy_subset(self, classifier):
+        ss_cls = classifier.reorder([2, 0]).subset([2, 0])
+        assert ss_cls.is_lazy
+        assert ss_cls[:] == [classifier.reorder([2, 0])[i] for i in [2, 0]]
@@ -1,8 +1,14 @@
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
 import pytest
+import numpy as np
 
 from p4t.vmrs.simple import SimpleVMREntry, SimpleVMR
+from p4t.vmrs.packed import PackedVMR
 from p4t.classifiers.simple import BasicClassifier
 import p4t.optimizations.oi_lpm as opt
+import p4t_native
 
 from ..conftest import create_entry
 
@@ -21,6 +27,13 @@ def classifier():
     return BasicClassifier(vmr)
 
 
+def _to_lists(result):
+    """ Converts nested native results (containing NumPy arrays) to lists."""
+    if hasattr(result, 'tolist'):
+        return result.tolist()
+    return [_to_lists(x) for x in result]
+
+
 class TestCommon(object):
     def test_expand(self):
         exp = opt.expand(SimpleVMREntry([True, False, False], [True, False, True], None, None), [1, 2])
@@ -59,6 +72,11 @@ class TestLPM(object):
         sub_cls = opt.minimize_num_groups(cls)
         assert len(sub_cls) == 1
 
+    def test_minimize_num_groups_packed(self, classifier):
+        packed = BasicClassifier(PackedVMR(classifier.bit_width, classifier))
+        sub_clss = opt.minimize_num_groups(packed)
+        assert [{x.action for x in s} for s in sub_clss] == [{1, 2, 4, 7}, {3, 5, 6}]
+
     def test_maximize_coverage_bounded(self, classifier):
         sub_clss, left = opt.maximize_coverage_bounded([classifier], 1)
         assert len(sub_clss) == 1
@@ -67,4 +85,228 @@ class TestLPM(object):
         assert len(left) == 1
         assert len(left[0]) == 2
 
+    def test_coverage_curve(self, classifier):
+        curve = opt.coverage_curve([classifier], 3)
+        assert curve == [5, 7, 7]
+        for k, num_covered in enumerate(curve, 1):
+            sub_clss, _ = opt.maximize_coverage_bounded([classifier], k)
+            assert sum(len(s) for s in sub_clss) == num_covered
+
+    def test_minimize_num_groups_handle(self, classifier):
+        handle = p4t_native.ClassifierHandle(classifier)
+        assert _to_lists(p4t_native.min_pmgr(handle)) == _to_lists(p4t_native.min_pmgr(classifier))
+
+    def test_handle_subset_reorder(self, classifier):
+        handle = p4t_native.ClassifierHandle(classifier).subset([3, 0, -1]).reorder([2, 0])
+        expected = classifier.subset([3, 0, 6]).reorder([2, 0])
+        assert len(handle) == 3
+        assert handle.bit_width == 2
+        assert _to_lists(p4t_native.min_pmgr(handle)) == _to_lists(p4t_native.min_pmgr(expected))
+
+    def test_handle_from_packed(self, classifier):
+        packed = PackedVMR(classifier.bit_width, classifier)
+        handle = p4t_native.ClassifierHandle.from_packed(packed.values, packed.masks, packed.bit_width)
+        assert len(handle) == len(classifier)
+        assert _to_lists(p4t_native.min_pmgr(handle)) == _to_lists(p4t_native.min_pmgr(classifier))
+
+    def test_numpy_results(self, classifier):
+        partition, partition_indices = p4t_native.min_pmgr(
+            p4t_native.ClassifierHandle(classifier).subset(np.arange(len(classifier))))
+        assert isinstance(partition_indices[0], np.ndarray)
+        assert isinstance(partition[0][0], np.ndarray)
+        assert sorted(np.concatenate(partition_indices).tolist()) == list(range(len(classifier)))
+
+    def test_handle_strided_indices(self, classifier):
+        handle = p4t_native.ClassifierHandle(classifier)
+        columns = np.array([[0, 3], [2, 1], [6, 0]])
+        assert _to_lists(p4t_native.min_pmgr(handle.subset(np.arange(7)[::2]))) == \
+            _to_lists(p4t_native.min_pmgr(handle.subset([0, 2, 4, 6])))
+        assert _to_lists(p4t_native.min_pmgr(handle.subset(columns[:, 0]).reorder(columns[::-1, 1]))) == \
+            _to_lists(p4t_native.min_pmgr(handle.subset([0, 2, 6]).reorder([0, 1, 3])))
+
+    def test_handle_bad_index(self, classifier):
+        with pytest.raises(IndexError):
+            p4t_native.ClassifierHandle(classifier).subset([len(classifier)])
+        with pytest.raises(IndexError):
+            p4t_native.ClassifierHandle(classifier).reorder([classifier.bit_width])
+
+
+class TestOI(object):
+    @pytest.fixture(autouse=True)
+    def log_dir(self, tmpdir, monkeypatch):
+        """ Native optimizations log into logs/ relative to the current directory."""
+        tmpdir.mkdir('logs')
+        monkeypatch.chdir(tmpdir)
+
+    def test_decompose_oi(self, classifier):
+        sub_clss, left = opt.decompose_oi(classifier, 2, 'icnp_blockers')
+        assert sum(len(x) for x in sub_clss) + len(left) == len(classifier)
+        assert len(left) == 0
+
+    def test_decompose_oi_async(self, classifier):
+        sub_clss, left = opt.decompose_oi(classifier, 2, 'icnp_blockers')
+        a_sub_clss, a_left = opt.decompose_oi_async(classifier, 2, 'icnp_blockers').result()
+        assert [x[:] for x in a_sub_clss] == [x[:] for x in sub_clss]
+        assert len(a_left) == len(left)
+
+    def test_minimize_oi_lpm_async(self, classifier):
+        sub_clss, _ = opt.minimize_oi_lpm(classifier, 2, 'icnp_blockers', 2)
+        a_sub_clss, _ = opt.minimize_oi_lpm_async(classifier, 2, 'icnp_blockers', 2).result()
+        assert [x[:] for x in a_sub_clss] == [x[:] for x in sub_clss]
+
+    def test_decompose_oi_wide(self, classifier):
+        padding = 300 - classifier.bit_width
+        wide = BasicClassifier(SimpleVMR(300, [
+            SimpleVMREntry(list(x.value) + [False] * padding, list(x.mask) + [False] * padding, x.action, x.priority)
+            for x in classifier]))
+        sub_clss, _ = opt.decompose_oi(classifier, 2, 'icnp_blockers')
+        wide_sub_clss, _ = opt.decompose_oi(wide, 2, 'icnp_blockers')
+        assert [[x.priority for x in s] for s in wide_sub_clss] == [[x.priority for x in s] for s in sub_clss]
+
+    def test_time_budget(self, classifier):
+        sub_clss, left = opt.decompose_oi(classifier, 2, 'icnp_blockers')
+        b_sub_clss, b_left, complete, _ = opt.decompose_oi(
+            classifier, 2, 'icnp_blockers', time_budget=1000, full_result=True)
+        assert complete
+        assert [x[:] for x in b_sub_clss] == [x[:] for x in sub_clss]
+        assert len(b_left) == len(left)
+
+    def test_result_shapes(self, classifier):
+        assert len(opt.decompose_oi(classifier, 2, 'icnp_blockers', time_budget=1000)) == 2
+        assert len(opt.minimize_oi_lpm(classifier, 2, 'icnp_blockers', 10, time_budget=1000)) == 2
+        assert len(opt.minimize_oi_lpm(classifier, 2, 'icnp_blockers', 10, max_expanded_bits=1,
+                                       provide_non_expanded=True)) == 3
+        assert len(p4t_native.best_subgroup(classifier, 2, False, 'icnp_blockers', time_budget=1000)) == 2
+
+    def test_result_fields(self, classifier):
+        result = opt.decompose_oi(classifier, 2, 'icnp_blockers', full_result=True)
+        assert result.complete
+        assert result.gap is None
+        assert sum(len(x) for x in result.subclassifiers) + len(result.leftover) == len(classifier)
+        result = opt.minimize_oi_lpm(classifier, 2, 'icnp_blockers', 10, max_expanded_bits=1,
+                                     provide_non_expanded=True, full_result=True)
+        assert result.complete
+        assert len(result.non_expanded) == len(result.subclassifiers)
+        assert opt.minimize_oi_lpm(classifier, 2, 'icnp_blockers', 10, full_result=True).non_expanded is None
+        assert len(p4t_native.best_subgroup(classifier, 2, False, 'icnp_blockers', report_complete=True)) == 3
+
+    def test_report_gap_requires_full_result(self, classifier):
+        with pytest.raises(AssertionError):
+            opt.decompose_oi(classifier, 2, 'icnp_blockers', report_gap=True)
+
+    def test_time_budget_expired(self, classifier):
+        sub_clss, left, complete, _ = opt.decompose_oi(
+            classifier, 2, 'icnp_blockers', time_budget=0, full_result=True)
+        assert not complete
+        assert sub_clss == []
+        assert len(left) == len(classifier)
+
+    @pytest.mark.parametrize('algo', ['icnp_oi', 'icnp_blockers'])
+    def test_best_subgroup_truncated(self, classifier, algo):
+        bits, indices, complete = p4t_native.best_subgroup(
+            classifier, 2, False, algo, time_budget=0, report_complete=True)
+        assert not complete
+        assert len(bits) <= 2
+        assert len(indices) > 0
+        sub_cls = classifier.subset(indices).reorder(bits)
+        for i, entry in enumerate(sub_cls):
+            for other in sub_cls[:i]:
+                assert not all(not (m1 and m2) or v1 == v2 for v1, m1, v2, m2 in zip(
+                    entry.value, entry.mask, other.value, other.mask))
+
+    def test_multistart(self, classifier):
+        _, indices = p4t_native.best_subgroup(classifier, 2, False, 'icnp_blockers')
+        _, m_indices = p4t_native.best_subgroup(classifier, 2, False, 'icnp_multistart', num_starts=4, seed=1)
+        assert len(m_indices) >= len(indices)
+
+    def test_multistart_seed(self, classifier):
+        sub_clss, _ = opt.decompose_oi(classifier, 2, 'icnp_multistart', num_starts=4, seed=7)
+        s_sub_clss, _ = opt.decompose_oi(classifier, 2, 'icnp_multistart', num_starts=4, seed=7)
+        assert [x[:] for x in s_sub_clss] == [x[:] for x in sub_clss]
+
+    def test_coloring(self, classifier):
+        sub_clss, left = opt.decompose_oi(classifier, 2, 'coloring')
+        assert sum(len(x) for x in sub_clss) == len(classifier)
+        assert len(left) == 0
+        for sub_cls in sub_clss:
+            assert sub_cls.bit_width <= 2
+            for i, entry in enumerate(sub_cls):
+                for other in sub_cls[:i]:
+                    assert any(m1 and m2 and v1 != v2 for v1, m1, v2, m2 in zip(
+                        entry.value, entry.mask, other.value, other.mask))
+
+    def test_lower_bound_num_groups(self, classifier):
+        assert opt.lower_bound_num_groups(classifier) == 2
+        antichain = p4t_native.max_antichain(classifier)
+        supports = [{i for i, m in enumerate(classifier[j].mask) if m} for j in antichain]
+        assert all(not s1 <= s2 for s1 in supports for s2 in supports if s1 is not s2)
+        sub_clss, gap = opt.minimize_num_groups(classifier, report_gap=True)
+        assert len(sub_clss) == 2
+        assert gap == 0
+
+    def test_lower_bound_num_oi_groups(self, classifier):
+        assert opt.lower_bound_num_oi_groups(classifier) == 4
+        assert sorted(p4t_native.max_overlap(classifier)) == [1, 3, 4, 6]
+
+    @pytest.mark.parametrize('algo', ['icnp_blockers', 'coloring'])
+    def test_report_gap(self, classifier, algo):
+        sub_clss, left, _, gap = opt.decompose_oi(classifier, 2, algo, report_gap=True, full_result=True)
+        assert len(left) == 0
+        assert gap == len(sub_clss) - 4 >= 0
+        _, left, _, gap = opt.decompose_oi(
+            classifier, 2, algo, max_num_groups=1, report_gap=True, full_result=True)
+        assert len(left) > 0
+        assert gap is None
+
+    def test_report_gap_oi_lpm(self, classifier):
+        sub_clss, left, _, complete, gap = opt.minimize_oi_lpm(
+            classifier, 2, 'icnp_blockers', 10, time_budget=60, report_gap=True, full_result=True)
+        assert complete
+        assert len(left) == 0
+        assert gap == len(sub_clss) - 4 >= 0
+
+    @pytest.mark.parametrize('algo', ['icnp_oi', 'icnp_blockers', 'min_similarity'])
+    def test_report_gap_oi_lpm_projected(self, algo):
+        vmr = SimpleVMR(3)
+        vmr.append(create_entry('00*', 1, 1))
+        vmr.append(create_entry('1*1', 2, 2))
+        cls = BasicClassifier(vmr)
+        assert opt.lower_bound_num_groups(cls) == 2
+
+        sub_clss, left, _, _, gap = opt.minimize_oi_lpm(cls, 1, algo, 10, report_gap=True, full_result=True)
+        assert len(left) == 0
+        assert gap == len(sub_clss) - 1 >= 0
+
+    def test_coloring_max_num_groups(self, classifier):
+        sub_clss, left = opt.decompose_oi(classifier, 2, 'coloring')
+        b_sub_clss, b_left = opt.decompose_oi(classifier, 2, 'coloring', max_num_groups=1)
+        assert [x[:] for x in b_sub_clss] == [x[:] for x in sub_clss[:1]]
+        assert len(b_left) == len(classifier) - len(sub_clss[0])
+
+    def test_coloring_time_budget(self, classifier):
+        sub_clss, left, complete, _ = opt.decompose_oi(
+            classifier, 2, 'coloring', time_budget=0, full_result=True)
+        assert not complete
+        assert sum(len(x) for x in sub_clss) + len(left) == len(classifier)
+        _, _, complete, _ = opt.decompose_oi(classifier, 2, 'coloring', time_budget=1000, full_result=True)
+        assert complete
+
+    def test_coloring_oi_lpm(self, classifier):
+        with pytest.raises(ValueError):
+            opt.minimize_oi_lpm(classifier, 2, 'coloring', 10)
+
+    def test_cancelled(self, classifier):
+        with pytest.raises(CancelledError):
+            opt.decompose_oi(classifier, 2, 'icnp_blockers', cancelled=lambda: True)
+
+    def test_cancel_async(self, classifier):
+        executor = ThreadPoolExecutor(1)
+        started = threading.Event()
+        executor.submit(started.wait)
+        future = opt.decompose_oi_async(classifier, 2, 'icnp_blockers', executor=executor)
+        assert future.cancel()
+        started.set()
+        executor.shutdown()
+        assert future.cancelled()
+
 # TODO: Equivalence tests
@@ -0,0 +1,78 @@
+import pytest
+import numpy as np
+
+from test_generic import vmr, TestVMRGeneric, ENTRIES
+
+import p4t.vmrs.packed as pvmr
+import p4t.vmrs.simple as svmr
+
+
+def test_pack_unpack_bits():
+    bits = np.array([[1, 0, 1] + [0] * 62 + [1], [0] * 65 + [1]])
+    words = pvmr.pack_bits(bits)
+    assert words.shape == (2, 2)
+    assert list(words[0]) == [5, 2]
+    assert (pvmr.unpack_bits(words, 66) == bits).all()
+
+
+@pytest.fixture
+def vmr_instance():
+    return pvmr.PackedVMR(3)
+
+
+class TestPVMR(TestVMRGeneric):
+    __test__ = True
+
+    def test_getitem_values(self, vmr):
+        for entry, expected in zip(vmr, ENTRIES):
+            assert list(entry.value) == expected.value
+            assert list(entry.mask) == expected.mask
+            assert entry.priority == expected.priority
+
+    def test_insert_delete(self, vmr):
+        vmr.insert(0, ENTRIES[2])
+        del vmr[2]
+        assert [x.priority for x in vmr] == [3, 1, 3]
+
+    @pytest.mark.parametrize('index', [
+        slice(1, 3), slice(None, None, 2), slice(-1, None), slice(2, 1), slice(None, None, -1)])
+    def test_delete_slice(self, vmr, index):
+        expected = list(ENTRIES)
+        del expected[index]
+        del vmr[index]
+        assert vmr[:] == expected
+        vmr.append(ENTRIES[0])
+        assert vmr[:] == expected + ENTRIES[:1]
+
+    @pytest.mark.parametrize('index,entries', [
+        (slice(1, 3), ENTRIES[:1]), (slice(0, 0), ENTRIES[1:]), (slice(1, None), []),
+        (slice(None, None, 2), ENTRIES[1:]), (slice(None, None, -1), ENTRIES)])
+    def test_set_slice(self, vmr, index, entries):
+        expected = list(ENTRIES)
+        expected[index] = entries
+        vmr[index] = entries
+        assert vmr[:] == expected
+        assert vmr.values.shape == (len(expected), 1)
+
+    def test_set_extended_slice_size(self, vmr):
+        with pytest.raises(ValueError):
+            vmr[::2] = ENTRIES
+
+    def test_wrong_bit_width(self, vmr):
+        with pytest.raises(ValueError):
+            vmr.append(svmr.SimpleVMREntry([True], [True], None, 0))
+
+    def test_extend_packed(self, vmr):
+        vmr.extend_packed(vmr.values[:2], vmr.masks[:2], ['a', 'b'], [4, 5])
+        assert len(vmr) == len(ENTRIES) + 2
+        assert vmr[-1].action == 'b'
+        assert vmr[-1].value == vmr[1].value
+
+    def test_extend_from(self, vmr):
+        new_vmr = vmr.create_instance(bit_width=3)
+        new_vmr.extend_from(vmr, [2, 0])
+        assert new_vmr[:] == [vmr[2], vmr[0]]
+
+    def test_extend_from_overflow(self, vmr):
+        with pytest.raises(IndexError):
+            vmr.create_instance(bit_width=3).extend_from(vmr, [len(vmr)])
@@ -1,6 +1,6 @@
 import pytest
 
-from test_generic import vmr, TestVMRGeneric
+from test_generic import vmr, TestVMRGeneric, ENTRIES
 
 import p4t.vmrs.simple as svmr
 
@@ -40,3 +40,16 @@ def vmr_instance():
 class TestSVMR(TestVMRGeneric):
     __test__ = True
     pass
+
+
+def test_extend_from_chunks(vmr_instance):
+    def chunks():
+        yield ENTRIES[:2]
+        yield ENTRIES[2:]
+    vmr_instance.extend_from_chunks(chunks())
+    assert list(vmr_instance) == ENTRIES
+
+
+def test_extend_from_chunks_bad_width(vmr_instance):
+    with pytest.raises(ValueError):
+        vmr_instance.extend_from_chunks([[svmr.SimpleVMREntry([True], [True], None, 0)]])
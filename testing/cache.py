@@ -0,0 +1,155 @@
+""" On-disk cache of parsed classifiers.
+
+Each entry is a single file that holds a small header followed by raw packed
+values, masks and priorities, so that it can be memory mapped without any
+parsing. Entries are keyed by the digest of the input file, the parser
+version, the format name and the maximal number of entries taken from the file.
+"""
+import os
+import os.path
+import hashlib
+from itertools import islice
+
+import numpy as np
+
+import parsing
+
+
+MAGIC = b'P4TCLSF1'
+HEADER_SIZE = len(MAGIC) + 2 * 8
+SUFFIX = '.clsf'
+
+# Must be increased whenever parsing changes, so that stale entries are missed
+PARSER_VERSION = 2
+
+DEFAULT_MAX_SIZE = 1 << 30
+
+
+def file_digest(filename, block_size=1 << 20):
+    """ Calculates SHA-1 digest of a file's content."""
+    digest = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_packed(filename, packed):
+    """ Stores PackedRules into a memory-mappable file."""
+    tmp_filename = '{:s}.{:d}.tmp'.format(filename, os.getpid())
+    with open(tmp_filename, 'wb') as f:
+        f.write(MAGIC)
+        f.write(np.array([packed.width, len(packed)], dtype='<u8').tobytes())
+        np.ascontiguousarray(packed.values, dtype='<u8').tofile(f)
+        np.ascontiguousarray(packed.masks, dtype='<u8').tofile(f)
+        np.ascontiguousarray(packed.priorities, dtype='<i8').tofile(f)
+    os.rename(tmp_filename, filename)
+
+
+def map_packed(filename):
+    """ Memory maps PackedRules stored by `write_packed` (read only).
+
+    Raises:
+        ValueError: If the file is not a complete cached classifier.
+    """
+    with open(filename, 'rb') as f:
+        header = f.read(HEADER_SIZE)
+    if len(header) != HEADER_SIZE or header[:len(MAGIC)] != MAGIC:
+        raise ValueError("{:s} is not a cached classifier".format(filename))
+    width, num_rules = (int(x) for x in np.frombuffer(header[len(MAGIC):], dtype='<u8'))
+    num_words = (width + 63) // 64
+
+    if os.path.getsize(filename) != HEADER_SIZE + 8 * num_rules * (2 * num_words + 1):
+        raise ValueError("{:s} has unexpected size".format(filename))
+
+    def array(offset, dtype, shape):
+        if num_rules == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(filename, dtype=dtype, mode='r', offset=offset, shape=shape)
+
+    words_size = 8 * num_rules * num_words
+    return parsing.PackedRules(
+        width,
+        array(HEADER_SIZE, '<u8', (num_rules, num_words)),
+        array(HEADER_SIZE + words_size, '<u8', (num_rules, num_words)),
+        array(HEADER_SIZE + 2 * words_size, '<i8', (num_rules,))
+    )
+
+
+class ClassifierCache(object):
+    """ Directory of cached classifiers with LRU eviction.
+
+    Attributes:
+        directory: Cache directory.
+        max_size: Maximal total size of cached entries in bytes.
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _entry_prefix(self, digest):
+        return os.path.join(self.directory, digest + '-')
+
+    def _entry(self, digest, clsf_format, max_entries):
+        return '{:s}v{:d}-{:s}-{:s}{:s}'.format(
+            self._entry_prefix(digest), PARSER_VERSION, clsf_format.__name__,
+            'all' if max_entries is None else str(max_entries), SUFFIX)
+
+    def _entries(self):
+        return [os.path.join(self.directory, name)
+                for name in os.listdir(self.directory) if name.endswith(SUFFIX)]
+
+    def read_packed(self, clsf_format, filename, max_entries=None):
+        """ Returns packed classifier, parsing the file only on cache miss.
+
+        Broken entries (e.g., partially written ones) are treated as misses.
+
+        Args:
+            clsf_format: Classifier format (e.g., parsing.classbench_expanded).
+            filename: Input file.
+            max_entries: Maximal number of lines taken from the file.
+
+        Returns:
+            An instance of parsing.PackedRules (memory mapped).
+        """
+        entry = self._entry(file_digest(filename), clsf_format, max_entries)
+        if os.path.exists(entry):
+            try:
+                packed = map_packed(entry)
+            except ValueError:
+                os.remove(entry)
+            else:
+                os.utime(entry, None)
+                return packed
+
+        with open(filename, 'r') as input_file:
+            packed = parsing.read_packed(clsf_format, islice(input_file, 0, max_entries))
+        write_packed(entry, packed)
+        self.evict()
+        return map_packed(entry) if os.path.exists(entry) else packed
+
+    def invalidate(self, filename):
+        """ Removes all cached classifiers of the file's current content."""
+        prefix = self._entry_prefix(file_digest(filename))
+        for entry in self._entries():
+            if entry.startswith(prefix):
+                os.remove(entry)
+
+    def clear(self):
+        """ Removes all cached classifiers."""
+        for entry in self._entries():
+            os.remove(entry)
+
+    def evict(self):
+        """ Removes least recently used entries until the cache fits max_size."""
+        entries = sorted(
+            ((os.path.getmtime(entry), os.path.getsize(entry), entry) for entry in self._entries()),
+            reverse=True)
+        total_size = 0
+        for _, size, entry in entries:
+            total_size += size
+            if total_size > self.max_size:
+                os.remove(entry)
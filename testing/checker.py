@@ -11,10 +11,11 @@ from p4t.classifiers.simple import BasicClassifier
 import p4t.optimizations.oi_lpm as opt
 
 import parsing
+from cache import ClassifierCache, DEFAULT_MAX_SIZE
 
 
-GlobalParams = namedtuple('GlobalParams', ['max_entries', 'output_file'])
-PARAMS = GlobalParams(None, 'data.tsv')
+GlobalParams = namedtuple('GlobalParams', ['max_entries', 'output_file', 'packed_parser', 'input_format'])
+PARAMS = GlobalParams(None, 'data.tsv', False, 'classbench_expanded')
 
 OIParams = namedtuple('OIParams', ['algo', 'cutoff', 'bit_width', 'only_exact'])
 OI_PARAMS = OIParams('icnp_blockers', 20, 32, False)
@@ -22,6 +23,9 @@ OI_PARAMS = OIParams('icnp_blockers', 20, 32, False)
 LPMParams = namedtuple('LPMParams', ['max_groups', 'max_expanded_bits'])
 LPM_PARAMS = LPMParams(None, None)
 
+CacheParams = namedtuple('CacheParams', ['cache', 'refresh'])
+CACHE_PARAMS = CacheParams(None, False)
+
 def add_row(kind, filename, num_entries, oi_algorithm,
             bit_width, max_groups, num_groups, num_entries_traditional, groups,
             max_expanded_bits, expanded_groups):
@@ -32,10 +36,21 @@ def add_row(kind, filename, num_entries, oi_algorithm,
 
 
 def read_classifier(filename):
+    clsf_format = getattr(parsing, PARAMS.input_format)
+
+    if CACHE_PARAMS.cache is not None:
+        if CACHE_PARAMS.refresh:
+            CACHE_PARAMS.cache.invalidate(filename)
+        return parsing.read_classifier(
+            clsf_format,
+            CACHE_PARAMS.cache.read_packed(clsf_format, filename, PARAMS.max_entries)
+        )
+
     with open(filename, 'r') as input_file:
         classifier = parsing.read_classifier(
-            parsing.classbench_expanded,
-            islice(input_file, 0, PARAMS.max_entries)
+            clsf_format,
+            islice(input_file, 0, PARAMS.max_entries),
+            packed=PARAMS.packed_parser
         )
     return classifier
 
@@ -45,6 +60,15 @@ def read_classifier(filename):
               help='Maximal number of entries to take from the input')
 @click.option('--output_file', default=PARAMS.output_file,
               help='File to store')
+@click.option('--packed-parser', help='Parse input into packed arrays?', is_flag=True)
+@click.option('--input-format', default=PARAMS.input_format,
+              type=click.Choice(['classbench_expanded', 'classbench_ranges', 'classbench6_ranges']),
+              help='Format of the input files')
+@click.option('--cache-dir', default=None,
+              help='Directory to cache parsed classifiers in')
+@click.option('--cache-max-size', default=DEFAULT_MAX_SIZE >> 20, type=int,
+              help='Maximal cache size (in MB)')
+@click.option('--refresh-cache', help='Invalidate cached input files?', is_flag=True)
 @click.option('--num-threads', default=None, type=int,
               help='Number of threads to use')
 @click.option('--oi-cutoff', default=OI_PARAMS.cutoff, type=int,
@@ -58,19 +82,25 @@ def read_classifier(filename):
               help='Maximal allowed number of groups')
 @click.option('--lpm-max-expanded-bits', default=LPM_PARAMS.max_expanded_bits, type=int,
               help='Maximal number of entries')
-def greet(max_entries, output_file, num_threads,
+def greet(max_entries, output_file, packed_parser, input_format,
+          cache_dir, cache_max_size, refresh_cache, num_threads,
           oi_cutoff, oi_algo, oi_bit_width, oi_only_exact,
           lpm_max_groups, lpm_max_expanded_bits):
     global PARAMS      # pylint: disable=global-statement
     global OI_PARAMS   # pylint: disable=global-statement
     global LPM_PARAMS  # pylint: disable=global-statement
+    global CACHE_PARAMS  # pylint: disable=global-statement
 
-    PARAMS = GlobalParams(max_entries=max_entries, output_file=output_file)
+    PARAMS = GlobalParams(max_entries=max_entries, output_file=output_file,
+                          packed_parser=packed_parser, input_format=input_format)
     OI_PARAMS = OIParams(
         cutoff=oi_cutoff, algo=str(oi_algo),
         only_exact=oi_only_exact, bit_width=oi_bit_width)
     LPM_PARAMS = LPMParams(max_groups=lpm_max_groups,
             max_expanded_bits=lpm_max_expanded_bits)
+    CACHE_PARAMS = CacheParams(
+        cache=ClassifierCache(cache_dir, cache_max_size << 20) if cache_dir is not None else None,
+        refresh=refresh_cache)
 
     if num_threads is not None:
         opt.set_number_of_threads(num_threads)
@@ -197,6 +227,27 @@ def do_optimize_lpm(input_files, lpm_params):
                 [len(s) for s in subclassifiers], 'NA', [len(s) for s in subclassifiers])
 
 
+def do_lpm_coverage_curve(input_files, lpm_params):
+    if lpm_params.max_groups is None:
+        raise click.UsageError("lpm-coverage-curve requires --lpm-max-groups")
+
+    for input_file in input_files:
+        print("calculating lpm coverage curve on {:s}: max_groups = {:d}".format(
+            os.path.basename(input_file), lpm_params.max_groups))
+
+        classifier = read_classifier(input_file)
+
+        curve = opt.coverage_curve([classifier], lpm_params.max_groups)
+        num_groups = 0
+        for max_groups, num_covered in enumerate(curve, 1):
+            # The curve is flat once adding a group covers nothing new
+            if num_groups == 0 or num_covered > curve[num_groups - 1]:
+                num_groups = max_groups
+            add_row('lpm_curve', os.path.basename(input_file), len(classifier), 'NA',
+                    classifier.bit_width, max_groups, num_groups, len(classifier) - num_covered, None,
+                    'NA', None)
+
+
 def do_optimize_lpm_oi(input_files, oi_params):
     for input_file in input_files:
         print("performing lpm_oi on {:s}: bitwidth = {:d}, algo = {:s}".format(
@@ -244,6 +295,12 @@ def optimize_lpm(input_files):
     do_optimize_lpm(input_files, LPM_PARAMS)
 
 
+@greet.command()
+@click.argument('input_files', nargs=-1)
+def lpm_coverage_curve(input_files):
+    do_lpm_coverage_curve(input_files, LPM_PARAMS)
+
+
 @greet.command()
 @click.argument('input_files', nargs=-1)
 def optimize_lpm_oi(input_files):
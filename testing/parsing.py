@@ -1,9 +1,17 @@
 import fileinput
+import binascii
+import re
+import socket
+from collections import namedtuple
 from itertools import repeat, chain
 from functools import wraps
 
+import numpy as np
+
 from p4t.classifiers.simple import BasicClassifier
 from p4t.vmrs.simple import SimpleVMR, SimpleVMREntry
+from p4t.vmrs.packed import PackedVMR, pack_bits
+import p4t_native
 
 
 class Filter:
@@ -29,18 +37,84 @@ class Filter:
         raise NotImplementedError
 
 
+DEFAULT_CHUNK_SIZE = 1 << 14
+
+
+class PackedRules(namedtuple('PackedRules', ['width', 'values', 'masks', 'priorities'])):
+    """ Classifier rules packed into uint64 matrices.
+
+    Bit i of a rule is stored in word i // 64 at position i % 64.
+
+    Attributes:
+        width: Rule bit width.
+        values: (n, ceil(width / 64)) uint64 array of values.
+        masks: (n, ceil(width / 64)) uint64 array of masks.
+        priorities: (n,) int64 array of rule priorities.
+    """
+
+    __slots__ = ()
+
+    def __len__(self):
+        return len(self.values)
+
+
 def clsf_format(*widths):
     def decorator(func):
         @wraps(func)
         def wrapper(line):
             return func(line)
         wrapper.width = sum(widths)
+        wrapper.widths = widths
+        wrapper.packed = None
         return wrapper
     return decorator
 
 
+def packed_decoder(clsf_format):
+    """ Registers the decorated function as a packed decoder for clsf_format.
+
+    Packed decoder must return the list of rules for a line, each rule being
+    a sequence of (value, mask) integer pairs, one per format's field.
+    """
+    def decorator(func):
+        clsf_format.packed = func
+        return func
+    return decorator
+
+
+_PYLIST_RE = re.compile(r"^\s*\[\s*('[01*]+'(?:\s*,\s*'[01*]+')*)?\s*,?\s*\]\s*$")
+_PREFIX_RE = re.compile(r"'([01*]+)'")
+_PREFIX_CACHE_SIZE = 1 << 12
+_PREFIX_CACHE = {}
+
+
+def _tokenize_pylist(lst):
+    """ Splits python-like list of ternary strings (e.g., "['01**', '1***']")."""
+    match = _PYLIST_RE.match(lst)
+    if match is None:
+        raise ValueError("Malformed list of ternary strings: {:s}".format(lst))
+    return _PREFIX_RE.findall(match.group(1) or '')
+
+
 def _parse_range(range):
-    return tuple(map(int, range.split(' : ')))
+    lo, hi = range.split(':')
+    return int(lo), int(hi)
+
+
+def _range_to_prefixes(range, num_bits):
+    lo, hi = _parse_range(range)
+    return p4t_native.range_to_prefixes(lo, hi, num_bits)
+
+
+def _cached_prefixes(key, convert, parse):
+    """ Memoizes prefixes conversion, port columns repeat a lot in ClassBench."""
+    try:
+        return _PREFIX_CACHE[key]
+    except KeyError:
+        if len(_PREFIX_CACHE) >= _PREFIX_CACHE_SIZE:
+            _PREFIX_CACHE.clear()
+        result = _PREFIX_CACHE[key] = [convert(s) for s in parse()]
+        return result
 
 
 def _int_to_bit(x, num_bits):
@@ -83,11 +157,130 @@ def _field_to_filter(proto, num_bits):
     return Filter(value, mask)
 
 
-def _pylist_to_filters(lst):
-    return [Filter(
+def _int_to_field(x, num_bits):
+    """ Integer whose bits are `_int_to_bit(x, num_bits)` (padded on the right)."""
+    return x << (num_bits - x.bit_length()) if x else 0
+
+
+def _octets_to_field(s):
+    result = 0
+    for octet in s.split('.'):
+        result = (result << 8) | _int_to_field(int(octet), 8)
+    return result
+
+
+def _ip_to_field(ip):
+    if '/' in ip:
+        ip, nm = ip.split('/')
+    else:
+        ip, nm = ip, '32'
+
+    value = _octets_to_field(ip)
+
+    if '.' in nm:
+        mask = ~_octets_to_field(nm) & 0xFFFFFFFF
+    else:
+        mask = ((1 << int(nm)) - 1) << (32 - int(nm))
+
+    return value, mask
+
+
+def _ip6_to_field(ip):
+    if '/' in ip:
+        ip, nm = ip.split('/')
+    else:
+        ip, nm = ip, '128'
+
+    value = int(binascii.hexlify(socket.inet_pton(socket.AF_INET6, ip)), 16)
+    mask = ((1 << int(nm)) - 1) << (128 - int(nm))
+
+    return value, mask
+
+
+def _maybe_exact_to_field(x, num_bits):
+    if int(x) < 0:
+        return (1 << num_bits) - 1, 0
+    else:
+        return _int_to_field(int(x), num_bits), (1 << num_bits) - 1
+
+
+def _hex_to_field(proto, num_bits):
+    value, mask = (_int_to_field(int(x, 16), num_bits) for x in proto.split('/'))
+    return value, mask
+
+
+def _prefix_to_field(s):
+    return (
+        int(s.replace('1', '*').replace('0', '1').replace('*', '0'), 2),
+        int(s.replace('0', '1').replace('*', '0'), 2)
+    )
+
+
+def _ternary_to_field(s):
+    """ Converts ternary string to (value, mask) as is (unlike `_prefix_to_field`)."""
+    return (
+        int(s.replace('*', '0'), 2),
+        int(s.replace('0', '1').replace('*', '0'), 2)
+    )
+
+
+def _pylist_to_fields(lst):
+    return _cached_prefixes(
+        lst, _prefix_to_field, lambda: _tokenize_pylist(lst))
+
+
+def _range_to_fields(range, num_bits):
+    return _cached_prefixes(
+        (range, num_bits), _ternary_to_field,
+        lambda: _range_to_prefixes(range, num_bits))
+
+
+def _join_fields(widths, fields):
+    value, mask = 0, 0
+    for width, (field_value, field_mask) in zip(widths, fields):
+        value = (value << width) | field_value
+        mask = (mask << width) | field_mask
+    return value, mask
+
+
+def _ints_to_words(xs, width):
+    """ Packs integers (most significant bit is rule's bit 0) into uint64 words."""
+    num_bytes = (width + 7) // 8
+    shift = 8 * num_bytes - width
+    data = binascii.unhexlify(''.join('%0*x' % (2 * num_bytes, x << shift) for x in xs))
+    bytes_ = np.frombuffer(data, dtype=np.uint8).reshape(len(xs), num_bytes)
+    return pack_bits(np.unpackbits(bytes_, axis=1)[:, :width])
+
+
+def _field_to_bits(x, num_bits):
+    return [(x >> (num_bits - 1 - i)) & 1 for i in range(num_bits)]
+
+
+def _ip6_to_filter(ip):
+    value, mask = _ip6_to_field(ip)
+    return Filter(_field_to_bits(value, 128), _field_to_bits(mask, 128))
+
+
+def _prefix_to_filter(s):
+    return Filter(
         (1 if c == '0' else 0 for c in s),
         (1 if c != '*' else 0 for c in s)
-        ) for s in eval(lst)]
+    )
+
+
+def _ternary_to_filter(s):
+    return Filter(
+        (1 if c == '1' else 0 for c in s),
+        (1 if c != '*' else 0 for c in s)
+    )
+
+
+def _pylist_to_filters(lst):
+    return [_prefix_to_filter(s) for s in _tokenize_pylist(lst)]
+
+
+def _range_to_filters(range, num_bits):
+    return [_ternary_to_filter(s) for s in _range_to_prefixes(range, num_bits)]
 
 
 @clsf_format(32, 32, 4, 4)
@@ -118,7 +311,166 @@ def classbench_expanded(line):
     ]
 
 
-def read_classifier(clsf_format, lines):
+@clsf_format(32, 32, 16, 16, 8)
+def classbench_ranges(line):
+    src_ip, dst_ip, in_port, out_port, proto = line[1:].split('\t')[:5]
+    return [
+        _ip_to_filter(src_ip) + _ip_to_filter(dst_ip) + x + y + _field_to_filter(proto, 8)
+        for x in _range_to_filters(in_port, 16)
+        for y in _range_to_filters(out_port, 16)
+    ]
+
+
+@clsf_format(128, 128, 16, 16, 8)
+def classbench6_ranges(line):
+    src_ip, dst_ip, in_port, out_port, proto = line[1:].split('\t')[:5]
+    return [
+        _ip6_to_filter(src_ip) + _ip6_to_filter(dst_ip) + x + y + _field_to_filter(proto, 8)
+        for x in _range_to_filters(in_port, 16)
+        for y in _range_to_filters(out_port, 16)
+    ]
+
+
+@packed_decoder(icnp)
+def icnp_packed(line):
+    src_ip, dst_ip, _, _, x1, x2 = line.split('\t')
+    return [(
+        _ip_to_field(src_ip), _ip_to_field(dst_ip),
+        _maybe_exact_to_field(x1, 4), _maybe_exact_to_field(x2, 4)
+        )]
+
+
+@packed_decoder(classbench)
+def classbench_packed(line):
+    src_ip, dst_ip, in_port, out_port, proto, eth_type, _ = line[1:].split('\t')
+    return [(
+        _ip_to_field(src_ip), _ip_to_field(dst_ip),
+        _hex_to_field(proto, 8), _hex_to_field(eth_type, 16)
+        )]
+
+
+@packed_decoder(classbench_expanded)
+def classbench_expanded_packed(line):
+    src_ip, dst_ip, proto, in_port, out_port = line[1:].split('\t')
+    src, dst, proto = _ip_to_field(src_ip), _ip_to_field(dst_ip), _hex_to_field(proto, 8)
+    return [
+        (src, dst, x, y, proto)
+        for x in _pylist_to_fields(in_port)
+        for y in _pylist_to_fields(out_port)
+    ]
+
+
+@packed_decoder(classbench_ranges)
+def classbench_ranges_packed(line):
+    src_ip, dst_ip, in_port, out_port, proto = line[1:].split('\t')[:5]
+    src, dst, proto = _ip_to_field(src_ip), _ip_to_field(dst_ip), _hex_to_field(proto, 8)
+    return [
+        (src, dst, x, y, proto)
+        for x in _range_to_fields(in_port, 16)
+        for y in _range_to_fields(out_port, 16)
+    ]
+
+
+@packed_decoder(classbench6_ranges)
+def classbench6_ranges_packed(line):
+    src_ip, dst_ip, in_port, out_port, proto = line[1:].split('\t')[:5]
+    src, dst, proto = _ip6_to_field(src_ip), _ip6_to_field(dst_ip), _hex_to_field(proto, 8)
+    return [
+        (src, dst, x, y, proto)
+        for x in _range_to_fields(in_port, 16)
+        for y in _range_to_fields(out_port, 16)
+    ]
+
+
+def iter_packed(clsf_format, lines, chunk_size=DEFAULT_CHUNK_SIZE):
+    """ Lazily parses lines into chunks of packed value/mask arrays.
+
+    Only the integers of the current chunk are kept, so lines may come from
+    a generator of arbitrary length.
+
+    Args:
+        clsf_format: Classifier format, must have a packed decoder.
+        lines: Lines to parse.
+        chunk_size: Number of rules in each chunk (the last one may be shorter).
+
+    Yields:
+        Instances of PackedRules.
+    """
+    if clsf_format.packed is None:
+        raise ValueError("{:s} has no packed decoder".format(clsf_format.__name__))
+
+    values, masks = [], []
+    for line in lines:
+        for fields in clsf_format.packed(line):
+            value, mask = _join_fields(clsf_format.widths, fields)
+            values.append(value)
+            masks.append(mask)
+
+        while len(values) >= chunk_size:
+            yield _to_packed(clsf_format.width, values[:chunk_size], masks[:chunk_size])
+            values, masks = values[chunk_size:], masks[chunk_size:]
+
+    if values:
+        yield _to_packed(clsf_format.width, values, masks)
+
+
+def _to_packed(width, values, masks):
+    return PackedRules(
+        width, _ints_to_words(values, width), _ints_to_words(masks, width),
+        np.zeros(len(values), dtype=np.int64)
+    )
+
+
+def read_packed(clsf_format, lines):
+    """ Parses lines into packed value/mask arrays.
+
+    Args:
+        clsf_format: Classifier format, must have a packed decoder.
+        lines: Lines to parse.
+
+    Returns:
+        An instance of PackedRules.
+    """
+    chunks = list(iter_packed(clsf_format, lines))
+    if not chunks:
+        return _to_packed(clsf_format.width, [], [])
+    return PackedRules(
+        clsf_format.width,
+        np.concatenate([chunk.values for chunk in chunks]),
+        np.concatenate([chunk.masks for chunk in chunks]),
+        np.concatenate([chunk.priorities for chunk in chunks])
+    )
+
+
+def classifier_from_packed(packed, width=None):
+    """ Constructs classifier from packed rules without creating per bit objects.
+
+    Args:
+        packed: An instance of PackedRules or an iterable of them (chunks).
+        width: Rule bit width (required only if packed is an iterable).
+    """
+    if isinstance(packed, PackedRules):
+        width, packed = packed.width, [packed]
+    vmr = PackedVMR(width)
+    vmr.extend_from_chunks(packed)
+    return BasicClassifier(vmr)
+
+
+def read_classifier(clsf_format, lines, packed=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """ Reads classifier from lines in a given format.
+
+    Args:
+        clsf_format: Classifier format (e.g., classbench_expanded).
+        lines: Lines to parse, or an instance of PackedRules.
+        packed: Whether packed decoder should be used for parsing.
+        chunk_size: Number of rules parsed at once by the packed decoder.
+    """
+    if isinstance(lines, PackedRules):
+        return classifier_from_packed(lines)
+    if packed:
+        return classifier_from_packed(
+            iter_packed(clsf_format, lines, chunk_size), clsf_format.width)
+
     vmr = SimpleVMR(clsf_format.width)
     cnt = 0
     for line in lines:
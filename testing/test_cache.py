@@ -0,0 +1,85 @@
+import os
+
+import pytest
+import numpy as np
+
+import parsing
+import cache
+
+
+LINES = [
+    "@120.21.154.64/29\t117.184.179.72/29\t0x11/0xFF\t['0000001110011001']\t['0000000000011100']\n",
+    "@92.237.255.152/29\t87.254.157.200/29\t0x11/0xFF\t['0000000001110100', '000000000111010*']\t['0000000000101111']\n",
+]
+
+
+@pytest.fixture
+def input_file(tmpdir):
+    path = tmpdir.join('rules.txt')
+    path.write(''.join(LINES))
+    return str(path)
+
+
+@pytest.fixture
+def clsf_cache(tmpdir):
+    return cache.ClassifierCache(str(tmpdir.join('cache')))
+
+
+def _entries(clsf_cache):
+    return sorted(os.listdir(clsf_cache.directory))
+
+
+def _assert_equal(packed, expected):
+    assert packed.width == expected.width
+    assert np.array_equal(packed.values, expected.values)
+    assert np.array_equal(packed.masks, expected.masks)
+
+
+def test_hit(clsf_cache, input_file):
+    expected = parsing.read_packed(parsing.classbench_expanded, LINES)
+    _assert_equal(clsf_cache.read_packed(parsing.classbench_expanded, input_file), expected)
+    assert len(_entries(clsf_cache)) == 1
+    _assert_equal(clsf_cache.read_packed(parsing.classbench_expanded, input_file), expected)
+    assert len(_entries(clsf_cache)) == 1
+
+
+def test_key(clsf_cache, input_file):
+    clsf_cache.read_packed(parsing.classbench_expanded, input_file)
+    clsf_cache.read_packed(parsing.classbench_expanded, input_file, max_entries=1)
+    [entry, _] = _entries(clsf_cache)
+    assert 'v{:d}-'.format(cache.PARSER_VERSION) in entry
+
+
+def test_truncated(clsf_cache, input_file):
+    expected = clsf_cache.read_packed(parsing.classbench_expanded, input_file)
+    [entry] = _entries(clsf_cache)
+    path = os.path.join(clsf_cache.directory, entry)
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - 8)
+    with pytest.raises(ValueError):
+        cache.map_packed(path)
+    _assert_equal(clsf_cache.read_packed(parsing.classbench_expanded, input_file), expected)
+    cache.map_packed(path)
+
+
+def test_invalidate(clsf_cache, input_file, tmpdir):
+    other_file = tmpdir.join('other.txt')
+    other_file.write(LINES[0])
+    clsf_cache.read_packed(parsing.classbench_expanded, input_file)
+    clsf_cache.read_packed(parsing.classbench_expanded, str(other_file))
+    assert len(_entries(clsf_cache)) == 2
+    clsf_cache.invalidate(input_file)
+    assert len(_entries(clsf_cache)) == 1
+    clsf_cache.clear()
+    assert _entries(clsf_cache) == []
+
+
+def test_evict(clsf_cache, input_file):
+    clsf_cache.read_packed(parsing.classbench_expanded, input_file, max_entries=1)
+    [oldest] = _entries(clsf_cache)
+    os.utime(os.path.join(clsf_cache.directory, oldest), (0, 0))
+    clsf_cache.read_packed(parsing.classbench_expanded, input_file)
+    [newest] = [entry for entry in _entries(clsf_cache) if entry != oldest]
+    clsf_cache.max_size = os.path.getsize(os.path.join(clsf_cache.directory, newest))
+    clsf_cache.evict()
+    assert _entries(clsf_cache) == [newest]
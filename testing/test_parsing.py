@@ -0,0 +1,127 @@
+import os
+import random
+
+import pytest
+import numpy as np
+
+import parsing
+import p4t_native
+from p4t.vmrs.packed import pack_bits
+
+
+PYLISTS = [
+    "[]",
+    "['0000000000010100']",
+    "['0000000001110100', '000000000111010*']",
+    "[ '0*', '1*' , ]",
+    "['0000000000000001','**************1*']",
+]
+
+TEST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'test')
+
+RANGES_LINE = "@1.2.3.4/32\t10.0.0.0/8\t79 : 80\t0 : 65535\t0x06/0xFF\t0x0000/0x0000\t\n"
+
+
+def _ternary(entry, start, end):
+    return ''.join(
+        ('1' if value else '0') if mask else '*'
+        for value, mask in zip(list(entry.value)[start:end], list(entry.mask)[start:end]))
+
+
+def _prefix_range(prefix):
+    num_fixed = len(prefix.rstrip('*'))
+    lo = int(prefix.replace('*', '0'), 2)
+    return lo, lo + (1 << (len(prefix) - num_fixed)) - 1
+
+
+@pytest.mark.parametrize('lst', PYLISTS)
+def test_tokenize_pylist(lst):
+    assert parsing._tokenize_pylist(lst) == list(eval(lst))
+
+
+def test_tokenize_pylist_file():
+    with open(os.path.join(TEST_DIR, 'acl5.txt')) as f:
+        for line in f.readlines()[:500]:
+            for lst in line[1:].split('\t')[3:5]:
+                assert parsing._tokenize_pylist(lst) == list(eval(lst))
+
+
+@pytest.mark.parametrize('lst', ["['01', '10'", "['01' '10']", "[\"01\"]", "['0x1']"])
+def test_tokenize_pylist_malformed(lst):
+    with pytest.raises(ValueError):
+        parsing._tokenize_pylist(lst)
+
+
+@pytest.mark.parametrize('lo,hi,width', [
+    (0, 65535, 16), (80, 80, 16), (0, 0, 16), (65535, 65535, 16), (1, 65534, 16),
+    (1024, 65535, 16), (0, (1 << 63) - 1, 63), ((1 << 63) - 2, (1 << 63) - 1, 63),
+    (1, (1 << 63) - 2, 63), (0, 1, 1),
+] + [
+    tuple(sorted(random.Random(seed).sample(range(1 << 16), 2))) + (16,) for seed in range(20)
+])
+def test_range_to_prefixes(lo, hi, width):
+    prefixes = p4t_native.range_to_prefixes(lo, hi, width)
+    assert all(len(p) == width for p in prefixes)
+    assert all('*' not in p.rstrip('*') for p in prefixes)
+
+    covered = sorted(_prefix_range(p) for p in prefixes)
+    assert covered[0][0] == lo
+    assert covered[-1][1] == hi
+    assert all(prev[1] + 1 == cur[0] for prev, cur in zip(covered, covered[1:]))
+
+
+def test_range_to_prefixes_exact():
+    assert p4t_native.range_to_prefixes(0, 65535, 16) == ['*' * 16]
+    assert p4t_native.range_to_prefixes(80, 80, 16) == ['0000000001010000']
+
+
+@pytest.mark.parametrize('lo,hi,width', [(2, 1, 16), (0, 1 << 16, 16), (0, 1, 64), (0, 0, 0)])
+def test_range_to_prefixes_invalid(lo, hi, width):
+    with pytest.raises(ValueError):
+        p4t_native.range_to_prefixes(lo, hi, width)
+
+
+@pytest.mark.parametrize('packed', [False, True])
+def test_classbench_ranges(packed):
+    classifier = parsing.read_classifier(parsing.classbench_ranges, [RANGES_LINE], packed=packed)
+    assert classifier.bit_width == 104
+    assert len(classifier) == 2
+    for entry in classifier:
+        assert _ternary(entry, 0, 32) == str(parsing._ip_to_filter('1.2.3.4/32'))
+        assert _ternary(entry, 32, 64) == str(parsing._ip_to_filter('10.0.0.0/8'))
+        assert _ternary(entry, 80, 96) == '*' * 16
+        assert _ternary(entry, 96, 104) == str(parsing._field_to_filter('0x06/0xFF', 8))
+    assert [_ternary(entry, 64, 80) for entry in classifier] == [
+        '0000000001001111', '0000000001010000']
+
+
+@pytest.mark.parametrize('packed', [False, True])
+def test_classbench6_ranges(packed):
+    line = "@2001:db8::/32\t::1/128\t80 : 80\t1024 : 2047\t0x11/0xFF\t\n"
+    classifier = parsing.read_classifier(parsing.classbench6_ranges, [line], packed=packed)
+    assert classifier.bit_width == 296
+    [entry] = classifier
+    assert _ternary(entry, 0, 128) == '0010000000000001' + '0000110110111000' + '*' * 96
+    assert _ternary(entry, 128, 256) == '0' * 127 + '1'
+    assert _ternary(entry, 256, 272) == '0000000001010000'
+    assert _ternary(entry, 272, 288) == '000001' + '*' * 10
+
+
+@pytest.mark.parametrize('filename', ['acl5.txt', 'fw5.txt', 'ipc2.txt'])
+def test_packed_parser(filename):
+    with open(os.path.join(TEST_DIR, filename)) as f:
+        lines = f.readlines()[:300]
+
+    legacy = parsing.read_classifier(parsing.classbench_expanded, lines)
+    packed = parsing.read_packed(parsing.classbench_expanded, lines)
+
+    assert packed.width == legacy.bit_width
+    assert len(packed) == len(legacy)
+    assert np.array_equal(packed.values, pack_bits([list(entry.value) for entry in legacy]))
+    assert np.array_equal(packed.masks, pack_bits([list(entry.mask) for entry in legacy]))
+    assert packed.priorities.tolist() == [entry.priority for entry in legacy]
+
+    chunks = list(parsing.iter_packed(parsing.classbench_expanded, lines, chunk_size=64))
+    assert all(len(chunk) == 64 for chunk in chunks[:-1])
+    assert np.array_equal(np.concatenate([chunk.values for chunk in chunks]), packed.values)
+    assert np.array_equal(np.concatenate([chunk.masks for chunk in chunks]), packed.masks)